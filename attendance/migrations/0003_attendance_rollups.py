@@ -0,0 +1,72 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollups(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    StudentMonthlyAttendance = apps.get_model('attendance', 'StudentMonthlyAttendance')
+    BatchDailyAttendance = apps.get_model('attendance', 'BatchDailyAttendance')
+    counts = {'present': Count('id', filter=Q(status='present')), 'total': Count('id')}
+    StudentMonthlyAttendance.objects.bulk_create([
+        StudentMonthlyAttendance(
+            student_id=row['student_id'], subject_id=row['lecture__subject_id'], month=row['month'],
+            present=row['present'], total=row['total'],
+        )
+        for row in AttendanceRecord.objects.annotate(month=TruncMonth('date'))
+        .values('student_id', 'lecture__subject_id', 'month').annotate(**counts).order_by()
+    ], batch_size=2000)
+    BatchDailyAttendance.objects.bulk_create([
+        BatchDailyAttendance(
+            batch_id=row['lecture__batch_id'], subject_id=row['lecture__subject_id'], date=row['date'],
+            present=row['present'], total=row['total'],
+        )
+        for row in AttendanceRecord.objects
+        .values('lecture__batch_id', 'lecture__subject_id', 'date').annotate(**counts).order_by()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendance_indexes'),
+        ('core', '0014_user_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchDailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='core.batch')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='attendance_batch_day_date_idx')],
+                'unique_together': {('batch', 'subject', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentMonthlyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.subject')),
+            ],
+            options={
+                'unique_together': {('student', 'subject', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
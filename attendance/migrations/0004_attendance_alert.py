@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendance_rollups'),
+        ('core', '0015_low_attendance_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.DateField(help_text='First day of the alert window')),
+                ('present', models.PositiveIntegerField()),
+                ('total', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_alerts', to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window'], name='attendance_alert_window_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('subject__isnull', False)), fields=('student', 'subject', 'window'), name='attendance_alert_subject_once'), models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('student', 'window'), name='attendance_alert_overall_once')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:30
+
+import datetime
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def snap_to_sessions(apps, schema_editor):
+    """Records were dated when they were first marked. Move each one onto the
+    session it belongs to: the lecture's class_date for special classes,
+    otherwise the latest lecture weekday on or before the marking date."""
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    moves = {}  # new date -> record ids
+    rows = AttendanceRecord.objects.values_list('id', 'date', 'lecture__day', 'lecture__class_date')
+    for pk, day, weekday, class_date in rows.iterator(chunk_size=5000):
+        if class_date:
+            session = class_date
+        elif weekday in WEEKDAYS:
+            session = day - datetime.timedelta(days=(day.weekday() - WEEKDAYS.index(weekday)) % 7)
+        else:
+            continue
+        if session != day:
+            moves.setdefault(session, []).append(pk)
+    for session, ids in moves.items():
+        for i in range(0, len(ids), 500):
+            AttendanceRecord.objects.filter(id__in=ids[i:i + 500]).update(date=session)
+
+    if moves:
+        # the rollups are keyed by date, refill them from the moved records
+        apps.get_model('attendance', 'StudentMonthlyAttendance').objects.all().delete()
+        apps.get_model('attendance', 'BatchDailyAttendance').objects.all().delete()
+        import_module('attendance.migrations.0003_attendance_rollups').fill_rollups(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_alert'),
+        ('core', '0015_low_attendance_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.RunPython(snap_to_sessions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='attendancerecord',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('lecture', 'date', 'student'), name='attendance_one_per_session'),
+        ),
+    ]
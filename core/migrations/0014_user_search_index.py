@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# The index as it was created here; core/search.py has the live copy. Kept
+# inline so later changes to core.search don't change what this migration does.
+SEARCH_TABLE = 'core_usersearch'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "name, email, code, role UNINDEXED, "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, name, email, code, role)
+        SELECT u.id, u.first_name || ' ' || u.last_name || ' ' || u.username, u.email,
+               COALESCE(sp.enrollment_number, '') || ' ' || COALESCE(tp.employee_id, ''), u.role
+        FROM core_customuser u
+        LEFT JOIN core_studentprofile sp ON sp.user_id = u.id
+        LEFT JOIN core_teacherprofile tp ON tp.user_id = u.id
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+    """FTS5 search table for student / teacher lookup (SQLite only, see core/search.py)"""
+
+    dependencies = [
+        ('core', '0013_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
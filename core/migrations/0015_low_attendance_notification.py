@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('registration', 'New Registration'), ('profile_update', 'Profile Update'), ('login', 'Login'), ('fees', 'Fees Updated'), ('salary', 'Salary Updated'), ('attendance', 'Attendance Marked'), ('low_attendance', 'Low Attendance')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:33
+
+import django.db.models.deletion
+from django.conf import settings
+import datetime
+
+from django.db import migrations, models
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+
+def materialize_next_weeks(apps, schema_editor):
+    """Fill the next four weeks so dashboards have sessions before the first
+    materialize_lectures run"""
+    Lecture = apps.get_model('core', 'Lecture')
+    LectureOccurrence = apps.get_model('core', 'LectureOccurrence')
+    start = datetime.date.today()
+    end = start + datetime.timedelta(weeks=4, days=-1)
+    occurrences = []
+    for lecture in Lecture.objects.all():
+        if lecture.class_date:
+            dates = [lecture.class_date] if start <= lecture.class_date <= end else []
+        elif lecture.day in WEEKDAYS:
+            first = start + datetime.timedelta(days=(WEEKDAYS.index(lecture.day) - start.weekday()) % 7)
+            dates = [first + datetime.timedelta(weeks=week) for week in range(4)]
+        else:
+            dates = []
+        occurrences += [
+            LectureOccurrence(
+                lecture_id=lecture.pk, date=day, start_time=lecture.start_time, end_time=lecture.end_time,
+                teacher_id=lecture.teacher_id, batch_id=lecture.batch_id,
+            )
+            for day in dates
+        ]
+    LectureOccurrence.objects.bulk_create(occurrences, ignore_conflicts=True, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_low_attendance_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LectureOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecture_occurrences', to='core.batch')),
+                ('lecture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='core.lecture')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecture_occurrences', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['teacher', 'date', 'start_time'], name='occurrence_teacher_date_idx'), models.Index(fields=['batch', 'date', 'start_time'], name='occurrence_batch_date_idx')],
+                'unique_together': {('lecture', 'date')},
+            },
+        ),
+        migrations.RunPython(materialize_next_weeks, migrations.RunPython.noop),
+    ]
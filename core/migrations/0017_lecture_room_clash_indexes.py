@@ -0,0 +1,26 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_lecture_occurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='room',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['day', 'batch', 'start_time'], name='lecture_day_batch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['day', 'teacher', 'start_time'], name='lecture_day_teacher_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_lecture_room_clash_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lecture',
+            options={'ordering': ['weekday', 'start_time']},
+        ),
+        migrations.RemoveIndex(
+            model_name='lecture',
+            name='lecture_day_batch_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lecture',
+            name='lecture_day_teacher_idx',
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='weekday',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(day='Monday', then=models.Value(0)), models.When(day='Tuesday', then=models.Value(1)), models.When(day='Wednesday', then=models.Value(2)), models.When(day='Thursday', then=models.Value(3)), models.When(day='Friday', then=models.Value(4)), models.When(day='Saturday', then=models.Value(5))), output_field=models.PositiveSmallIntegerField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['batch', 'weekday', 'start_time'], name='lecture_batch_weekday_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['teacher', 'weekday', 'start_time'], name='lecture_teacher_weekday_idx'),
+        ),
+    ]
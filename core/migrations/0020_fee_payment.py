@@ -0,0 +1,56 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+
+def open_ledger(apps, schema_editor):
+    """One opening-balance payment per student who has paid something, so
+    the ledger adds up to fees_paid from the start"""
+    StudentProfile = apps.get_model('core', 'StudentProfile')
+    FeePayment = apps.get_model('core', 'FeePayment')
+    FeePayment.objects.bulk_create([
+        FeePayment(student_id=pk, amount=paid, mode='opening', paid_at=created_at, note='Balance before the ledger')
+        for pk, paid, created_at in StudentProfile.objects.filter(fees_paid__gt=0).values_list('pk', 'fees_paid', 'created_at')
+    ], batch_size=2000)
+    FeePayment.objects.filter(receipt_number__isnull=True).update(
+        receipt_number=Concat(Value('TP'), LPad(Cast('pk', CharField()), 7, Value('0'))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_lecture_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='fees_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='FeePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mode', models.CharField(choices=[('cash', 'Cash'), ('upi', 'UPI'), ('card', 'Card'), ('bank', 'Bank Transfer'), ('cheque', 'Cheque'), ('opening', 'Opening Balance')], default='cash', max_length=20)),
+                ('receipt_number', models.CharField(blank=True, max_length=30, null=True, unique=True)),
+                ('paid_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('idempotency_key', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_fee_payments', to=settings.AUTH_USER_MODEL)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_payments', to='core.studentprofile')),
+            ],
+            options={
+                'ordering': ['-paid_at'],
+                'indexes': [models.Index(fields=['student', 'paid_at'], name='feepayment_student_paid_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
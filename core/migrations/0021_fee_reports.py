@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:05
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_paid_on(apps, schema_editor):
+    FeePayment = apps.get_model('core', 'FeePayment')
+    payments = list(FeePayment.objects.only('pk', 'paid_at'))
+    for payment in payments:
+        payment.paid_on = timezone.localdate(payment.paid_at)
+    FeePayment.objects.bulk_update(payments, ['paid_on'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_fee_payment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feepayment',
+            name='paid_on',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_paid_on, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feepayment',
+            name='paid_on',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='fees_outstanding',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('total_fees'), '-', models.F('fees_paid')), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['paid_on', 'mode', 'amount'], name='feepayment_paid_on_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['-fees_outstanding'], name='student_outstanding_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['batch', 'fees_outstanding', 'total_fees', 'fees_paid'], name='student_batch_outstanding_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_fee_reports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='hourly_rate',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AlterField(
+            model_name='teacherprofile',
+            name='salary_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='SalaryPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('sessions', models.PositiveIntegerField()),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('paid_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_salary_payments', to=settings.AUTH_USER_MODEL)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salary_payments', to='core.teacherprofile')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='salarypayment_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'month'), name='salary_one_per_month')],
+            },
+        ),
+    ]
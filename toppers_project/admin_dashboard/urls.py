@@ -4,19 +4,28 @@ from . import views
 urlpatterns = [
     path('', views.admin_dashboard, name='admin_dashboard'),
     path('pending-registrations/', views.pending_registrations, name='pending_registrations'),
+    path('bulk-registration-action/', views.bulk_registration_action, name='bulk_registration_action'),
     path('approve-registration/<int:user_id>/', views.approve_registration, name='approve_registration'),
     path('reject-registration/<int:user_id>/', views.reject_registration, name='reject_registration'),
     path('all-students/', views.all_students, name='all_students'),
     path('edit-student/<int:user_id>/', views.edit_student, name='edit_student'),
+    path('student-fees/<int:user_id>/', views.student_fee_payments, name='student_fee_payments'),
     path('delete-student/<int:user_id>/', views.delete_student, name='delete_student'),
     path('add-student/', views.add_student, name='add_student'),
     path('complete-add-student/<int:user_id>/', views.complete_add_student, name='complete_add_student'),
+    path('import-users/', views.import_users, name='import_users'),
     path('all-teachers/', views.all_teachers, name='all_teachers'),
     path('edit-teacher/<int:user_id>/', views.edit_teacher, name='edit_teacher'),
     path('delete-teacher/<int:user_id>/', views.delete_teacher, name='delete_teacher'),
     path('add-teacher/', views.add_teacher, name='add_teacher'),
     path('complete-add-teacher/<int:user_id>/', views.complete_add_teacher, name='complete_add_teacher'),
     path('attendance/', views.attendance_view, name='attendance_view'),
+    path('export/attendance/', views.export_attendance, name='export_attendance'),
+    path('export/students/', views.export_students, name='export_students'),
+    path('export/teachers/', views.export_teachers, name='export_teachers'),
+    path('export/fee-payments/', views.export_fee_payments, name='export_fee_payments'),
+    path('fee-reports/', views.fee_reports, name='fee_reports'),
+    path('payroll/', views.payroll_run, name='payroll'),
     path('approve-profile-updates/', views.approve_profile_updates, name='approve_profile_updates'),
     path('approve-student-profile/<int:profile_id>/', views.approve_student_profile_update, name='approve_student_profile_update'),
     path('reject-student-profile/<int:profile_id>/', views.reject_student_profile_update, name='reject_student_profile_update'),
@@ -25,6 +34,8 @@ urlpatterns = [
     path('mark-notification-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
     path('timetable/', views.manage_timetable, name='manage_timetable'),
     path('add-lecture/', views.add_lecture, name='add_lecture'),
+    path('import-timetable/', views.import_timetable, name='import_timetable'),
+    path('generate-timetable/', views.generate_timetable, name='generate_timetable'),
     path('edit-lecture/<int:lecture_id>/', views.edit_lecture, name='edit_lecture'),
     path('delete-lecture/<int:lecture_id>/', views.delete_lecture, name='delete_lecture'),
     path('manage-subjects/', views.manage_subjects, name='manage_subjects'),
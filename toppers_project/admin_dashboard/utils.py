@@ -0,0 +1,91 @@
+# admin_dashboard/utils.py
+import csv
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from core import counters
+from core.models import CustomUser, Notification, Lecture
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """Stream ``rows`` (any iterable of tuples) to the client as a CSV file.
+
+    Each line is produced on demand, so with a queryset ``.iterator()`` as
+    the source the worker never holds more than one chunk in memory.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def bulk_set_registration_status(users, status):
+    """Approve or reject every pending user in ``users`` at once.
+
+    One locking read of the affected rows, one ``UPDATE ... WHERE id IN
+    (...)`` and one ``bulk_create`` of notifications, all in a single
+    transaction. The rows stay locked until it commits, so an overlapping
+    bulk action or single approval waits and then no longer sees them as
+    pending: each user is notified and counted once. Signals don't fire for
+    queryset updates, so the dashboard counters are moved here. Returns the
+    number of users changed.
+    """
+    with transaction.atomic():
+        rows = list(
+            users.filter(status='pending').select_for_update()
+            .values_list('id', 'role', 'first_name', 'last_name', 'username')
+        )
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        CustomUser.objects.filter(id__in=ids, status='pending').update(status=status, updated_at=timezone.now())
+
+        notifications = []
+        for user_id, role, first_name, last_name, username in rows:
+            name = f'{first_name} {last_name}'.strip() or username
+            notifications.append(Notification(
+                user_id=user_id,
+                notification_type='registration',
+                title=f'Registration {status.title()}',
+                message=f'Hi {name}, your registration has been {status} by admin.',
+            ))
+        Notification.objects.bulk_create(notifications)
+
+        counters.bump(counters.PENDING, -len(rows))
+        if status == 'approved':
+            counters.bump(counters.STUDENTS, sum(1 for row in rows if row[1] == 'student'))
+            counters.bump(counters.TEACHERS, sum(1 for row in rows if row[1] == 'teacher'))
+        counters.bump_many([counters.unread_key(user_id) for user_id in ids], 1)
+    return len(rows)
+
+
+def timetable_grid(rows):
+    """Lay out import-format lecture rows (core/timetable_import.py) as one
+    day x start-time grid per batch, for previews. Returns (starts, grids)."""
+    starts = sorted({row['start_time'] for row in rows})
+    cells = {}
+    for row in rows:
+        cells.setdefault(row['batch'], {})[(row['day'], row['start_time'])] = row
+    grids = [
+        {
+            'batch': batch,
+            'days': [(day, [by_slot.get((day, start)) for start in starts]) for day, _ in Lecture.DAYS],
+        }
+        for batch, by_slot in cells.items()
+    ]
+    return starts, grids
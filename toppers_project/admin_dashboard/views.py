@@ -1,11 +1,26 @@
+import csv
 import datetime
+import io
+import json
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q
-from core.models import CustomUser, StudentProfile, TeacherProfile, Notification, Lecture, Subject, Batch
-from core.forms import StudentProfileForm, TeacherProfileForm, LectureForm, SubjectForm, BatchForm
+from django.views.decorators.http import require_POST
+from django.db import IntegrityError
+from django.db.models import F
+from core.models import CustomUser, StudentProfile, TeacherProfile, FeePayment, Notification, Lecture, Subject, Batch
+from core.forms import StudentProfileForm, TeacherProfileForm, FeePaymentForm, LectureForm, SubjectForm, BatchForm
+from core import counters, fees, ical, payroll, timetable_cache
+from core.fee_reports import fee_reports as fee_report_data
+from core.search import search_users
+from core.importers import UserImporter
+from core.timetable_import import TimetableImporter, read_rows
+from core.timetable_generator import DEFAULT_HOURS, TIME_BUDGET, availability_from_rows, load_problem, solve
+from admin_dashboard.utils import stream_csv, EXPORT_CHUNK_SIZE, bulk_set_registration_status, timetable_grid
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 
 def admin_required(view_func):
     """Decorator to check if user is admin"""
@@ -21,35 +36,87 @@ def admin_required(view_func):
 def admin_dashboard(request):
     """Admin dashboard home"""
     notifications_qs = Notification.objects.filter(user=request.user,is_read=False).order_by('-created_at')
-    unread_count = notifications_qs.count()
     notifications = notifications_qs[:10]  # Show latest 10 notifications
     
-    total_students = CustomUser.objects.filter(role='student', status='approved').count()
-    total_teachers = CustomUser.objects.filter(role='teacher', status='approved').count()
-    pending_approvals = CustomUser.objects.filter(status='pending').count()
+    # materialized counters (core/counters.py) instead of COUNT(*) per request
+    unread_key = counters.unread_key(request.user.id)
+    counts = counters.read(counters.STUDENTS, counters.TEACHERS, counters.PENDING, unread_key)
     
     context = {
         'notifications': notifications,
-        'unread_count': unread_count,
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'pending_approvals': pending_approvals,
+        'unread_count': counts[unread_key],
+        'total_students': counts[counters.STUDENTS],
+        'total_teachers': counts[counters.TEACHERS],
+        'pending_approvals': counts[counters.PENDING],
     }
     return render(request, 'admin_dashboard/dashboard.html', context)
 
 
+def _search_students(search):
+    """Approved students matching the all_students search box (core/search.py)"""
+    students = CustomUser.objects.filter(role='student', status='approved').select_related('student_profile__batch')
+    if search:
+        students = search_users(students, search, 'student', 'student_profile__enrollment_number')
+    return students
+
+
+def _search_teachers(search):
+    """Approved teachers matching the all_teachers search box"""
+    teachers = CustomUser.objects.filter(role='teacher', status='approved').select_related('teacher_profile')
+    if search:
+        teachers = search_users(teachers, search, 'teacher', 'teacher_profile__employee_id')
+    return teachers
+
+
 @login_required(login_url='login')
 @admin_required
 def pending_registrations(request):
     """View pending registrations"""
-    pending_users = CustomUser.objects.filter(status='pending').order_by('-created_at')
+    role = request.GET.get('role', '')
+    pending_users = _pending_users(role)
     
     context = {
         'pending_users': pending_users,
+        'role': role,
     }
     return render(request, 'admin_dashboard/pending_registrations.html', context)
 
 
+def _pending_users(role):
+    """Pending registrations, optionally narrowed to one role"""
+    pending_users = CustomUser.objects.filter(status='pending').order_by('-created_at')
+    if role in ('student', 'teacher'):
+        pending_users = pending_users.filter(role=role)
+    return pending_users
+
+
+@login_required(login_url='login')
+@admin_required
+@require_POST
+def bulk_registration_action(request):
+    """Approve or reject the selected (or all matching) pending registrations"""
+    action = request.POST.get('action')
+    role = request.POST.get('role', '')
+    if action not in ('approve', 'reject'):
+        messages.error(request, 'Unknown action!')
+        return redirect('pending_registrations')
+    
+    if request.POST.get('select_all'):
+        users = _pending_users(role)
+    else:
+        ids = [int(pk) for pk in request.POST.getlist('user_ids') if pk.isdigit()]
+        users = CustomUser.objects.filter(id__in=ids)
+    
+    status = 'approved' if action == 'approve' else 'rejected'
+    count = bulk_set_registration_status(users, status)
+    messages.success(request, f'{count} registration(s) {status}!')
+    
+    response = redirect('pending_registrations')
+    if role in ('student', 'teacher'):
+        response['Location'] += '?' + urlencode({'role': role})
+    return response
+
+
 @login_required(login_url='login')
 @admin_required
 def approve_registration(request, user_id):
@@ -82,16 +149,8 @@ def reject_registration(request, user_id):
 @admin_required
 def all_students(request):
     """View all students"""
-    students = CustomUser.objects.filter(role='student', status='approved')
     search = request.GET.get('search', '')
-    
-    if search:
-        students = students.filter(
-            Q(first_name__icontains=search) |
-            Q(last_name__icontains=search) |
-            Q(student_profile__enrollment_number__icontains=search) |
-            Q(email__icontains=search)
-        )
+    students = _search_students(search)
     
     context = {
         'students': students,
@@ -128,13 +187,10 @@ def edit_student(request, user_id):
             profile.user = student_user
             profile.profile_update_status = 'approved'
             
-            # Update fees
-            total_fees = request.POST.get('total_fees', 0)
-            fees_paid = request.POST.get('fees_paid', 0)
+            # Update fees; payments go through the ledger (student_fee_payments)
             try:
-                profile.total_fees = float(total_fees)
-                profile.fees_paid = float(fees_paid)
-            except:
+                profile.total_fees = Decimal(request.POST.get('total_fees', 0))
+            except InvalidOperation:
                 pass
             profile.save()
             messages.success(request, 'Student details updated successfully!')
@@ -152,6 +208,45 @@ def edit_student(request, user_id):
     return render(request, 'admin_dashboard/edit_student.html', context)
 
 
+@login_required(login_url='login')
+@admin_required
+def student_fee_payments(request, user_id):
+    """Record a fee payment and list a student's payments (see core/fees.py)"""
+    student_user = get_object_or_404(CustomUser, id=user_id, role='student')
+    try:
+        student_profile = student_user.student_profile
+    except StudentProfile.DoesNotExist:
+        return redirect('complete_add_student', user_id=user_id)
+
+    if request.method == 'POST':
+        form = FeePaymentForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                payment, created = fees.record_payment(
+                    student_profile.pk, data['amount'], data['mode'], recorded_by=request.user,
+                    idempotency_key=data['idempotency_key'], receipt=data['receipt_number'], note=data['note'],
+                )
+            except IntegrityError:
+                form.add_error('receipt_number', 'This receipt number is already used.')
+            else:
+                if created:
+                    messages.success(request, f'Payment of ₹{payment.amount} recorded (receipt {payment.receipt_number}).')
+                else:
+                    messages.info(request, f'This payment was already recorded (receipt {payment.receipt_number}).')
+                return redirect('student_fee_payments', user_id=user_id)
+    else:
+        form = FeePaymentForm(initial={'idempotency_key': fees.new_idempotency_key()})
+
+    context = {
+        'form': form,
+        'student_user': student_user,
+        'student_profile': student_profile,
+        'payments': student_profile.fee_payments.select_related('recorded_by'),
+    }
+    return render(request, 'admin_dashboard/student_fee_payments.html', context)
+
+
 @login_required(login_url='login')
 @admin_required
 def delete_student(request, user_id):
@@ -228,20 +323,41 @@ def complete_add_student(request, user_id):
     return render(request, 'admin_dashboard/complete_add_student.html', context)
 
 
+@login_required(login_url='login')
+@admin_required
+def import_users(request):
+    """Bulk import students or teachers from a CSV upload (see core/importers.py)"""
+    role = request.POST.get('role') or request.GET.get('role', 'student')
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if role not in ('student', 'teacher') or not upload:
+            messages.error(request, 'Choose a role and a CSV file to import.')
+        else:
+            dry_run = bool(request.POST.get('dry_run'))
+            # hash in this process: a pool per upload would fork a worker per CPU
+            # from the web server; large files go through manage.py import_users
+            importer = UserImporter(role, dry_run=dry_run, workers=1)
+            result = importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+            if dry_run:
+                messages.info(request, f'Dry run: {result.created} of {result.rows} rows are valid, nothing was saved.')
+            else:
+                messages.success(request, f'{result.created} of {result.rows} {role}s imported!')
+    
+    context = {
+        'role': role,
+        'result': result,
+    }
+    return render(request, 'admin_dashboard/import_users.html', context)
+
+
 @login_required(login_url='login')
 @admin_required
 def all_teachers(request):
     """View all teachers"""
-    teachers = CustomUser.objects.filter(role='teacher', status='approved')
     search = request.GET.get('search', '')
-    
-    if search:
-        teachers = teachers.filter(
-            Q(first_name__icontains=search) |
-            Q(last_name__icontains=search) |
-            Q(teacher_profile__employee_id__icontains=search) |
-            Q(email__icontains=search)
-        )
+    teachers = _search_teachers(search)
     
     context = {
         'teachers': teachers,
@@ -278,13 +394,10 @@ def edit_teacher(request, user_id):
             profile.user = teacher_user
             profile.profile_update_status = 'approved'
             
-            # Update salary
-            salary = request.POST.get('salary', 0)
-            salary_paid = request.POST.get('salary_paid', 0)
+            # Update salary; payments go through the payroll run (core/payroll.py)
             try:
-                profile.salary = float(salary)
-                profile.salary_paid = float(salary_paid)
-            except:
+                profile.salary = Decimal(request.POST.get('salary', 0))
+            except InvalidOperation:
                 pass
             
             profile.save()
@@ -383,23 +496,167 @@ def complete_add_teacher(request, user_id):
 @admin_required
 def attendance_view(request):
     """View attendance records"""
-    filter_type = request.GET.get('filter', 'date')
-    
     from attendance.models import AttendanceRecord
-    attendance_records = AttendanceRecord.objects.all().order_by('-date')
-    
-    if filter_type == 'student':
-        student_id = request.GET.get('student_id', '')
-        if student_id:
-            attendance_records = attendance_records.filter(student_id=student_id)
-    
+    from attendance.utils import filter_attendance, keyset_page
+
+    attendance_records = AttendanceRecord.objects.select_related('student', 'lecture__subject')
+    attendance_records, filters = filter_attendance(attendance_records, request.GET)
+    records, newer_cursor, older_cursor = keyset_page(
+        attendance_records,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+    # filter querystring carried over to the pagination links
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+
     context = {
-        'attendance_records': attendance_records,
-        'filter_type': filter_type,
+        'attendance_records': records,
+        'filters': filters,
+        'filter_query': params.urlencode(),
+        'newer_cursor': newer_cursor,
+        'older_cursor': older_cursor,
+        'batches': Batch.objects.all(),
+        'subjects': Subject.objects.all(),
     }
     return render(request, 'admin_dashboard/attendance_view.html', context)
 
 
+# exports stream straight from a server-side iterator, see admin_dashboard/utils.py
+@login_required(login_url='login')
+@admin_required
+def export_attendance(request):
+    """Export attendance records as CSV (same filters as attendance_view)"""
+    from attendance.models import AttendanceRecord
+    from attendance.utils import filter_attendance
+
+    records, _ = filter_attendance(AttendanceRecord.objects.all(), request.GET)
+    rows = records.order_by('-date', '-id').values_list(
+        'date', 'student__username', 'student__first_name', 'student__last_name',
+        'lecture__batch__name', 'lecture__subject__name', 'status',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Date', 'Username', 'First Name', 'Last Name', 'Batch', 'Subject', 'Status']
+    return stream_csv('attendance.csv', header, rows)
+
+
+@login_required(login_url='login')
+@admin_required
+def export_students(request):
+    """Export students with their fees as CSV (same search as all_students)"""
+    students = _search_students(request.GET.get('search', ''))
+    rows = students.annotate(
+        fees_remaining=F('student_profile__total_fees') - F('student_profile__fees_paid'),
+    ).order_by('id').values_list(
+        'username', 'first_name', 'last_name', 'email', 'phone',
+        'student_profile__enrollment_number', 'student_profile__batch__name',
+        'student_profile__total_fees', 'student_profile__fees_paid', 'fees_remaining',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Username', 'First Name', 'Last Name', 'Email', 'Phone',
+              'Enrollment #', 'Batch', 'Total Fees', 'Fees Paid', 'Fees Remaining']
+    return stream_csv('students.csv', header, rows)
+
+
+@login_required(login_url='login')
+@admin_required
+def export_teachers(request):
+    """Export teachers with their salary as CSV (same search as all_teachers)"""
+    teachers = _search_teachers(request.GET.get('search', ''))
+    rows = teachers.order_by('id').values_list(
+        'username', 'first_name', 'last_name', 'email', 'phone',
+        'teacher_profile__employee_id', 'teacher_profile__experience',
+        'teacher_profile__salary', 'teacher_profile__salary_paid',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Username', 'First Name', 'Last Name', 'Email', 'Phone',
+              'Employee ID', 'Experience', 'Salary', 'Salary Paid']
+    return stream_csv('teachers.csv', header, rows)
+
+
+@login_required(login_url='login')
+@admin_required
+def export_fee_payments(request):
+    """Export the fee ledger, one row per payment, as CSV (same batch filter as fee_reports)"""
+    payments = FeePayment.objects.all()
+    batch_id = request.GET.get('batch')
+    if batch_id and batch_id.isdigit():
+        payments = payments.filter(student__batch_id=int(batch_id))
+    rows = payments.order_by('paid_at', 'id').values_list(
+        'paid_on', 'receipt_number', 'student__enrollment_number', 'student__user__username',
+        'student__user__first_name', 'student__user__last_name', 'student__batch__name',
+        'amount', 'mode', 'recorded_by__username', 'note',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    header = ['Date', 'Receipt #', 'Enrollment #', 'Username', 'First Name', 'Last Name', 'Batch',
+              'Amount', 'Mode', 'Recorded By', 'Note']
+    return stream_csv('fee_payments.csv', header, rows)
+
+
+@login_required(login_url='login')
+@admin_required
+def fee_reports(request):
+    """Outstanding fees by batch, top defaulters and daily collection (see core/fee_reports.py)"""
+    batch_id = request.GET.get('batch')
+    batch_id = int(batch_id) if batch_id and batch_id.isdigit() else None
+    reports = fee_report_data(batch_id=batch_id, refresh=bool(request.GET.get('refresh')))
+    context = {
+        **reports,
+        'batch_id': batch_id,
+        'collection_peak': max((day['amount'] for day in reports['collection']), default=0),
+        'collection_total': sum(day['amount'] for day in reports['collection']),
+    }
+    return render(request, 'admin_dashboard/fee_reports.html', context)
+
+
+@login_required(login_url='login')
+@admin_required
+def payroll_run(request):
+    """Subject hourly rates and the monthly payroll from delivered lectures (see core/payroll.py)"""
+    last_month = (datetime.now().date().replace(day=1) - timedelta(days=1)).replace(day=1)
+    try:
+        month = datetime.strptime(request.POST.get('month') or request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = last_month
+    subjects = list(Subject.objects.order_by('name'))
+
+    if request.method == 'POST':
+        if request.POST.get('action') == 'rates':
+            changed = []
+            for subject in subjects:
+                try:
+                    rate = Decimal(request.POST.get(f'rate_{subject.id}', subject.hourly_rate))
+                except InvalidOperation:
+                    continue
+                if rate >= 0 and rate != subject.hourly_rate:
+                    subject.hourly_rate = rate
+                    changed.append(subject)
+            # a rate doesn't show on any timetable, so the Subject save signals are not needed
+            Subject.objects.bulk_update(changed, ['hourly_rate'])
+            messages.success(request, f'{len(changed)} hourly rate(s) updated.')
+        else:
+            try:
+                result = payroll.run(month, recorded_by=request.user)
+            except ValueError as error:
+                messages.error(request, f'{error}: a month can be paid once it has ended.')
+                return redirect(f"{reverse('payroll')}?month={month:%Y-%m}")
+            if result.paid:
+                messages.success(request, f'Paid ₹{result.total} to {len(result.paid)} teacher(s) for {month:%B %Y}.')
+            else:
+                messages.info(request, f'Nobody left to pay for {month:%B %Y}.')
+            if result.unpaid:
+                messages.warning(request, f'{len(result.unpaid)} teacher(s) not paid: they taught subjects without an hourly rate (or have no profile). Set the rates and pay again.')
+        return redirect(f"{reverse('payroll')}?month={month:%Y-%m}")
+
+    preview = payroll.run(month, dry_run=True)
+    context = {
+        'month': month,
+        'last_month': last_month,
+        'month_over': payroll.is_over(month),
+        'subjects': subjects,
+        'preview': preview,
+    }
+    return render(request, 'admin_dashboard/payroll.html', context)
+
+
 @login_required(login_url='login')
 @admin_required
 def approve_profile_updates(request):
@@ -482,10 +739,14 @@ def mark_notification_read(request, notification_id):
 @admin_required
 def manage_timetable(request):
     """View and manage timetable"""
-    lectures = Lecture.objects.all().order_by('day', 'start_time')
+    # batch by batch in week order, from the per-batch timetable cache
+    batches = list(Batch.objects.order_by('id').values_list('id', 'name'))
+    timetables = timetable_cache.batch_timetables([pk for pk, _ in batches])
+    lectures = [lecture for rows in timetables.values() for lecture in rows]
     
     context = {
         'lectures': lectures,
+        'batch_feeds': [(name, ical.feed_url(request, 'batch', pk)) for pk, name in batches],
     }
     return render(request, 'admin_dashboard/manage_timetable.html', context)
 
@@ -507,6 +768,89 @@ def add_lecture(request):
 
     return render(request, 'admin_dashboard/add_lecture.html', context)
 
+
+@login_required
+@admin_required
+def import_timetable(request):
+    """Load a whole timetable from a CSV / JSON upload (see core/timetable_import.py)"""
+    result = None
+    dry_run = True
+
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Choose a CSV or JSON file to import.')
+        else:
+            dry_run = bool(request.POST.get('dry_run'))
+            try:
+                rows = read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), name=upload.name)
+            except (ValueError, csv.Error) as exc:
+                messages.error(request, str(exc))
+            else:
+                result = TimetableImporter(dry_run=dry_run).run(rows)
+                if result.errors:
+                    messages.error(request, f'{result.failed} of {result.rows} rows have problems, nothing was saved.')
+                elif dry_run:
+                    messages.info(request, f'Dry run: all {result.rows} lectures are valid, nothing was saved.')
+                else:
+                    messages.success(request, f'{result.created} lectures imported!')
+
+    context = {
+        'result': result,
+        'dry_run': dry_run,
+    }
+    return render(request, 'admin_dashboard/import_timetable.html', context)
+
+
+@login_required
+@admin_required
+def generate_timetable(request):
+    """Generate the weekly timetable around the saved one (core/timetable_generator.py),
+    preview it, then save it through the timetable importer"""
+    hours = request.POST.get('hours') or DEFAULT_HOURS
+    time_budget = request.POST.get('time_budget') or TIME_BUDGET
+    context = {'hours': hours, 'time_budget': time_budget}
+
+    if request.method == 'POST' and request.POST.get('action') == 'apply':
+        try:
+            rows = read_rows(io.StringIO(request.POST.get('rows', '')), format='json')
+        except ValueError:
+            rows = []
+        result = TimetableImporter().run(rows)
+        if rows and not result.errors:
+            messages.success(request, f'{result.created} lectures saved!')
+            return redirect('manage_timetable')
+        messages.error(request, 'The timetable changed since the preview; nothing was saved. Generate again.')
+        context['result'] = result
+
+    elif request.method == 'POST':
+        try:
+            hours = int(hours)
+            time_budget = min(float(time_budget), 30.0)
+            availability = None
+            upload = request.FILES.get('availability')
+            if upload:
+                availability = availability_from_rows(
+                    read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), format='csv')
+                )
+        except (ValueError, csv.Error) as exc:
+            messages.error(request, str(exc))
+        else:
+            batch_ids = [int(pk) for pk in request.POST.getlist('batches') if pk.isdigit()] or None
+            problem = load_problem(batch_ids, hours, availability=availability)
+            solution = solve(problem, time_budget=time_budget)
+            rows = solution.rows(problem)
+            context['slot_starts'], context['grids'] = timetable_grid(rows)
+            context.update({
+                'solution': solution,
+                'unplaced': solution.describe_unplaced(),
+                'rows_json': json.dumps(rows),
+                'selected': batch_ids or [],
+            })
+
+    context['batches'] = Batch.objects.order_by('name')
+    return render(request, 'admin_dashboard/generate_timetable.html', context)
+
 @login_required
 @admin_required
 def edit_lecture(request, lecture_id):
@@ -0,0 +1,143 @@
+# attendance/alerts.py
+"""
+Low-attendance alerts.
+
+Every approved student is evaluated at once from the StudentMonthlyAttendance
+rollups: one grouped query finds the (student, subject) pairs below the
+threshold, a second one the students below it overall. Pairs already alerted
+in the current window (the calendar month) are skipped, so the job can run
+every hour; the rest are written with bulk_create together with one
+notification per student and a digest for the admin.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import transaction
+from django.db.models import ExpressionWrapper, IntegerField, Sum
+
+from core import counters
+from core.models import CustomUser, Notification
+from attendance.models import AttendanceAlert, StudentMonthlyAttendance
+
+ALERT_THRESHOLD = 75  # percent
+ALERT_MIN_CLASSES = 8  # don't judge on fewer classes than this
+
+
+@dataclass
+class LowAttendance:
+    student_id: int
+    student_name: str
+    subject_id: int = None  # None: overall attendance
+    subject_name: str = ''
+    present: int = 0
+    total: int = 0
+
+    @property
+    def percentage(self):
+        return self.present / self.total * 100
+
+
+def _month_start(day, months_back=0):
+    month = day.year * 12 + day.month - 1 - months_back
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def find_low_attendance(since, threshold=ALERT_THRESHOLD, min_classes=ALERT_MIN_CLASSES):
+    """Students below ``threshold`` percent since ``since`` (a month start),
+    per subject and overall. Two queries, filtered in the database."""
+    rollups = StudentMonthlyAttendance.objects.filter(
+        month__gte=since,
+        student__role='student',
+        student__status='approved',
+    )
+    below = {
+        'attended': Sum('present'),
+        'classes': Sum('total'),
+        # total * threshold > present * 100, kept in integers
+        'shortfall': ExpressionWrapper(
+            Sum('total') * threshold - Sum('present') * 100, output_field=IntegerField()
+        ),
+    }
+    student_fields = ('student_id', 'student__first_name', 'student__last_name', 'student__username')
+
+    found = []
+    per_subject = (
+        rollups.values(*student_fields, 'subject_id', 'subject__name')
+        .annotate(**below).filter(classes__gte=min_classes, shortfall__gt=0).order_by()
+    )
+    overall = (
+        rollups.values(*student_fields)
+        .annotate(**below).filter(classes__gte=min_classes, shortfall__gt=0).order_by()
+    )
+    for row in [*per_subject, *overall]:
+        name = f"{row['student__first_name']} {row['student__last_name']}".strip() or row['student__username']
+        found.append(LowAttendance(
+            student_id=row['student_id'],
+            student_name=name,
+            subject_id=row.get('subject_id'),
+            subject_name=row.get('subject__name', ''),
+            present=row['attended'],
+            total=row['classes'],
+        ))
+    return found
+
+
+def send_low_attendance_alerts(today=None, months=1, threshold=ALERT_THRESHOLD,
+                               min_classes=ALERT_MIN_CLASSES, dry_run=False):
+    """Alert every student below the threshold over the last ``months``
+    calendar months (the current one included), once per window.
+
+    Returns the list of new LowAttendance entries (what would be sent, with
+    ``dry_run``).
+    """
+    today = today or date.today()
+    window = _month_start(today)
+    found = find_low_attendance(_month_start(today, months - 1), threshold, min_classes)
+
+    sent = set(AttendanceAlert.objects.filter(window=window).values_list('student_id', 'subject_id'))
+    new = [entry for entry in found if (entry.student_id, entry.subject_id) not in sent]
+    if dry_run or not new:
+        return new
+
+    by_student = {}
+    for entry in new:
+        by_student.setdefault(entry.student_id, []).append(entry)
+
+    with transaction.atomic():
+        AttendanceAlert.objects.bulk_create([
+            AttendanceAlert(
+                student_id=entry.student_id,
+                subject_id=entry.subject_id,
+                window=window,
+                present=entry.present,
+                total=entry.total,
+            )
+            for entry in new
+        ], ignore_conflicts=True, batch_size=2000)
+
+        notifications = []
+        for student_id, entries in by_student.items():
+            lines = [
+                f"{entry.subject_name or 'Overall'}: {entry.percentage:.1f}% ({entry.present}/{entry.total})"
+                for entry in entries
+            ]
+            notifications.append(Notification(
+                user_id=student_id,
+                notification_type='low_attendance',
+                title='Low Attendance',
+                message=f"Hi {entries[0].student_name}, your attendance is below {threshold}%. " + '; '.join(lines),
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=2000)
+        counters.bump_many([counters.unread_key(student_id) for student_id in by_student], 1)
+
+        admin = CustomUser.objects.filter(role='admin').first()
+        if admin:
+            names = sorted({entry.student_name for entry in new})
+            more = f' and {len(names) - 10} more' if len(names) > 10 else ''
+            Notification.objects.create(
+                user=admin,
+                notification_type='low_attendance',
+                title=f'Low Attendance - {len(by_student)} students',
+                message=f"Below {threshold}% this period: {', '.join(names[:10])}{more}.",
+            )
+    return new
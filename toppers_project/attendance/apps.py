@@ -1,6 +1,13 @@
+from pathlib import Path
 from django.apps import AppConfig
 
 
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+    # app code lives inside toppers_project/, point Django here so that
+    # management commands are discovered
+    path = str(Path(__file__).resolve().parent)
+
+    def ready(self):
+        import attendance.signals
@@ -0,0 +1,86 @@
+"""
+Benchmark the bulk attendance write path
+Usage: python manage.py benchmark_attendance --sizes 30 120 480
+"""
+import time
+from datetime import time as dtime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core.models import CustomUser, StudentProfile, Lecture, Subject, Batch
+from attendance.utils import bulk_mark_attendance, load_roster, latest_session
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure mark_attendance write latency and query count per batch size (nothing is kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[30, 120, 480, 1920])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'students':>9} {'first write':>12} {'re-mark':>10} {'queries':>8} {'roster q':>9}")
+        try:
+            with transaction.atomic():
+                for size in options['sizes']:
+                    self._run(size, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, size, repeat):
+        tag = f'bench{size}'
+        batch = Batch.objects.create(name=f'{tag}-batch')
+        subject = Subject.objects.create(name=f'{tag}-subject')
+        teacher = CustomUser.objects.bulk_create([
+            CustomUser(username=f'{tag}-teacher', role='teacher', status='approved')
+        ])[0]
+        students = CustomUser.objects.bulk_create([
+            CustomUser(username=f'{tag}-s{i}', role='student', status='approved')
+            for i in range(size)
+        ])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(user=s, enrollment_number=f'{tag}-{s.id}', batch=batch)
+            for s in students
+        ])
+        student_ids = [s.id for s in students]
+
+        # one weekly lecture; every repeat marks an earlier session of it, so
+        # the per-session write is measured against a growing history
+        lecture = Lecture.objects.create(
+            teacher=teacher, subject=subject, batch=batch,
+            start_time=dtime(9), end_time=dtime(10), topic=tag,
+        )
+        latest = latest_session(lecture)
+        first_times, remark_times, queries, roster_queries = [], [], 0, 0
+        for week in range(repeat):
+            session_date = latest - timedelta(weeks=week)
+            statuses = {sid: 'present' for sid in student_ids}
+
+            start = time.perf_counter()
+            bulk_mark_attendance(lecture, statuses, session_date)
+            first_times.append(time.perf_counter() - start)
+
+            # flip every other student so the second pass is a real update
+            for sid in student_ids[::2]:
+                statuses[sid] = 'absent'
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                bulk_mark_attendance(lecture, statuses, session_date)
+                remark_times.append(time.perf_counter() - start)
+            queries = len(ctx.captured_queries)
+
+            # the GET page must load roster + statuses in a single query
+            with CaptureQueriesContext(connection) as ctx:
+                roster = list(load_roster(lecture, session_date))
+            roster_queries = len(ctx.captured_queries)
+            if len(roster) != size or roster_queries != 1:
+                raise CommandError(f'load_roster took {roster_queries} queries for {size} students')
+
+        first = sorted(first_times)[len(first_times) // 2] * 1000
+        remark = sorted(remark_times)[len(remark_times) // 2] * 1000
+        self.stdout.write(f'{size:>9} {first:>10.2f}ms {remark:>8.2f}ms {queries:>8} {roster_queries:>9}')
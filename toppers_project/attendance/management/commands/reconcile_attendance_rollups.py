@@ -0,0 +1,24 @@
+"""
+Rebuild the attendance rollup tables from the raw attendance records
+Usage: python manage.py reconcile_attendance_rollups [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from attendance import rollups
+
+
+class Command(BaseCommand):
+    help = 'Compare the attendance rollups with AttendanceRecord and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report rows that are out of step')
+
+    def handle(self, *args, **options):
+        students, batches = rollups.rebuild(dry_run=options['dry_run'])
+        self.stdout.write(f'  student/subject/month rows out of step: {students}')
+        self.stdout.write(f'  batch/subject/date rows out of step: {batches}')
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing written')
+        elif students or batches:
+            self.stdout.write(self.style.SUCCESS('✓ Rollups rebuilt'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Rollups already in step'))
@@ -0,0 +1,45 @@
+"""
+Notify students (and the admin) about low attendance
+Usage: python manage.py send_attendance_alerts [--threshold 75 --min-classes 8 --months 1 --dry-run]
+
+Safe to run every hour: each student is alerted at most once per subject
+(and once overall) per calendar month.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from attendance.alerts import send_low_attendance_alerts, ALERT_THRESHOLD, ALERT_MIN_CLASSES
+
+
+class Command(BaseCommand):
+    help = 'Send low-attendance alerts for every student below the threshold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=ALERT_THRESHOLD, help='Percent')
+        parser.add_argument('--min-classes', type=int, default=ALERT_MIN_CLASSES)
+        parser.add_argument('--months', type=int, default=1, help='Calendar months evaluated, current one included')
+        parser.add_argument('--dry-run', action='store_true', help='List the alerts without sending them')
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 100:
+            raise CommandError('--threshold must be between 1 and 100')
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+
+        started = time.perf_counter()
+        alerts = send_low_attendance_alerts(
+            months=options['months'],
+            threshold=options['threshold'],
+            min_classes=options['min_classes'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            for alert in alerts:
+                self.stdout.write(
+                    f"  {alert.student_name}: {alert.subject_name or 'overall'} "
+                    f"{alert.percentage:.1f}% ({alert.present}/{alert.total})"
+                )
+        students = len({alert.student_id for alert in alerts})
+        verb = 'would be sent' if options['dry_run'] else 'sent'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(alerts)} alerts for {students} students {verb} in {time.perf_counter() - started:.2f}s'
+        ))
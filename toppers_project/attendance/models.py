@@ -1,3 +1,4 @@
+from datetime import date
 from django.db import models
 from core.models import CustomUser, Lecture
 from django.apps import apps
@@ -10,13 +11,89 @@ class AttendanceRecord(models.Model):
     ]
     lecture = models.ForeignKey('core.Lecture', on_delete=models.CASCADE, related_name='attendance_records')
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='attendance_records', limit_choices_to={'role': 'student'})
-    date = models.DateField(auto_now_add=True)
+    # the lecture session (occurrence) this record belongs to
+    date = models.DateField(default=date.today)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='absent')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ('lecture', 'student')
         ordering = ['-date']
+        constraints = [
+            # one row per student per session; also serves the teacher's
+            # "this session" lookup (lecture, date)
+            models.UniqueConstraint(fields=['lecture', 'date', 'student'], name='attendance_one_per_session'),
+        ]
+        indexes = [
+            # keyset pagination, the student's history and the admin filters
+            models.Index(fields=['-date', '-id'], name='attendance_date_id_idx'),
+            models.Index(fields=['student', '-date', '-id'], name='attendance_student_date_idx'),
+            models.Index(fields=['lecture', '-date', '-id'], name='attendance_lecture_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.student.get_full_name()} - {self.date} - {self.status}"
\ No newline at end of file
+        return f"{self.student.get_full_name()} - {self.date} - {self.status}"
+
+# Pre-aggregated attendance, kept in step by attendance/rollups.py. Reports
+# read these instead of scanning AttendanceRecord.
+
+class StudentMonthlyAttendance(models.Model):
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_attendance')
+    subject = models.ForeignKey('core.Subject', on_delete=models.CASCADE, related_name='+')
+    month = models.DateField(help_text='First day of the month')
+    present = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'subject', 'month')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id} - {self.month:%Y-%m}: {self.present}/{self.total}"
+
+
+class BatchDailyAttendance(models.Model):
+    batch = models.ForeignKey('core.Batch', on_delete=models.CASCADE, related_name='daily_attendance')
+    subject = models.ForeignKey('core.Subject', on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('batch', 'subject', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='attendance_batch_day_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_id} - {self.subject_id} - {self.date}: {self.present}/{self.total}"
+
+
+class AttendanceAlert(models.Model):
+    """A low-attendance alert already sent, one per student / subject (or
+    overall, when subject is empty) and alert window. See attendance/alerts.py."""
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='attendance_alerts')
+    subject = models.ForeignKey('core.Subject', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    window = models.DateField(help_text='First day of the alert window')
+    present = models.PositiveIntegerField()
+    total = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'subject', 'window'],
+                condition=models.Q(subject__isnull=False),
+                name='attendance_alert_subject_once',
+            ),
+            models.UniqueConstraint(
+                fields=['student', 'window'],
+                condition=models.Q(subject__isnull=True),
+                name='attendance_alert_overall_once',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['window'], name='attendance_alert_window_idx'),
+        ]
+
+    @property
+    def percentage(self):
+        return (self.present / self.total * 100) if self.total else 0
@@ -0,0 +1,138 @@
+# attendance/rollups.py
+"""
+Attendance rollup tables.
+
+StudentMonthlyAttendance holds present / total per (student, subject, month)
+and BatchDailyAttendance per (batch, subject, date). They are moved by
+deltas as attendance is written:
+
+* bulk_mark_attendance() calls apply() with the rows it created or flipped
+  (bulk_create sends no signals);
+* single-row saves and deletes (Django admin), and cascades, which are
+  discounted once per delete, go through the receivers in
+  attendance/signals.py.
+
+Anything else that writes AttendanceRecord in bulk must call apply() itself,
+or rebuild() afterwards (``python manage.py reconcile_attendance_rollups``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+
+from attendance.models import AttendanceRecord, StudentMonthlyAttendance, BatchDailyAttendance
+
+
+def present_delta(status):
+    return 1 if status == 'present' else 0
+
+
+def apply(lecture, changes, create=True):
+    """Move the rollups of ``lecture`` (its subject and batch) by ``changes``.
+
+    ``changes`` is an iterable of ``(student_id, date, d_present, d_total)``.
+    Deltas are summed per student and month (and per day) first; students
+    sharing the same month and delta, and days sharing the same delta, are
+    then updated together, so marking a session or discounting a deleted
+    student costs a handful of queries whatever its size.
+    With ``create=False`` missing rollup rows are left alone.
+    """
+    student_deltas = defaultdict(lambda: [0, 0])  # (student_id, month) -> [d_present, d_total]
+    batch_deltas = defaultdict(lambda: [0, 0])  # date -> [d_present, d_total]
+    for student_id, day, d_present, d_total in changes:
+        if not (d_present or d_total):
+            continue
+        student_deltas[(student_id, day.replace(day=1))][0] += d_present
+        student_deltas[(student_id, day.replace(day=1))][1] += d_total
+        batch_deltas[day][0] += d_present
+        batch_deltas[day][1] += d_total
+    student_groups = defaultdict(list)  # (month, d_present, d_total) -> student ids
+    for (student_id, month), (d_present, d_total) in student_deltas.items():
+        if d_present or d_total:
+            student_groups[(month, d_present, d_total)].append(student_id)
+    batch_groups = defaultdict(list)  # (d_present, d_total) -> dates
+    for day, (d_present, d_total) in batch_deltas.items():
+        if d_present or d_total:
+            batch_groups[(d_present, d_total)].append(day)
+    if not student_groups:
+        return
+
+    subject_id = lecture.subject_id
+    with transaction.atomic():
+        if create:
+            StudentMonthlyAttendance.objects.bulk_create([
+                StudentMonthlyAttendance(student_id=student_id, subject_id=subject_id, month=month)
+                for (month, _, _), student_ids in student_groups.items()
+                for student_id in student_ids
+            ], ignore_conflicts=True)
+            BatchDailyAttendance.objects.bulk_create([
+                BatchDailyAttendance(batch_id=lecture.batch_id, subject_id=subject_id, date=day)
+                for day in batch_deltas
+            ], ignore_conflicts=True)
+        for (month, d_present, d_total), student_ids in student_groups.items():
+            StudentMonthlyAttendance.objects.filter(
+                subject_id=subject_id, month=month, student_id__in=student_ids,
+            ).update(present=F('present') + d_present, total=F('total') + d_total)
+        for (d_present, d_total), days in batch_groups.items():
+            BatchDailyAttendance.objects.filter(
+                batch_id=lecture.batch_id, subject_id=subject_id, date__in=days,
+            ).update(present=F('present') + d_present, total=F('total') + d_total)
+
+
+def _aggregate():
+    """Fresh rollup values straight from AttendanceRecord (two GROUP BY scans)"""
+    counts = {'present': Count('id', filter=Q(status='present')), 'total': Count('id')}
+    students = {
+        (row['student_id'], row['lecture__subject_id'], row['month']): (row['present'], row['total'])
+        for row in AttendanceRecord.objects.annotate(month=TruncMonth('date'))
+        .values('student_id', 'lecture__subject_id', 'month').annotate(**counts).order_by()
+    }
+    batches = {
+        (row['lecture__batch_id'], row['lecture__subject_id'], row['date']): (row['present'], row['total'])
+        for row in AttendanceRecord.objects
+        .values('lecture__batch_id', 'lecture__subject_id', 'date').annotate(**counts).order_by()
+    }
+    return students, batches
+
+
+def _current(model, key_fields):
+    """Stored rollup values; rows decremented to zero count as absent"""
+    return {
+        row[:-2]: row[-2:]
+        for row in model.objects.exclude(total=0).values_list(*key_fields, 'present', 'total').iterator()
+    }
+
+
+def rebuild(dry_run=False):
+    """Recompute both rollup tables from the raw records.
+
+    Returns ``(student_rows_off, batch_rows_off)``: how many rollup rows were
+    missing, stale or surplus before the rebuild. With ``dry_run`` only the
+    comparison is made.
+    """
+    students, batches = _aggregate()
+    student_keys = ('student_id', 'subject_id', 'month')
+    batch_keys = ('batch_id', 'subject_id', 'date')
+    drift = []
+    for fresh, model, keys in ((students, StudentMonthlyAttendance, student_keys),
+                               (batches, BatchDailyAttendance, batch_keys)):
+        current = _current(model, keys)
+        drift.append(sum(
+            1 for key in fresh.keys() | current.keys() if fresh.get(key) != current.get(key)
+        ))
+    if dry_run or not any(drift):
+        return tuple(drift)
+
+    with transaction.atomic():
+        StudentMonthlyAttendance.objects.all().delete()
+        StudentMonthlyAttendance.objects.bulk_create([
+            StudentMonthlyAttendance(student_id=s, subject_id=sub, month=month, present=p, total=t)
+            for (s, sub, month), (p, t) in students.items()
+        ], batch_size=2000)
+        BatchDailyAttendance.objects.all().delete()
+        BatchDailyAttendance.objects.bulk_create([
+            BatchDailyAttendance(batch_id=b, subject_id=sub, date=day, present=p, total=t)
+            for (b, sub, day), (p, t) in batches.items()
+        ], batch_size=2000)
+    return tuple(drift)
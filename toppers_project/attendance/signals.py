@@ -0,0 +1,126 @@
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from core.models import Lecture
+from attendance.models import AttendanceRecord
+from attendance import rollups
+
+
+# Rollups (attendance/rollups.py) for single-row writes such as the Django
+# admin: read what the row counted as before the save, then move the rollups
+# by the difference. bulk_mark_attendance() bypasses these and calls
+# rollups.apply() itself.
+
+def _rollup_row(record):
+    """(subject_id, batch_id, student_id, date, status) of a record"""
+    if AttendanceRecord.lecture.is_cached(record):
+        subject_id, batch_id = record.lecture.subject_id, record.lecture.batch_id
+    else:
+        subject_id, batch_id = Lecture.objects.filter(pk=record.lecture_id).values_list(
+            'subject_id', 'batch_id',
+        ).first() or (None, None)
+    return subject_id, batch_id, record.student_id, record.date, record.status
+
+
+def _move(row, sign):
+    subject_id, batch_id, student_id, day, status = row
+    if subject_id is None:
+        return
+    rollups.apply(
+        Lecture(subject_id=subject_id, batch_id=batch_id),
+        [(student_id, day, sign * rollups.present_delta(status), sign)],
+        create=sign > 0,
+    )
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+def remember_rollup_row(sender, instance, **kwargs):
+    instance._rollup_row = None
+    if instance.pk:
+        instance._rollup_row = AttendanceRecord.objects.filter(pk=instance.pk).values_list(
+            'lecture__subject_id', 'lecture__batch_id', 'student_id', 'date', 'status',
+        ).first()
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_attendance_rollups(sender, instance, **kwargs):
+    new_row = _rollup_row(instance)
+    if instance._rollup_row != new_row:
+        if instance._rollup_row is not None:
+            _move(instance._rollup_row, -1)
+        _move(new_row, 1)
+
+
+# Deletes are discounted per delete() call, not per record: a cascade (a
+# student, lecture, batch or subject going away) removes many records in one
+# Collector run, which sends every pre_delete before it deletes anything. The
+# records are gathered under the run's origin, and the first post_delete
+# moves the rollups once for all of them. Rollup rows of a deleted student,
+# batch or subject are cascaded before that and simply match nothing.
+
+_pending_deletes = ContextVar('attendance_pending_deletes', default=None)
+
+
+@receiver(pre_delete, sender=AttendanceRecord)
+def collect_deleted_attendance(sender, instance, origin=None, **kwargs):
+    pending = _pending_deletes.get()
+    if pending is None:
+        pending = {}
+        _pending_deletes.set(pending)
+    # the origin is kept with its rows so its id can't be reused meanwhile
+    pending.setdefault(id(origin), (origin, []))[1].append(
+        (instance.lecture_id, instance.student_id, instance.date, instance.status)
+    )
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def discount_deleted_attendance(sender, instance, origin=None, **kwargs):
+    pending = _pending_deletes.get()
+    entry = pending.pop(id(origin), None) if pending else None
+    if entry is None:
+        return  # already discounted with the first record of this delete
+    rows = entry[1]
+    lectures = {
+        pk: (subject_id, batch_id)
+        for pk, subject_id, batch_id in Lecture.objects.filter(
+            pk__in={lecture_id for lecture_id, _, _, _ in rows},
+        ).values_list('pk', 'subject_id', 'batch_id')
+    }
+    changes = defaultdict(list)  # (subject_id, batch_id) -> removals
+    for lecture_id, student_id, day, status in rows:
+        if lecture_id in lectures:
+            changes[lectures[lecture_id]].append((student_id, day, -rollups.present_delta(status), -1))
+    for (subject_id, batch_id), removals in changes.items():
+        # removals never create rollup rows
+        rollups.apply(Lecture(subject_id=subject_id, batch_id=batch_id), removals, create=False)
+
+
+# A lecture moved to another subject or batch takes its attendance with it:
+# its records leave the old rollup rows and join the new ones.
+
+@receiver(pre_save, sender=Lecture)
+def remember_lecture_rollup_keys(sender, instance, **kwargs):
+    instance._rollup_keys = None
+    if instance.pk:
+        instance._rollup_keys = Lecture.objects.filter(pk=instance.pk).values_list('subject_id', 'batch_id').first()
+
+
+@receiver(post_save, sender=Lecture)
+def move_lecture_rollups(sender, instance, **kwargs):
+    old = instance._rollup_keys
+    if old is None or old == (instance.subject_id, instance.batch_id):
+        return
+    changes = [
+        (student_id, day, rollups.present_delta(status), 1)
+        for student_id, day, status in AttendanceRecord.objects.filter(lecture=instance).values_list(
+            'student_id', 'date', 'status',
+        )
+    ]
+    rollups.apply(
+        Lecture(subject_id=old[0], batch_id=old[1]),
+        [(student_id, day, -present, -total) for student_id, day, present, total in changes],
+        create=False,
+    )
+    rollups.apply(instance, changes)
@@ -0,0 +1,287 @@
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance import rollups
+from attendance.alerts import send_low_attendance_alerts
+from attendance.models import AttendanceAlert, AttendanceRecord, StudentMonthlyAttendance
+from attendance.utils import attendance_summary, bulk_mark_attendance, keyset_page, load_roster
+from core.middleware import query_budget
+from core.models import Batch, CustomUser, Lecture, Notification, StudentProfile, Subject
+
+SESSION = date(2026, 9, 7)
+
+
+def add_students(batch, count, status='approved'):
+    students = []
+    for _ in range(count):
+        number = CustomUser.objects.count()
+        student = CustomUser.objects.create(
+            username=f'student{number}', first_name='Student', last_name=str(number),
+            role='student', status=status,
+        )
+        StudentProfile.objects.create(
+            user=student, enrollment_number=f'EN{number}', guardian_name='Guardian',
+            guardian_phone='9999999999', batch=batch,
+        )
+        students.append(student)
+    return students
+
+
+class MarkAttendanceQueryTests(TestCase):
+    """The roster and the mark_attendance page cost the same number of
+    queries whatever the size of the batch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='JEE 2027')
+        cls.teacher = CustomUser.objects.create(username='teacher', role='teacher', status='approved')
+        cls.lecture = Lecture.objects.create(
+            teacher=cls.teacher, subject=Subject.objects.create(name='Physics'), batch=cls.batch,
+            start_time=time(9), end_time=time(10), class_date=SESSION, topic='Kinematics',
+        )
+        cls.students = add_students(cls.batch, 3)
+
+    def test_roster_is_one_query(self):
+        AttendanceRecord.objects.create(lecture=self.lecture, student=self.students[0], date=SESSION, status='present')
+        add_students(self.batch, 1, status='pending')
+        add_students(Batch.objects.create(name='NEET 2027'), 1)
+
+        with self.assertNumQueries(1):
+            roster = {student.id: student.attendance_status for student in load_roster(self.lecture, SESSION)}
+        self.assertEqual(roster, {
+            self.students[0].id: 'present',
+            self.students[1].id: 'absent',
+            self.students[2].id: 'absent',
+        })
+
+        add_students(self.batch, 20)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(load_roster(self.lecture, SESSION))), 23)
+
+    def test_roster_reads_only_its_session(self):
+        AttendanceRecord.objects.create(
+            lecture=self.lecture, student=self.students[0], date=date(2026, 8, 31), status='present',
+        )
+        statuses = {student.attendance_status for student in load_roster(self.lecture, SESSION)}
+        self.assertEqual(statuses, {'absent'})
+
+    def test_page_queries_do_not_grow_with_the_batch(self):
+        self.client.force_login(self.teacher)
+        url = reverse('mark_attendance', args=[self.lecture.id])
+
+        with query_budget(settings.QUERY_BUDGETS['mark_attendance'], 'mark_attendance') as small:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['students']), 3)
+
+        add_students(self.batch, 30)
+        with query_budget(small.queries, 'mark_attendance with 33 students'):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['students']), 33)
+
+    def test_marking_twice_updates_in_place(self):
+        self.client.force_login(self.teacher)
+        url = reverse('mark_attendance', args=[self.lecture.id])
+        data = {f'attendance_{student.id}': 'present' for student in self.students}
+
+        self.client.post(url, data)
+        data[f'attendance_{self.students[0].id}'] = 'absent'
+        with query_budget(settings.QUERY_BUDGETS['mark_attendance:POST'], 'mark_attendance:POST'):
+            self.client.post(url, data)
+
+        marked = dict(AttendanceRecord.objects.filter(lecture=self.lecture, date=SESSION).values_list('student', 'status'))
+        self.assertEqual(marked, {
+            self.students[0].id: 'absent',
+            self.students[1].id: 'present',
+            self.students[2].id: 'present',
+        })
+
+
+class RollupTests(TestCase):
+    """The rollup tables stay equal to a recount of the raw records"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='JEE 2027')
+        cls.teacher = CustomUser.objects.create(username='teacher', role='teacher', status='approved')
+        cls.physics = Subject.objects.create(name='Physics')
+        cls.lectures = [
+            Lecture.objects.create(
+                teacher=cls.teacher, subject=cls.physics, batch=cls.batch, day='Monday',
+                start_time=time(hour), end_time=time(hour + 1), topic='Kinematics',
+            )
+            for hour in (9, 11)
+        ]
+        cls.students = add_students(cls.batch, 4)
+
+    def mark(self, lecture, day, *present):
+        present = {student.id for student in present}
+        bulk_mark_attendance(lecture, {
+            student_id: 'present' if student_id in present else 'absent'
+            for student_id in load_roster(lecture, day).values_list('id', flat=True)
+        }, day)
+
+    def assertNoDrift(self):
+        self.assertEqual(rollups.rebuild(dry_run=True), (0, 0))
+
+    def test_marking_and_remarking(self):
+        self.mark(self.lectures[0], SESSION, *self.students[:2])
+        self.mark(self.lectures[1], SESSION, self.students[0])
+        self.mark(self.lectures[0], date(2026, 9, 14), *self.students)
+        self.assertNoDrift()
+        self.mark(self.lectures[0], SESSION, self.students[3])
+        self.assertNoDrift()
+
+        monthly = StudentMonthlyAttendance.objects.get(student=self.students[3], subject=self.physics)
+        self.assertEqual((monthly.present, monthly.total), (2, 3))
+
+    def test_single_record_changes(self):
+        self.mark(self.lectures[0], SESSION, *self.students)
+        record = AttendanceRecord.objects.get(lecture=self.lectures[0], student=self.students[0], date=SESSION)
+        record.status = 'absent'
+        record.save()
+        self.assertNoDrift()
+        record.delete()
+        self.assertNoDrift()
+
+    def test_cascade_deletes(self):
+        for day in (SESSION, date(2026, 9, 14), date(2026, 9, 21)):
+            self.mark(self.lectures[0], day, *self.students[:2])
+            self.mark(self.lectures[1], day, self.students[2])
+
+        self.students[0].delete()
+        self.assertNoDrift()
+        self.lectures[1].delete()
+        self.assertNoDrift()
+        AttendanceRecord.objects.filter(date=SESSION).delete()
+        self.assertNoDrift()
+        self.batch.delete()
+        self.assertNoDrift()
+        self.assertFalse(StudentMonthlyAttendance.objects.exclude(total=0).exists())
+
+    def test_cascade_delete_is_set_based(self):
+        self.mark(self.lectures[0], SESSION, *self.students)
+        self.mark(self.lectures[1], SESSION, *self.students)
+        with CaptureQueriesContext(connection) as few:
+            self.students[0].delete()
+
+        for day in (date(2026, 9, 14), date(2026, 9, 21), date(2026, 9, 28)):
+            self.mark(self.lectures[0], day, *self.students[1:])
+            self.mark(self.lectures[1], day, *self.students[1:])
+        with CaptureQueriesContext(connection) as many:
+            self.students[1].delete()
+        self.assertEqual(len(many), len(few))
+        self.assertNoDrift()
+
+    def test_summary(self):
+        chemistry = Lecture.objects.create(
+            teacher=self.teacher, subject=Subject.objects.create(name='Chemistry'), batch=self.batch, day='Monday',
+            start_time=time(13), end_time=time(14), topic='Moles',
+        )
+        student = self.students[0]
+        self.mark(self.lectures[0], SESSION, student)
+        self.mark(self.lectures[1], SESSION)
+        self.mark(chemistry, SESSION, student)
+        self.mark(self.lectures[0], date(2026, 10, 5), student)
+
+        with self.assertNumQueries(1):
+            summary = attendance_summary(student)
+        self.assertEqual((summary['present'], summary['absent'], summary['total']), (3, 1, 4))
+        self.assertEqual(summary['percentage'], 75)
+        self.assertEqual(
+            [(row['subject'], row['present'], row['total']) for row in summary['by_subject']],
+            [('Chemistry', 1, 1), ('Physics', 2, 3)],
+        )
+        self.assertEqual(
+            [(row['month'], row['present'], row['total']) for row in summary['by_month']],
+            [(date(2026, 10, 1), 1, 1), (date(2026, 9, 1), 2, 3)],
+        )
+        self.assertEqual(attendance_summary(self.students[3])['by_subject'][0]['percentage'], 0)
+
+
+class KeysetPageTests(TestCase):
+    """Walking older and then newer visits the same pages in reverse, with
+    rows on the same date split across a page boundary"""
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(name='JEE 2027')
+        teacher = CustomUser.objects.create(username='teacher', role='teacher', status='approved')
+        lecture = Lecture.objects.create(
+            teacher=teacher, subject=Subject.objects.create(name='Physics'), batch=batch, day='Monday',
+            start_time=time(9), end_time=time(10), topic='Kinematics',
+        )
+        students = add_students(batch, 2)
+        # 8 records: two per date, so pages of 3 cut between rows of one date
+        for week in range(4):
+            for student in students:
+                AttendanceRecord.objects.create(
+                    lecture=lecture, student=student, date=SESSION + timedelta(weeks=week), status='present',
+                )
+        cls.newest_first = list(AttendanceRecord.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def page(self, **cursor):
+        records, newer, older = keyset_page(AttendanceRecord.objects.all(), size=3, **cursor)
+        return [record.id for record in records], newer, older
+
+    def test_older_then_newer(self):
+        pages = [self.page()]
+        while pages[-1][2]:
+            pages.append(self.page(after=pages[-1][2]))
+        self.assertEqual([ids for ids, _, _ in pages], [
+            self.newest_first[0:3], self.newest_first[3:6], self.newest_first[6:8],
+        ])
+        self.assertIsNone(pages[0][1])
+
+        # back from the last page: each step returns the page before it, newest first
+        ids, newer, older = self.page(before=pages[2][1])
+        self.assertEqual(ids, pages[1][0])
+        self.assertEqual(self.page(after=older)[0], pages[2][0])
+        ids, newer, older = self.page(before=newer)
+        self.assertEqual(ids, pages[0][0])
+        self.assertIsNone(newer)
+        self.assertEqual(self.page(after=older)[0], pages[1][0])
+
+
+class AlertTests(TestCase):
+    """Each low (student, subject) pair and low overall attendance is alerted
+    once per month, however often the job runs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', status='approved')
+        cls.physics, chemistry = Subject.objects.create(name='Physics'), Subject.objects.create(name='Chemistry')
+        cls.low, cls.new = add_students(Batch.objects.create(name='JEE 2027'), 2)
+        for student, subject, present, total in [
+            (cls.low, cls.physics, 4, 10),
+            (cls.low, chemistry, 6, 8),  # exactly 75%: not below
+            (cls.new, cls.physics, 1, 4),  # too few classes to judge
+        ]:
+            StudentMonthlyAttendance.objects.create(
+                student=student, subject=subject, month=date(2026, 9, 1), present=present, total=total,
+            )
+
+    def alerts(self, today, **kwargs):
+        return [(entry.student_id, entry.subject_id) for entry in send_low_attendance_alerts(today, **kwargs)]
+
+    def test_alerted_once_per_window(self):
+        self.assertEqual(self.alerts(date(2026, 9, 20), dry_run=True), [(self.low.pk, self.physics.pk), (self.low.pk, None)])
+        self.assertFalse(AttendanceAlert.objects.exists())
+
+        self.assertEqual(self.alerts(date(2026, 9, 20)), [(self.low.pk, self.physics.pk), (self.low.pk, None)])
+        self.assertEqual(self.alerts(date(2026, 9, 21)), [])
+        self.assertEqual(AttendanceAlert.objects.count(), 2)
+        notification = Notification.objects.get(user=self.low)
+        self.assertIn('Physics: 40.0% (4/10)', notification.message)
+        self.assertIn('Overall: 55.6% (10/18)', notification.message)
+        self.assertEqual(Notification.objects.filter(user=self.admin, notification_type='low_attendance').count(), 1)
+
+        # a new month is a new window; September only counts when it is looked back on
+        self.assertEqual(self.alerts(date(2026, 10, 2)), [])
+        self.assertEqual(len(self.alerts(date(2026, 10, 2), months=2)), 2)
+        self.assertEqual(Notification.objects.filter(user=self.low).count(), 2)
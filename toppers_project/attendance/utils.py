@@ -0,0 +1,243 @@
+# attendance/utils.py
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
+from core.models import CustomUser
+from core.occurrences import WEEKDAYS
+from attendance.models import AttendanceRecord, StudentMonthlyAttendance
+from attendance import rollups
+
+
+def latest_session(lecture, today=None):
+    """Date of the lecture's most recent session on or before ``today``.
+
+    Special classes (``class_date`` set) have exactly one session; weekly
+    lectures have one on every ``day``.
+    """
+    today = today or date.today()
+    if lecture.class_date:
+        return lecture.class_date
+    if lecture.day not in WEEKDAYS:
+        return today
+    return today - timedelta(days=(today.weekday() - WEEKDAYS[lecture.day]) % 7)
+
+
+def is_session(lecture, day):
+    if lecture.class_date:
+        return day == lecture.class_date
+    return lecture.day not in WEEKDAYS or day.weekday() == WEEKDAYS[lecture.day]
+
+
+def resolve_session(lecture, value, today=None):
+    """Session date from a YYYY-MM-DD string, falling back to latest_session()
+    when it is missing, invalid, in the future or not a session of the lecture."""
+    today = today or date.today()
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        day = None
+    if day is None or day > today or not is_session(lecture, day):
+        return latest_session(lecture, today)
+    return day
+
+
+def load_roster(lecture, session_date):
+    """Approved students of the lecture's batch with their status for the
+    session on ``session_date``.
+
+    Each student carries ``attendance_status`` ('absent' when not marked yet),
+    resolved with a correlated subquery on the (lecture, date, student)
+    unique index, so the page costs a single query.
+    """
+    status = AttendanceRecord.objects.filter(
+        lecture=lecture,
+        date=session_date,
+        student=OuterRef('pk'),
+    ).values('status')[:1]
+
+    return CustomUser.objects.filter(
+        role='student',
+        status='approved',
+        student_profile__batch=lecture.batch_id,
+    ).select_related('student_profile').annotate(
+        attendance_status=Coalesce(Subquery(status), Value('absent')),
+    )
+
+
+def bulk_mark_attendance(lecture, statuses, session_date):
+    """Write attendance for one session of a lecture in one set-based pass.
+
+    ``statuses`` maps student id -> 'present' / 'absent'. Existing rows of
+    the session are read once, then new and changed rows go out as a single
+    upsert, so the number of queries stays the same whatever the batch size.
+    The rollup tables are moved by the same rows (see attendance/rollups.py).
+    Returns a ``(created, updated)`` tuple of counts.
+    """
+    if not statuses:
+        return 0, 0
+
+    with transaction.atomic():
+        existing = dict(
+            AttendanceRecord.objects.filter(
+                lecture=lecture,
+                date=session_date,
+                student_id__in=list(statuses),
+            ).values_list('student_id', 'status')
+        )
+
+        rows = []
+        for student_id, status in statuses.items():
+            if existing.get(student_id) == status:
+                continue  # unchanged, nothing to write
+            rows.append(AttendanceRecord(lecture=lecture, date=session_date, student_id=student_id, status=status))
+
+        if rows:
+            AttendanceRecord.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['lecture', 'date', 'student'],
+                update_fields=['status'],
+            )
+
+        changes = []
+        for row in rows:
+            if row.student_id in existing:
+                d_present = rollups.present_delta(row.status) - rollups.present_delta(existing[row.student_id])
+                changes.append((row.student_id, session_date, d_present, 0))
+            else:
+                changes.append((row.student_id, session_date, rollups.present_delta(row.status), 1))
+        rollups.apply(lecture, changes)
+
+    created = sum(1 for row in rows if row.student_id not in existing)
+    updated = len(rows) - created
+    return created, updated
+
+
+def _totals(present, total):
+    return {
+        'present': present,
+        'absent': total - present,
+        'total': total,
+        'percentage': (present / total * 100) if total > 0 else 0,
+    }
+
+
+def attendance_summary(student):
+    """Present / absent / total / percentage for one student, overall and
+    broken down by subject and by month.
+
+    Reads the student's (subject, month) rollup rows -- one small query, see
+    attendance/rollups.py -- and folds them into the three views here.
+    Returns a dict with the overall counts plus ``by_subject`` (sorted by
+    subject name) and ``by_month`` (newest first) lists of the same shape.
+    """
+    rows = StudentMonthlyAttendance.objects.filter(student=student, total__gt=0).values(
+        'subject__name', 'month', 'present', 'total',
+    )
+
+    overall = [0, 0]
+    subjects, months = {}, {}
+    for row in rows:
+        for bucket in (overall, subjects.setdefault(row['subject__name'], [0, 0]),
+                       months.setdefault(row['month'], [0, 0])):
+            bucket[0] += row['present']
+            bucket[1] += row['total']
+
+    summary = _totals(*overall)
+    summary['by_subject'] = [
+        {'subject': name, **_totals(*counts)} for name, counts in sorted(subjects.items())
+    ]
+    summary['by_month'] = [
+        {'month': month, **_totals(*counts)} for month, counts in sorted(months.items(), reverse=True)
+    ]
+    return summary
+
+
+ATTENDANCE_PAGE_SIZE = 50
+
+
+def _int_param(params, name):
+    value = params.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+def _date_param(params, name):
+    try:
+        return parse_date(params.get(name, ''))
+    except ValueError:
+        return None
+
+
+def filter_attendance(queryset, params):
+    """Apply the admin attendance filters from a GET QueryDict.
+
+    Supported keys: ``batch``, ``subject``, ``student_id`` (ids) and
+    ``date_from`` / ``date_to`` (YYYY-MM-DD). Invalid values are ignored.
+    Returns the filtered queryset and the cleaned filter values.
+    """
+    filters = {
+        'batch': _int_param(params, 'batch'),
+        'subject': _int_param(params, 'subject'),
+        'student_id': _int_param(params, 'student_id'),
+        'date_from': _date_param(params, 'date_from'),
+        'date_to': _date_param(params, 'date_to'),
+    }
+    if filters['batch']:
+        queryset = queryset.filter(lecture__batch_id=filters['batch'])
+    if filters['subject']:
+        queryset = queryset.filter(lecture__subject_id=filters['subject'])
+    if filters['student_id']:
+        queryset = queryset.filter(student_id=filters['student_id'])
+    if filters['date_from']:
+        queryset = queryset.filter(date__gte=filters['date_from'])
+    if filters['date_to']:
+        queryset = queryset.filter(date__lte=filters['date_to'])
+    return queryset, filters
+
+
+def _encode_cursor(record):
+    return f'{record.date.isoformat()}.{record.id}'
+
+
+def _decode_cursor(cursor):
+    try:
+        day, pk = cursor.split('.')
+        return date.fromisoformat(day), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, after=None, before=None, size=ATTENDANCE_PAGE_SIZE):
+    """Seek-paginate attendance records, newest first, on ``(date, id)``.
+
+    ``after`` / ``before`` are opaque cursors taken from a previous page.
+    Unlike OFFSET pagination the database jumps straight to the cursor via
+    the ``(date, id)`` index, so page 1 and page 10,000 cost the same.
+    Returns ``(records, newer_cursor, older_cursor)``; a cursor is None when
+    there is no page in that direction.
+    """
+    after, before = _decode_cursor(after), _decode_cursor(before)
+
+    if before:
+        day, pk = before
+        rows = list(
+            queryset.filter(Q(date__gt=day) | Q(date=day, id__gt=pk))
+            .order_by('date', 'id')[:size + 1]
+        )
+        has_newer = len(rows) > size
+        rows = rows[:size][::-1]
+        newer = _encode_cursor(rows[0]) if has_newer else None
+        older = _encode_cursor(rows[-1]) if rows else None
+        return rows, newer, older
+
+    if after:
+        day, pk = after
+        queryset = queryset.filter(Q(date__lt=day) | Q(date=day, id__lt=pk))
+    rows = list(queryset.order_by('-date', '-id')[:size + 1])
+    has_older = len(rows) > size
+    rows = rows[:size]
+    newer = _encode_cursor(rows[0]) if after and rows else None
+    older = _encode_cursor(rows[-1]) if has_older else None
+    return rows, newer, older
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import CustomUser, Lecture, StudentProfile, TeacherProfile, Notification, Subject, Batch
+from .models import CustomUser, FeePayment, Lecture, SalaryPayment, StudentProfile, TeacherProfile, Notification, Subject, Batch
 
 @admin.register(CustomUser)
 class CustomUserAdmin(BaseUserAdmin):
@@ -19,12 +19,44 @@ class StudentProfileAdmin(admin.ModelAdmin):
     list_filter = ('batch', 'created_at')
     search_fields = ('user__username', 'enrollment_number')
 
+@admin.register(FeePayment)
+class FeePaymentAdmin(admin.ModelAdmin):
+    """Read-only: payments are recorded through core.fees so fees_paid moves with them"""
+    list_display = ('receipt_number', 'student', 'amount', 'mode', 'paid_at', 'recorded_by')
+    list_filter = ('mode', 'paid_at')
+    search_fields = ('receipt_number', 'student__enrollment_number', 'student__user__username')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(TeacherProfile)
 class TeacherProfileAdmin(admin.ModelAdmin):
-    list_display = ('employee_id', 'user', 'experience', 'salary')
+    list_display = ('employee_id', 'user', 'experience', 'salary', 'salary_paid')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'employee_id')
 
+@admin.register(SalaryPayment)
+class SalaryPaymentAdmin(admin.ModelAdmin):
+    """Read-only: salaries are paid by the payroll run (core.payroll) so salary_paid moves with them"""
+    list_display = ('teacher', 'month', 'sessions', 'hours', 'amount', 'paid_at', 'recorded_by')
+    list_filter = ('month',)
+    search_fields = ('teacher__employee_id', 'teacher__user__username')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'notification_type', 'is_read', 'created_at')
@@ -34,7 +66,7 @@ class NotificationAdmin(admin.ModelAdmin):
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'hourly_rate')
 
 @admin.register(Batch)
 class BatchAdmin(admin.ModelAdmin):
@@ -0,0 +1,130 @@
+# core/counters.py
+"""
+Materialized admin dashboard counters.
+
+Counts live in DashboardCounter rows and are moved by +/- deltas from the
+signals in core.signals, so the dashboard reads them with one indexed lookup
+instead of running COUNT(*) over CustomUser / Notification on every request.
+Code that bypasses model signals (queryset.update(), bulk_create) must call
+bump() itself, or run ``python manage.py rebuild_counters`` afterwards.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from core.models import CustomUser, Notification, DashboardCounter
+
+STUDENTS = 'students'
+TEACHERS = 'teachers'
+PENDING = 'pending'
+
+
+USER_COUNTERS = (STUDENTS, TEACHERS, PENDING)
+
+
+def unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def user_buckets(role, status):
+    """Counter names a user with this role / status is counted in"""
+    buckets = set()
+    if status == 'approved' and role == 'student':
+        buckets.add(STUDENTS)
+    elif status == 'approved' and role == 'teacher':
+        buckets.add(TEACHERS)
+    if status == 'pending':
+        buckets.add(PENDING)
+    return buckets
+
+
+def notification_buckets(user_id, is_read):
+    return set() if is_read or user_id is None else {unread_key(user_id)}
+
+
+def _live_count(name):
+    if name == STUDENTS:
+        return CustomUser.objects.filter(role='student', status='approved').count()
+    if name == TEACHERS:
+        return CustomUser.objects.filter(role='teacher', status='approved').count()
+    if name == PENDING:
+        return CustomUser.objects.filter(status='pending').count()
+    if name.startswith('unread:'):
+        return Notification.objects.filter(user_id=int(name.split(':', 1)[1]), is_read=False).count()
+    raise ValueError(f'Unknown counter {name!r}')
+
+
+def bump(name, delta):
+    """Atomically add ``delta`` to a counter (no read-modify-write race)"""
+    if not delta:
+        return
+    updated = DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        # first touch: seed from the table, which already includes this change
+        DashboardCounter.objects.get_or_create(name=name, defaults={'value': _live_count(name)})
+
+
+def bump_many(names, delta):
+    """Add ``delta`` to several counters in one UPDATE.
+
+    Counters that don't exist yet are skipped; read() seeds them from a
+    live count, which already reflects the change.
+    """
+    if names and delta:
+        DashboardCounter.objects.filter(name__in=list(names)).update(value=F('value') + delta)
+
+
+def refresh(*names):
+    """Recount the given counters from their source tables"""
+    for name in names:
+        DashboardCounter.objects.update_or_create(name=name, defaults={'value': _live_count(name)})
+
+
+def drop(name):
+    DashboardCounter.objects.filter(name=name).delete()
+
+
+def apply_change(old_buckets, new_buckets, recount=()):
+    """Move counters for a row that went from ``old_buckets`` to ``new_buckets``.
+
+    ``old_buckets`` is None when the previous state is unknown; the
+    ``recount`` counters are then recomputed instead.
+    """
+    if old_buckets is None:
+        refresh(*recount)
+        return
+    for name in old_buckets - new_buckets:
+        bump(name, -1)
+    for name in new_buckets - old_buckets:
+        bump(name, 1)
+
+
+def read(*names):
+    """Return {name: value}; counters never seen before are seeded on the fly"""
+    values = dict(DashboardCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    for name in names:
+        if name not in values:
+            values[name] = _live_count(name)
+            DashboardCounter.objects.get_or_create(name=name, defaults={'value': values[name]})
+    return values
+
+
+def rebuild():
+    """Recompute every counter from scratch with two grouped queries"""
+    users = CustomUser.objects.aggregate(
+        students=Count('id', filter=Q(role='student', status='approved')),
+        teachers=Count('id', filter=Q(role='teacher', status='approved')),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    values = {STUDENTS: users['students'], TEACHERS: users['teachers'], PENDING: users['pending']}
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .values('user_id').annotate(total=Count('id')).order_by()
+    )
+    for row in unread:
+        values[unread_key(row['user_id'])] = row['total']
+
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(name=name, value=value) for name, value in values.items()]
+        )
+    return values
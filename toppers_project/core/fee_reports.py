@@ -0,0 +1,121 @@
+# core/fee_reports.py
+"""
+Fee collection and defaulter reports.
+
+Everything is aggregated by the database: outstanding balances come from
+StudentProfile.fees_outstanding (total_fees - fees_paid, a stored generated
+column with its own indexes), so the top defaulters are an index scan and
+the batch totals one grouped Sum. Daily collection groups the FeePayment
+ledger on its paid_on date over the covering (paid_on, mode, amount)
+index; opening balances are left out, as they weren't collected on the day
+they carry.
+
+The report page reads them through fee_reports(), which caches the whole
+set for REPORT_TTL seconds in the cache named by ``settings.REPORTS_CACHE``
+(default: ``'default'``). Numbers can lag a payment by that much; the page
+shows when they were computed and can ask for a fresh copy.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Batch, FeePayment, StudentProfile
+
+REPORT_TTL = 60
+DEFAULTERS = 20
+COLLECTION_DAYS = 30
+
+_ZERO = Value(Decimal(0), output_field=DecimalField())
+
+
+def _money(expression):
+    return Coalesce(Sum(expression), _ZERO, output_field=DecimalField())
+
+
+def _totals():
+    # written over total_fees / fees_paid rather than fees_outstanding: SQLite
+    # won't read a generated column out of an index, only from the table
+    return {
+        'students': Count('pk'),
+        'fees': _money('total_fees'),
+        'collected': _money('fees_paid'),
+        'outstanding': _money(F('total_fees') - F('fees_paid')),
+        'defaulters': Count('pk', filter=Q(total_fees__gt=F('fees_paid'))),
+    }
+
+
+def summary():
+    """Totals over every student (one aggregate)"""
+    return StudentProfile.objects.aggregate(**_totals())
+
+
+def outstanding_by_batch():
+    """Per-batch totals, largest outstanding first.
+
+    One grouped query over the (batch, fees_outstanding, total_fees,
+    fees_paid) index, plus one for the batch names -- joining Batch into the
+    aggregate would make it visit every student row.
+    """
+    rows = list(StudentProfile.objects.order_by().values('batch_id').annotate(**_totals()))
+    names = dict(Batch.objects.filter(pk__in=[row['batch_id'] for row in rows]).values_list('pk', 'name'))
+    for row in rows:
+        row['batch_name'] = names.get(row['batch_id'])
+    rows.sort(key=lambda row: (-row['outstanding'], row['batch_name'] or ''))
+    return rows
+
+
+def top_defaulters(limit=DEFAULTERS, batch_id=None):
+    """Students with the largest outstanding balance (index scan)"""
+    profiles = StudentProfile.objects.filter(fees_outstanding__gt=0)
+    if batch_id:
+        profiles = profiles.filter(batch_id=batch_id)
+    return list(
+        profiles.order_by('-fees_outstanding').values(
+            'user_id', 'enrollment_number', 'total_fees', 'fees_paid', 'fees_outstanding',
+            first_name=F('user__first_name'), last_name=F('user__last_name'),
+            phone=F('guardian_phone'), batch_name=F('batch__name'),
+        )[:limit]
+    )
+
+
+def collection_by_day(days=COLLECTION_DAYS, today=None):
+    """``[{'date', 'payments', 'amount'}]`` for the last ``days`` days, oldest
+    first, with empty days filled in (one grouped query)"""
+    today = today or timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    rows = (
+        FeePayment.objects.filter(paid_on__range=(first, today)).exclude(mode='opening')
+        .order_by().values(date=F('paid_on')).annotate(payments=Count('pk'), amount=Sum('amount'))
+    )
+    found = {row['date']: row for row in rows}
+    return [
+        found.get(day, {'date': day, 'payments': 0, 'amount': Decimal(0)})
+        for day in (first + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORTS_CACHE', 'default')]
+
+
+def fee_reports(batch_id=None, refresh=False):
+    """Every report for the fee reports page, cached for REPORT_TTL seconds"""
+    today = timezone.localdate()
+    key = f'fee_reports:{today}:{batch_id or "all"}'
+    cache = _cache()
+    reports = None if refresh else cache.get(key)
+    if reports is None:
+        reports = {
+            'summary': summary(),
+            'batches': outstanding_by_batch(),
+            'defaulters': top_defaulters(batch_id=batch_id),
+            'collection': collection_by_day(today=today),
+            'computed_at': timezone.now(),
+        }
+        cache.set(key, reports, REPORT_TTL)
+    return reports
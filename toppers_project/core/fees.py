@@ -0,0 +1,128 @@
+# core/fees.py
+"""
+Fee payment ledger.
+
+Every payment is a FeePayment row and StudentProfile.fees_paid is their
+running total. record_payment() inserts the row and moves the total with an
+F() expression in the same transaction, so payments recorded at the same
+time by different admins all land: nothing reads the balance and writes it
+back (StudentProfile.save() leaves fees_paid out for the same reason).
+
+The payment form carries an idempotency key with a unique index, so a
+resubmitted form (double click, browser retry) finds the payment it already
+made instead of charging twice.
+
+Code that writes payments without record_payment() (bulk_create in the user
+import, sample data) must move fees_paid itself, or run
+``python manage.py reconcile_fees``, which recomputes every total from the
+ledger with one grouped aggregate.
+"""
+import itertools
+import uuid
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, LPad
+
+from core.models import FeePayment, StudentProfile
+
+RECONCILE_CHUNK_SIZE = 500
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+RECEIPT_PREFIX = 'TP'
+
+
+def receipt_number(pk):
+    """Receipt number of a payment recorded without one. The prefix is kept
+    for generated numbers: FeePaymentForm refuses typed receipts that start
+    with it."""
+    return f'{RECEIPT_PREFIX}{pk:07d}'
+
+
+def number_receipts():
+    """Give every payment without a receipt number its generated one (one
+    UPDATE; for payments written with bulk_create)"""
+    FeePayment.objects.filter(receipt_number__isnull=True).update(
+        receipt_number=Concat(Value(RECEIPT_PREFIX), LPad(Cast('pk', CharField()), 7, Value('0'))),
+    )
+
+
+def record_payment(student_id, amount, mode='cash', recorded_by=None, idempotency_key=None,
+                   receipt=None, paid_at=None, note=''):
+    """Record a payment and move the student's fees_paid by ``amount``.
+
+    Returns ``(payment, created)``; ``created`` is False when a payment with
+    this idempotency key exists already, which is then returned untouched.
+    """
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise ValueError('A payment must be a positive amount')
+    fields = {
+        'student_id': student_id, 'amount': amount, 'mode': mode, 'recorded_by': recorded_by,
+        'idempotency_key': idempotency_key or None, 'receipt_number': receipt or None, 'note': note,
+    }
+    if paid_at is not None:
+        fields['paid_at'] = paid_at
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                payment = FeePayment.objects.create(**fields)
+        except IntegrityError:
+            existing = None
+            if idempotency_key:
+                existing = FeePayment.objects.filter(idempotency_key=idempotency_key).first()
+            if existing is None:
+                raise  # a duplicate receipt number, not a replay
+            return existing, False
+        if payment.receipt_number is None:
+            _number_receipt(payment)
+        StudentProfile.objects.filter(pk=student_id).update(fees_paid=F('fees_paid') + amount)
+    return payment, True
+
+
+def _number_receipt(payment):
+    """Give ``payment`` its generated receipt number, or, if a receipt typed
+    before the prefix was reserved holds it, the first free ``-2``, ``-3``...
+    variant of it."""
+    number = receipt_number(payment.pk)
+    for attempt in itertools.count(1):
+        candidate = number if attempt == 1 else f'{number}-{attempt}'
+        try:
+            with transaction.atomic():
+                FeePayment.objects.filter(pk=payment.pk).update(receipt_number=candidate)
+        except IntegrityError:
+            continue
+        payment.receipt_number = candidate
+        return
+
+
+def reconcile(dry_run=False):
+    """Recompute fees_paid from the ledger.
+
+    The totals and the stored balances are read together in one grouped
+    query, and each out-of-step balance is corrected by the difference
+    (again with F()), so payments recorded while this runs are kept.
+    Returns ``[(profile_id, stored, ledger)]`` for the balances that were off.
+    """
+    rows = StudentProfile.objects.order_by().values('pk', 'fees_paid').annotate(
+        ledger=Coalesce(Sum('fee_payments__amount'), Value(Decimal(0)), output_field=DecimalField()),
+    ).values_list('pk', 'fees_paid', 'ledger')
+    drift = [(pk, stored, ledger) for pk, stored, ledger in rows if stored != ledger]
+    if dry_run:
+        return drift
+
+    for start in range(0, len(drift), RECONCILE_CHUNK_SIZE):
+        chunk = drift[start:start + RECONCILE_CHUNK_SIZE]
+        StudentProfile.objects.filter(pk__in=[pk for pk, _, _ in chunk]).update(
+            fees_paid=F('fees_paid') + Case(
+                *[When(pk=pk, then=Value(ledger - stored)) for pk, stored, ledger in chunk],
+                output_field=DecimalField(),
+            ),
+        )
+    return drift
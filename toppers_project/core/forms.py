@@ -1,7 +1,8 @@
 from datetime import date
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm, AuthenticationForm
-from core.models import CustomUser, StudentProfile, TeacherProfile, Lecture, Subject, Batch
+from core.models import CustomUser, StudentProfile, TeacherProfile, FeePayment, Lecture, Subject, Batch
+from core import fees
 from django.core.exceptions import ValidationError
 
 class CustomUserCreationForm(UserCreationForm):
@@ -87,12 +88,49 @@ class TeacherProfileForm(forms.ModelForm):
               raise forms.ValidationError("Teacher must be at least 23 years old.")
            return dob
 
+class FeePaymentForm(forms.ModelForm):
+    # set when the form is rendered; a resubmitted form sends the same key (core/fees.py)
+    idempotency_key = forms.CharField(widget=forms.HiddenInput, max_length=64)
+
+    class Meta:
+        model = FeePayment
+        fields = ['amount', 'mode', 'receipt_number', 'note']
+        widgets = {
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
+            'mode': forms.Select(attrs={'class': 'form-control'}),
+            'receipt_number': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Blank to number it automatically'}),
+            'note': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Optional'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['mode'].choices = [choice for choice in FeePayment.MODES if choice[0] != 'opening']
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount <= 0:
+            raise forms.ValidationError("Amount must be more than zero.")
+        return amount
+
+    def clean_receipt_number(self):
+        receipt = self.cleaned_data['receipt_number']
+        if receipt and receipt.upper().startswith(fees.RECEIPT_PREFIX):
+            raise forms.ValidationError(
+                f'Receipt numbers starting with {fees.RECEIPT_PREFIX} are generated; leave it blank for one.'
+            )
+        return receipt
+
+    def validate_unique(self):
+        # left to core.fees.record_payment: a resubmitted form must reach it
+        # to find its payment instead of failing on its own receipt number
+        pass
+
 #for timetable app,
 
 class LectureForm(forms.ModelForm):
     class Meta:
         model = Lecture
-        fields = ['teacher', 'subject', 'batch', 'day', 'start_time', 'end_time', 'class_date']
+        fields = ['teacher', 'subject', 'batch', 'day', 'start_time', 'end_time', 'room', 'class_date']
         widgets = {
             'teacher': forms.Select(attrs={'class': 'form-control'}),
             'subject': forms.Select(attrs={'class': 'form-control'}),
@@ -100,6 +138,7 @@ class LectureForm(forms.ModelForm):
             'day': forms.Select(attrs={'class': 'form-control'}),
             'start_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'end_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'room': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Optional'}),
             'class_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         }
 
@@ -107,9 +146,10 @@ class LectureForm(forms.ModelForm):
 class SubjectForm(forms.ModelForm):
     class Meta:
         model = Subject
-        fields = ['name']
+        fields = ['name', 'hourly_rate']
         widgets = {
-            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter subject name'})
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter subject name'}),
+            'hourly_rate': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0'}),
         }
     def clean_name(self):
         name = self.cleaned_data['name'].strip()
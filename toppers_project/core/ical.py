@@ -0,0 +1,144 @@
+# core/ical.py
+"""
+iCalendar (.ics) timetable feeds.
+
+A feed is addressed by a signed token -- ``student-<id>``, ``teacher-<id>``
+or ``batch-<id>`` -- so calendar apps can subscribe without a session.
+Weekly lectures become weekly RRULE events and one-off lectures (class_date)
+single events. Times are the timetable's wall-clock times, written as
+floating local times.
+
+Feeds are polled every few minutes, so each response carries an ETag and a
+Last-Modified taken from Max(Lecture.updated_at) over the feed's lectures
+(feed_last_modified(); for a student also the profile's updated_at, which
+moves when they change batch). Deleting or moving a lecture touches the remaining lectures of its batch and
+teacher (touch_lectures(), called from core.signals), so that one aggregate
+notices every change and a poll that finds nothing new is answered 304 after
+that single query.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Lecture, StudentProfile
+from core.occurrences import WEEKDAYS
+
+FEED_KINDS = ('student', 'teacher', 'batch')
+_SALT = 'core.ical.feed'
+_DAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+
+def feed_token(kind, pk):
+    return signing.Signer(salt=_SALT).sign(f'{kind}-{pk}')
+
+
+def feed_url(request, kind, pk):
+    """Absolute URL of a feed, to paste into a calendar app"""
+    return request.build_absolute_uri(reverse('timetable_feed', args=[feed_token(kind, pk)]))
+
+
+def read_feed_token(token):
+    """``(kind, pk)`` of a feed token; raises signing.BadSignature"""
+    kind, _, pk = signing.Signer(salt=_SALT).unsign(token).partition('-')
+    if kind not in FEED_KINDS or not pk.isdigit():
+        raise signing.BadSignature(token)
+    return kind, int(pk)
+
+
+def feed_lectures(kind, pk):
+    """The lectures of a feed, as one queryset (a student's batch is a subquery)"""
+    if kind == 'student':
+        return Lecture.objects.filter(batch__in=StudentProfile.objects.filter(user_id=pk).values('batch_id'))
+    if kind == 'teacher':
+        return Lecture.objects.filter(teacher_id=pk)
+    return Lecture.objects.filter(batch_id=pk)
+
+
+def feed_last_modified(kind, pk):
+    """When the feed's content last changed, or None (one query)"""
+    if kind == 'student':
+        row = StudentProfile.objects.filter(user_id=pk).annotate(
+            lectures_changed=Subquery(
+                Lecture.objects.filter(batch=OuterRef('batch')).order_by('-updated_at').values('updated_at')[:1]
+            ),
+        ).values_list('updated_at', 'lectures_changed').first()
+        return max(filter(None, row or ()), default=None)
+    return feed_lectures(kind, pk).aggregate(last=Max('updated_at'))['last']
+
+
+def touch_lectures(batch_ids=(), teacher_ids=()):
+    """Move the feed stamp of these batches / teachers (one UPDATE)"""
+    batch_ids, teacher_ids = [pk for pk in batch_ids if pk], [pk for pk in teacher_ids if pk]
+    if batch_ids or teacher_ids:
+        Lecture.objects.filter(Q(batch_id__in=batch_ids) | Q(teacher_id__in=teacher_ids)).update(
+            updated_at=timezone.now(),
+        )
+
+
+def _escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Split content lines at 75 octets (RFC 5545, 3.1)"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74  # continuation lines start with a space
+    return '\r\n '.join(parts)
+
+
+def _stamp(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(lecture):
+    if lecture.class_date:
+        first, rule = lecture.class_date, None
+    else:
+        created = timezone.localdate(lecture.created_at)
+        first = created + timedelta(days=(WEEKDAYS[lecture.day] - created.weekday()) % 7)
+        rule = f'RRULE:FREQ=WEEKLY;BYDAY={_DAY_CODES[WEEKDAYS[lecture.day]]}'
+    teacher = lecture.teacher.get_full_name() or lecture.teacher.username
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:lecture-{lecture.pk}@toppers',
+        f'DTSTAMP:{_stamp(lecture.updated_at)}',
+        f'LAST-MODIFIED:{_stamp(lecture.updated_at)}',
+        f'DTSTART:{first:%Y%m%d}T{lecture.start_time:%H%M%S}',
+        f'DTEND:{first:%Y%m%d}T{lecture.end_time:%H%M%S}',
+        rule,
+        f'SUMMARY:{_escape(f"{lecture.subject.name} - {lecture.batch.name}")}',
+        f'DESCRIPTION:{_escape(" - ".join(filter(None, [teacher, lecture.topic])))}',
+        f'LOCATION:{_escape(lecture.room)}' if lecture.room else None,
+        'END:VEVENT',
+    ]
+    return [line for line in lines if line]
+
+
+def render_calendar(name, lectures):
+    """The .ics text for ``lectures`` (subject / batch / teacher selected)"""
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//TOPPERS//Timetable//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+        'X-PUBLISHED-TTL:PT15M',
+    ]
+    for lecture in lectures:
+        if lecture.class_date or lecture.day in WEEKDAYS:
+            lines.extend(_event(lecture))
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
@@ -0,0 +1,306 @@
+# core/importers.py
+"""
+Bulk student / teacher import from CSV.
+
+The file is read as a stream and handled in chunks. Each row is validated
+with the StudentProfileForm / TeacherProfileForm rules (plus the model
+clean() age checks). Username and enrollment number / employee id
+uniqueness is checked once per chunk (email is not unique, as elsewhere in
+the app), passwords are hashed in a process pool, and each chunk is written
+with bulk_create for the users, the profiles and the subject M2M rows.
+The pool is for ``manage.py import_users``; the upload view passes
+``workers=1`` and hashes in its own process. Rows that fail validation
+are skipped and reported with their line number; with ``dry_run`` nothing is
+written at all.
+
+Student columns: username, email, first_name, last_name, password, phone,
+date_of_birth, enrollment_number, guardian_name, guardian_phone, batch,
+subjects, total_fees, fees_paid
+Teacher columns: username, email, first_name, last_name, password, phone,
+date_of_birth, employee_id, qualifications, subjects_taught, experience,
+salary
+
+batch / subjects are given by name; several subjects are separated by ';'.
+A blank password leaves the account with an unusable password; fees_paid is
+entered in the fee ledger as an opening balance (core/fees.py).
+"""
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import counters, fees, search
+from core.forms import StudentProfileForm, TeacherProfileForm
+from core.models import CustomUser, FeePayment, StudentProfile, TeacherProfile, Subject, Batch
+
+IMPORT_CHUNK_SIZE = 500
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)  # (line, username, message)
+
+    @property
+    def failed(self):
+        return len({line for line, _, _ in self.errors})
+
+
+class _StudentImportForm(StudentProfileForm):
+    """StudentProfileForm rules; batch / subjects are resolved from caches instead"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        del self.fields['batch'], self.fields['subjects']
+
+    def validate_unique(self):
+        pass  # checked per chunk in _check_unique()
+
+
+class _TeacherImportForm(TeacherProfileForm):
+    """TeacherProfileForm rules; subjects_taught is resolved from a cache instead"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        del self.fields['subjects_taught']
+
+    def validate_unique(self):
+        pass  # checked per chunk in _check_unique()
+
+
+ROLES = {
+    'student': {
+        'form': _StudentImportForm,
+        'profile': StudentProfile,
+        'code': 'enrollment_number',
+        'subjects': 'subjects',
+        'counter': counters.STUDENTS,
+    },
+    'teacher': {
+        'form': _TeacherImportForm,
+        'profile': TeacherProfile,
+        'code': 'employee_id',
+        'subjects': 'subjects_taught',
+        'counter': counters.TEACHERS,
+    },
+}
+
+
+def _init_worker():
+    django.setup()
+
+
+def _hash(password):
+    return make_password(password or None)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _decimal(row, name, errors):
+    value = (row.get(name) or '').strip()
+    if not value:
+        return Decimal('0')
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        errors.append(f'{name}: enter a number.')
+
+
+class UserImporter:
+    def __init__(self, role, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE, workers=None):
+        if role not in ROLES:
+            raise ValueError(f'Unknown role {role!r}')
+        self.role = role
+        self.spec = ROLES[role]
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.batches = {b.name.lower(): b for b in Batch.objects.all()}
+        self.subjects = {s.name.lower(): s for s in Subject.objects.all()}
+        # values already taken by earlier rows of this file
+        self.seen = {'username': set(), 'code': set()}
+
+    def run(self, lines):
+        """Import from an iterable of CSV text lines (a file object works).
+
+        ``result.created`` counts the rows written, or in dry-run mode the
+        rows that passed validation and would have been written.
+        """
+        result = ImportResult()
+        reader = csv.DictReader(lines)
+        rows = ((reader.line_num, row) for row in reader)
+        pool = None
+        if not self.dry_run and self.workers != 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        try:
+            for chunk in _chunks(rows, self.chunk_size):
+                result.rows += len(chunk)
+                valid = self._validate_chunk(chunk, result)
+                if valid and not self.dry_run:
+                    passwords = [entry['password'] for entry in valid]
+                    hashes = pool.map(_hash, passwords, chunksize=16) if pool else map(_hash, passwords)
+                    for entry, password in zip(valid, hashes):
+                        entry['user'].password = password
+                    self._write_chunk(valid)
+                result.created += len(valid)
+        finally:
+            if pool:
+                pool.shutdown()
+        return result
+
+    # -- validation ---------------------------------------------------
+
+    def _validate_chunk(self, chunk, result):
+        candidates = []
+        for line, row in chunk:
+            row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            errors = []
+            entry = self._validate_row(row, errors)
+            if errors:
+                result.errors.extend((line, row.get('username', ''), error) for error in errors)
+            else:
+                entry['line'] = line
+                candidates.append(entry)
+
+        taken = self._check_unique(candidates)
+        valid = []
+        for entry in candidates:
+            user, profile = entry['user'], entry['profile']
+            code = getattr(profile, self.spec['code'])
+            clashes = [
+                f'{label} "{value}" already exists.'
+                for label, key, value in (
+                    ('username', 'username', user.username),
+                    (self.spec['code'], 'code', code),
+                )
+                if value in taken[key] or value in self.seen[key]
+            ]
+            if clashes:
+                result.errors.extend((entry['line'], user.username, error) for error in clashes)
+                continue
+            self.seen['username'].add(user.username)
+            self.seen['code'].add(code)
+            valid.append(entry)
+        return valid
+
+    def _validate_row(self, row, errors):
+        for name in ('username', 'email', 'first_name', 'last_name'):
+            if not row.get(name):
+                errors.append(f'{name}: this field is required.')
+        if row.get('email'):
+            try:
+                validate_email(row['email'])
+            except ValidationError:
+                errors.append('email: enter a valid email address.')
+
+        dob = None
+        if row.get('date_of_birth'):
+            try:
+                dob = parse_date(row['date_of_birth'])
+            except ValueError:
+                pass
+            if dob is None:
+                errors.append('date_of_birth: use YYYY-MM-DD.')
+
+        user = CustomUser(
+            username=row.get('username', ''),
+            email=row.get('email', ''),
+            first_name=row.get('first_name', ''),
+            last_name=row.get('last_name', ''),
+            phone=row.get('phone', ''),
+            date_of_birth=dob,
+            role=self.role,
+            status='approved',
+        )
+        profile = self.spec['profile'](user=user)
+        subjects = self._resolve_subjects(row.get(self.spec['subjects'], ''), errors)
+
+        if self.role == 'student':
+            profile.enrollment_number = row.get('enrollment_number', '')
+            if not profile.enrollment_number:
+                errors.append('enrollment_number: this field is required.')
+            batch = self.batches.get(row.get('batch', '').lower())
+            if batch is None:
+                errors.append(f'batch: unknown batch "{row.get("batch", "")}".')
+            profile.batch = batch
+            profile.total_fees = _decimal(row, 'total_fees', errors)
+            profile.fees_paid = _decimal(row, 'fees_paid', errors)
+            if profile.fees_paid is not None and profile.fees_paid < 0:
+                errors.append('fees_paid: cannot be negative.')
+        else:
+            profile.salary = _decimal(row, 'salary', errors)
+
+        form = self.spec['form'](row, instance=profile)
+        if not form.is_valid():
+            for name, messages in form.errors.items():
+                prefix = '' if name == '__all__' else f'{name}: '
+                errors.extend(prefix + message for message in messages)
+
+        return {'user': user, 'profile': profile, 'subjects': subjects, 'password': row.get('password', '')}
+
+    def _resolve_subjects(self, value, errors):
+        names = [name.strip() for name in value.split(';') if name.strip()]
+        if not names:
+            errors.append(f'{self.spec["subjects"]}: this field is required.')
+        subjects = []
+        for name in names:
+            subject = self.subjects.get(name.lower())
+            if subject is None:
+                errors.append(f'{self.spec["subjects"]}: unknown subject "{name}".')
+            else:
+                subjects.append(subject)
+        return subjects
+
+    def _check_unique(self, entries):
+        """Values of this chunk that already exist in the database (2 queries)"""
+        usernames = [entry['user'].username for entry in entries]
+        codes = [getattr(entry['profile'], self.spec['code']) for entry in entries]
+        code_field = self.spec['code']
+        return {
+            'username': set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True)),
+            'code': set(
+                self.spec['profile'].objects.filter(**{f'{code_field}__in': codes}).values_list(code_field, flat=True)
+            ),
+        }
+
+    # -- writing --------------------------------------------------------
+
+    def _write_chunk(self, entries):
+        Profile = self.spec['profile']
+        Through = getattr(Profile, self.spec['subjects']).through
+        fk_name = Profile._meta.model_name  # studentprofile / teacherprofile
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([entry['user'] for entry in entries])
+            for entry, user in zip(entries, users):
+                entry['profile'].user = user
+            profiles = Profile.objects.bulk_create([entry['profile'] for entry in entries])
+            Through.objects.bulk_create([
+                Through(**{f'{fk_name}_id': profile.pk, 'subject_id': subject.pk})
+                for entry, profile in zip(entries, profiles)
+                for subject in entry['subjects']
+            ])
+            if self.role == 'student':
+                # imported fees_paid enters the ledger as an opening balance
+                FeePayment.objects.bulk_create([
+                    FeePayment(student_id=profile.pk, amount=profile.fees_paid, mode='opening',
+                               paid_on=timezone.localdate(), note='Imported balance')
+                    for profile in profiles if profile.fees_paid > 0
+                ])
+                fees.number_receipts()
+            # bulk_create skips signals: keep counters and search index in step
+            counters.bump(self.spec['counter'], len(users))
+            search.index_users([user.pk for user in users])
@@ -0,0 +1,99 @@
+"""
+Benchmark the fee reports on a synthetic school
+Usage: python manage.py benchmark_fee_reports [--students 50000 --batches 40]
+
+The students and their payments are created inside a transaction that is
+rolled back at the end, so nothing is kept. Each report is computed
+uncached (see core/fee_reports.py) and timed.
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core import fee_reports, fees
+from core.models import CustomUser, FeePayment, StudentProfile, Batch
+
+TARGET_MS = 200
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure fee report latency over a synthetic student body (nothing is kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--batches', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._populate(options)
+                self._measure(options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _populate(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        batches = Batch.objects.bulk_create([Batch(name=f'bench-batch-{i}') for i in range(options['batches'])])
+        now = timezone.now()
+        for offset in range(0, options['students'], 2000):
+            size = min(2000, options['students'] - offset)
+            users = CustomUser.objects.bulk_create([
+                CustomUser(username=f'bench-s{offset + i}', role='student', status='approved')
+                for i in range(size)
+            ])
+            instalments = [[Decimal(2500 * rng.randint(1, 4)) for _ in range(rng.randint(0, 4))] for _ in users]
+            profiles = StudentProfile.objects.bulk_create([
+                StudentProfile(
+                    user=user, enrollment_number=f'bench-{user.id}', batch=batches[i % len(batches)],
+                    total_fees=Decimal(50000), fees_paid=sum(instalments[i], Decimal(0)),
+                )
+                for i, user in enumerate(users)
+            ])
+            payments = [
+                FeePayment(student_id=profile.id, amount=amount, paid_at=now - timedelta(days=rng.randrange(180)))
+                for profile, amounts in zip(profiles, instalments)
+                for amount in amounts
+            ]
+            for payment in payments:
+                payment.paid_on = timezone.localdate(payment.paid_at)
+            FeePayment.objects.bulk_create(payments)
+        fees.number_receipts()
+        self.stdout.write(
+            f"{options['students']} students, {FeePayment.objects.count()} payments "
+            f"(set up in {time.perf_counter() - started:.1f}s)"
+        )
+
+    def _measure(self, repeat):
+        batch_id = Batch.objects.filter(name='bench-batch-0').values_list('id', flat=True).first()
+        reports = [
+            ('summary', fee_reports.summary),
+            ('outstanding_by_batch', fee_reports.outstanding_by_batch),
+            ('top_defaulters', fee_reports.top_defaulters),
+            ('top_defaulters (batch)', lambda: fee_reports.top_defaulters(batch_id=batch_id)),
+            ('collection_by_day', fee_reports.collection_by_day),
+            ('fee_reports (uncached)', lambda: fee_reports.fee_reports(refresh=True)),
+            ('fee_reports (cached)', fee_reports.fee_reports),
+        ]
+        self.stdout.write(f"{'report':<24} {'median':>9} {'queries':>8}")
+        for name, report in reports:
+            times = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    report()
+                    times.append(time.perf_counter() - start)
+            median = sorted(times)[len(times) // 2] * 1000
+            line = f'{name:<24} {median:>7.1f}ms {len(ctx.captured_queries):>8}'
+            self.stdout.write(self.style.WARNING(line) if median > TARGET_MS else line)
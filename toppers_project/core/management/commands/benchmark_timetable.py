@@ -0,0 +1,82 @@
+"""
+Benchmark the timetable generator on a synthetic problem
+Usage: python manage.py benchmark_timetable [--batches 40 --teachers 15 --budgets 1 5]
+
+Nothing touches the database: the problem is generated in memory from
+--seed, solved once per time budget, and the result is checked for clashes
+with core.clashes.validate_timetable().
+"""
+import random
+from django.core.management.base import BaseCommand, CommandError
+from core.clashes import validate_timetable
+from core.models import Lecture
+from core.timetable_generator import Problem, Requirement, SLOT_STARTS, solve, week_slots
+
+
+class Command(BaseCommand):
+    help = 'Measure timetable generation time and quality on a synthetic school (nothing is written)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=40)
+        parser.add_argument('--teachers', type=int, default=15)
+        parser.add_argument('--subjects', type=int, default=10)
+        parser.add_argument('--per-batch', type=int, default=5, help='Subjects each batch takes')
+        parser.add_argument('--hours', type=int, default=3, help='Weekly hours per subject')
+        parser.add_argument('--slots', type=int, default=len(SLOT_STARTS), help='Slots per day')
+        parser.add_argument('--unavailable', type=float, default=0.1,
+                            help='Share of each teacher\'s slots marked unavailable')
+        parser.add_argument('--budgets', nargs='+', type=float, default=[1.0, 5.0], help='Time budgets (s)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not 1 <= options['slots'] <= len(SLOT_STARTS):
+            raise CommandError(f'--slots must be between 1 and {len(SLOT_STARTS)}')
+        if options['per_batch'] > options['subjects']:
+            raise CommandError('--per-batch cannot exceed --subjects')
+        problem = self._problem(options)
+        lessons = sum(req.hours for req in problem.requirements)
+        capacity = sum(len(slots) for slots in problem.availability.values())
+        self.stdout.write(
+            f"{options['batches']} batches, {options['teachers']} teachers, {lessons} lessons/week, "
+            f"{capacity} teacher slots available ({lessons / capacity:.0%} load)"
+        )
+        self.stdout.write(f"{'budget':>7} {'time':>8} {'placed':>9} {'unplaced':>9} {'penalty':>8} {'iterations':>11} {'clashes':>8}")
+        for budget in options['budgets']:
+            solution = solve(problem, time_budget=budget, seed=options['seed'])
+            lectures = [
+                Lecture(batch_id=batch_id, subject_id=subject_id, teacher_id=teacher_id,
+                        day=problem.slots[slot][0], start_time=problem.slots[slot][1], end_time=problem.slots[slot][2])
+                for batch_id, subject_id, teacher_id, slot in solution.placements
+            ]
+            clashes = validate_timetable(lectures, against_db=False)
+            missing = sum(count for _, count, _ in solution.unplaced)
+            self.stdout.write(
+                f'{budget:>6.1f}s {solution.elapsed * 1000:>6.0f}ms {len(solution.placements):>9} '
+                f'{missing:>9} {solution.penalty:>8} {solution.iterations:>11} {len(clashes):>8}'
+            )
+            if clashes:
+                raise CommandError('The generated timetable has clashes')
+
+    def _problem(self, options):
+        rng = random.Random(options['seed'])
+        slots = week_slots(SLOT_STARTS[:options['slots']])
+        subjects = range(1, options['subjects'] + 1)
+        teachers = range(1, options['teachers'] + 1)
+
+        qualified = {subject: [] for subject in subjects}
+        for teacher in teachers:
+            # every subject gets a teacher, then each teacher picks up two more
+            first = subjects[(teacher - 1) % len(subjects)]
+            for subject in {first, *rng.sample(subjects, 2)}:
+                qualified[subject].append(teacher)
+
+        availability = {
+            teacher: set(rng.sample(range(len(slots)), round(len(slots) * (1 - options['unavailable']))))
+            for teacher in teachers
+        }
+        requirements = [
+            Requirement(batch, subject, options['hours'])
+            for batch in range(1, options['batches'] + 1)
+            for subject in rng.sample(subjects, options['per_batch'])
+        ]
+        return Problem(requirements, qualified, slots, availability)
@@ -0,0 +1,87 @@
+"""
+Request every page in settings.QUERY_BUDGETS and fail if one goes over budget
+Usage: python manage.py check_query_budgets [--lecture 12]
+
+Pages are fetched with the test client as the first approved admin, student
+or teacher (by the app the view lives in), so run it against a database with
+sample data in it. Anything the requests write is rolled back.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import NoReverseMatch, resolve, reverse
+
+from core.middleware import query_budget, QueryBudgetExceeded
+from core.models import CustomUser, Lecture
+
+ROLE_FOR_APP = {
+    'admin_dashboard': 'admin',
+    'attendance': 'admin',
+    'student': 'student',
+    'teacher': 'teacher',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Check every budgeted page against its per-view query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lecture', type=int, help='Lecture id for mark_attendance (default: first lecture)')
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        lecture = Lecture.objects.filter(pk=options['lecture']) if options['lecture'] else Lecture.objects.order_by('pk')
+        lecture = lecture.first()
+        url_args = {'mark_attendance': [lecture.pk] if lecture else None}
+
+        clients, failures = {}, []
+        self.stdout.write(f"{'view':<28} {'queries':>8} {'budget':>7}")
+        try:
+            with transaction.atomic():
+                for name, budget in sorted(budgets.items()):
+                    if ':' in name:
+                        continue  # method-specific budgets (POST etc.) are only enforced by the middleware
+                    try:
+                        url = reverse(name, args=url_args.get(name))
+                    except NoReverseMatch:
+                        self.stdout.write(f'{name:<28} {"skipped (needs arguments)":>16}')
+                        continue
+                    client = self._client(name, url, clients, lecture)
+                    if client is None:
+                        self.stdout.write(f'{name:<28} {"skipped (no user)":>16}')
+                        continue
+                    try:
+                        with query_budget(budget, name) as stats:
+                            response = client.get(url)
+                    except QueryBudgetExceeded as exc:
+                        failures.append(str(exc))
+                        self.stdout.write(self.style.ERROR(f'{name:<28} {"over":>8} {budget:>7}'))
+                        continue
+                    if response.status_code != 200:
+                        failures.append(f'{name} returned {response.status_code}')
+                    self.stdout.write(f'{name:<28} {stats.queries:>8} {budget:>7}')
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError('Query budgets exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('✓ All pages within budget'))
+
+    def _client(self, name, url, clients, lecture):
+        role = ROLE_FOR_APP.get(resolve(url).func.__module__.split('.')[0], 'admin')
+        if role not in clients:
+            users = CustomUser.objects.filter(role=role, status='approved').order_by('pk')
+            user = users.filter(pk=lecture.teacher_id).first() if role == 'teacher' and lecture else None
+            user = user or users.first()
+            if user is None:
+                clients[role] = None
+            else:
+                clients[role] = Client()
+                clients[role].force_login(user)
+        return clients[role]
@@ -0,0 +1,98 @@
+"""
+Generate a clash-free weekly timetable (see core/timetable_generator.py)
+Usage: python manage.py generate_timetable [--batches XI-Science-1 ...] [--hours 3]
+           [--requirements hours.csv] [--availability availability.csv]
+           [--time-budget 5] [--output preview.csv] [--commit]
+
+Without --commit the result is only previewed (and written to --output in
+the import_timetable format, to be edited and imported later).
+"""
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Batch
+from core.timetable_generator import (
+    DEFAULT_HOURS, SLOT_STARTS, TIME_BUDGET, availability_from_rows, load_problem,
+    requirements_from_rows, solve, week_slots,
+)
+from core.timetable_import import COLUMNS, TimetableImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Generate the weekly timetable around the saved one; preview, or write it with --commit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', nargs='+', help='Batch names (default: every batch with students)')
+        parser.add_argument('--hours', type=int, default=DEFAULT_HOURS, help='Weekly hours per subject')
+        parser.add_argument('--requirements', help='CSV of batch, subject, hours (instead of --batches / --hours)')
+        parser.add_argument('--availability', help='CSV of teacher, day, start_time, end_time windows')
+        parser.add_argument('--slots', type=int, default=len(SLOT_STARTS), help='Slots per day')
+        parser.add_argument('--time-budget', type=float, default=TIME_BUDGET, help='Seconds')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the generated lectures to this CSV file')
+        parser.add_argument('--commit', action='store_true', help='Write the lectures')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['slots'] <= len(SLOT_STARTS):
+            raise CommandError(f'--slots must be between 1 and {len(SLOT_STARTS)}')
+        batch_ids = None
+        if options['batches']:
+            found = dict(Batch.objects.filter(name__in=options['batches']).values_list('name', 'id'))
+            unknown = set(options['batches']) - set(found)
+            if unknown:
+                raise CommandError(f"Unknown batches: {', '.join(sorted(unknown))}")
+            batch_ids = list(found.values())
+        try:
+            requirements = availability = None
+            if options['requirements']:
+                requirements = requirements_from_rows(self._read(options['requirements']))
+            if options['availability']:
+                availability = availability_from_rows(self._read(options['availability']))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        problem = load_problem(
+            batch_ids, options['hours'], requirements, availability, week_slots(SLOT_STARTS[:options['slots']]),
+        )
+        if not problem.requirements:
+            raise CommandError('Nothing to schedule: no batch has students with subjects.')
+        solution = solve(problem, time_budget=options['time_budget'], seed=options['seed'])
+        rows = solution.rows(problem)
+        self._preview(rows)
+
+        self.stdout.write(
+            f'\n{len(solution.placements)} lectures placed in {solution.elapsed:.2f}s '
+            f'({solution.iterations} search steps), {solution.penalty} same-day repeats'
+        )
+        for line in solution.describe_unplaced():
+            self.stdout.write(self.style.WARNING(f'  {line}'))
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+            self.stdout.write(f'Preview written to {options["output"]}')
+
+        if not options['commit']:
+            self.stdout.write('Preview only; rerun with --commit to save.')
+            return
+        result = TimetableImporter().run(enumerate(rows, 1))
+        if result.errors:
+            for line, label, message in result.errors[:20]:
+                self.stdout.write(self.style.ERROR(f'  {label}: {message}'))
+            raise CommandError('The timetable changed while generating; nothing was saved')
+        self.stdout.write(self.style.SUCCESS(f'✓ {result.created} lectures saved'))
+
+    def _read(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                return read_rows(f, format='csv')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+    def _preview(self, rows):
+        batch = None
+        for row in rows:
+            if row['batch'] != batch:
+                batch = row['batch']
+                self.stdout.write(self.style.SUCCESS(f'\n{batch}'))
+            self.stdout.write(f"  {row['day']:<9} {row['start_time']}-{row['end_time']}  {row['subject']} ({row['teacher']})")
@@ -0,0 +1,33 @@
+"""
+Bulk import a timetable from a CSV or JSON file
+Usage: python manage.py import_timetable timetable.csv [--dry-run] [--format json]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.timetable_import import TimetableImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import lectures from CSV / JSON, all or nothing (see core/timetable_import.py for the columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Default: from the file extension')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                rows = read_rows(f, format=options['format'], name=options['path'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        result = TimetableImporter(dry_run=options['dry_run']).run(rows)
+        for line, label, message in result.errors[:50]:
+            self.stdout.write(self.style.ERROR(f'  line {line} ({label}): {message}'))
+        if len(result.errors) > 50:
+            self.stdout.write(f'  ... {len(result.errors) - 50} more')
+        if result.errors:
+            raise CommandError(f'{result.failed} of {result.rows} rows have problems, nothing was imported')
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(f'✓ {result.created} lectures {verb}'))
@@ -0,0 +1,47 @@
+"""
+Bulk import students or teachers from a CSV file
+Usage: python manage.py import_users student students.csv [--dry-run] [--report errors.csv]
+"""
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from core.importers import UserImporter, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Import students or teachers from CSV (see core/importers.py for the columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('role', choices=['student', 'teacher'])
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--report', help='Write the per-row error report to this CSV file')
+
+    def handle(self, *args, **options):
+        importer = UserImporter(
+            options['role'],
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                result = importer.run(f)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for line, username, message in result.errors[:50]:
+            self.stdout.write(self.style.ERROR(f'  line {line} ({username}): {message}'))
+        if len(result.errors) > 50:
+            self.stdout.write(f'  ... {len(result.errors) - 50} more')
+        if options['report']:
+            with open(options['report'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Line', 'Username', 'Error'])
+                writer.writerows(result.errors)
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {result.rows} rows read, {result.created} {verb}, {result.failed} rejected'
+        ))
@@ -0,0 +1,33 @@
+"""
+Expand the weekly timetable into dated lecture sessions
+Usage: python manage.py materialize_lectures [--weeks 4 --from 2025-06-02]
+
+Safe to rerun (run it daily): sessions that already exist are skipped.
+"""
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from core.occurrences import materialize, MATERIALIZE_WEEKS
+
+
+class Command(BaseCommand):
+    help = 'Create LectureOccurrence rows for the next N weeks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=MATERIALIZE_WEEKS)
+        parser.add_argument('--from', dest='start', help='First date, YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else date.today()
+        if start is None:
+            raise CommandError('--from must be YYYY-MM-DD')
+        if options['weeks'] < 1:
+            raise CommandError('--weeks must be at least 1')
+        end = start + timedelta(weeks=options['weeks']) - timedelta(days=1)
+
+        started = time.perf_counter()
+        count = materialize(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {count} sessions from {start} to {end} in place ({time.perf_counter() - started:.2f}s)'
+        ))
@@ -0,0 +1,16 @@
+"""
+Rebuild the materialized admin dashboard counters from scratch
+Usage: python manage.py rebuild_counters
+"""
+from django.core.management.base import BaseCommand
+from core import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute DashboardCounter rows from CustomUser and Notification'
+
+    def handle(self, *args, **options):
+        values = counters.rebuild()
+        for name in counters.USER_COUNTERS:
+            self.stdout.write(f'  {name}: {values[name]}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(values)} counters rebuilt'))
@@ -0,0 +1,17 @@
+"""
+Rebuild the student / teacher full-text search index
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the FTS5 user search table from CustomUser and profiles'
+
+    def handle(self, *args, **options):
+        if not search.uses_fts():
+            self.stdout.write('Search index is only used on SQLite, nothing to do.')
+            return
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('✓ Search index rebuilt'))
@@ -0,0 +1,27 @@
+"""
+Recompute StudentProfile.fees_paid from the FeePayment ledger
+Usage: python manage.py reconcile_fees [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from core import fees
+
+
+class Command(BaseCommand):
+    help = 'Compare every fees_paid with the sum of its fee payments and correct the ones out of step'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report balances that are out of step')
+
+    def handle(self, *args, **options):
+        drift = fees.reconcile(dry_run=options['dry_run'])
+        for pk, stored, ledger in drift[:20]:
+            self.stdout.write(f'  student profile {pk}: fees_paid {stored}, ledger {ledger}')
+        if len(drift) > 20:
+            self.stdout.write(f'  ... and {len(drift) - 20} more')
+        self.stdout.write(f'  balances out of step: {len(drift)}')
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing written')
+        elif drift:
+            self.stdout.write(self.style.SUCCESS('✓ Balances corrected'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Balances already in step'))
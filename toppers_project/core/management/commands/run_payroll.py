@@ -0,0 +1,54 @@
+"""
+Pay teachers for the lectures they delivered in a month
+Usage: python manage.py run_payroll [--month 2026-09] [--dry-run]
+
+The month defaults to the previous one and must be over. Running it again
+for a month pays only the teachers not paid yet (see core/payroll.py).
+"""
+import time
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from core import payroll
+
+
+class Command(BaseCommand):
+    help = 'Record salary payments for the lectures delivered in a month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='YYYY-MM (default: last month)')
+        parser.add_argument('--dry-run', action='store_true', help='Only show what would be paid')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must look like 2026-09')
+        else:
+            month = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        started = time.perf_counter()
+        try:
+            result = payroll.run(month, dry_run=options['dry_run'])
+        except ValueError as error:
+            raise CommandError(f'{error}; try --dry-run to see it so far')
+        elapsed = time.perf_counter() - started
+
+        for label, lines in (('to pay' if options['dry_run'] else 'paid', result.paid),
+                             ('already paid', result.already_paid), ('not paid', result.unpaid)):
+            for line in lines[:20]:
+                self.stdout.write(f'  {label:<14} {line.name:<30} {line.sessions:>4} sessions {line.hours:>7}h  ₹{line.amount}')
+            if len(lines) > 20:
+                self.stdout.write(f'  ... and {len(lines) - 20} more {label}')
+        self.stdout.write(
+            f'{month:%B %Y}: {len(result.paid)} teacher(s), ₹{result.total}; '
+            f'{len(result.already_paid)} already paid, {len(result.unpaid)} not paid ({elapsed:.2f}s)'
+        )
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing written')
+        elif result.paid:
+            self.stdout.write(self.style.SUCCESS('✓ Salaries recorded'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Nobody left to pay'))
+        if result.unpaid:
+            self.stdout.write(self.style.WARNING('Teachers not paid taught subjects without an hourly rate (or have no profile); set the rates and rerun'))
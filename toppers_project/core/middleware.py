@@ -0,0 +1,169 @@
+# core/middleware.py
+"""
+Per-request query count and latency instrumentation.
+
+QueryBudgetMiddleware records, for every request, the number of SQL queries,
+total DB time and wall time. It tags them with the resolved URL name and
+writes one structured line to the ``toppers.performance`` logger.
+
+With ``PERFORMANCE_TIMING = True`` (the default is DEBUG) it also measures
+template render time and sends the numbers back in a ``Server-Timing``
+header, visible in the browser dev tools. Templates are timed by the
+TimedDjangoTemplates backend (settings.TEMPLATES), which renders as usual
+when timing is off; production should leave the header off.
+
+Per-view query budgets are declared in settings::
+
+    QUERY_BUDGETS = {'admin_dashboard': 8, 'mark_attendance': 4, 'mark_attendance:POST': 16}
+
+A ``name:METHOD`` entry takes precedence over the plain name for that method.
+
+A request that goes over its budget logs a warning. With
+``QUERY_BUDGET_RAISE = True`` (meant for tests) it raises QueryBudgetExceeded
+instead, so an N+1 regression fails the test that hits the page.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+
+logger = logging.getLogger('toppers.performance')
+
+_current = ContextVar('request_stats', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats:
+    def __init__(self, time_templates=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.time_templates = time_templates
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None or not stats.time_templates:
+            return super().render(context, request)
+        stats._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats._template_depth -= 1
+            if not stats._template_depth:  # count nested render_to_string calls once
+                stats.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose templates add their render time to the
+    request's stats"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = getattr(settings, 'PERFORMANCE_TIMING', settings.DEBUG)
+        stats = RequestStats(time_templates=timing)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with _wrap_all_connections(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or request.path
+        record = {
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'wall_ms': round(wall * 1000, 2),
+        }
+        if timing:
+            record['template_ms'] = round(stats.template_time * 1000, 2)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                f'tpl;dur={stats.template_time * 1000:.1f}',
+                f'total;dur={wall * 1000:.1f}',
+            ])
+        logger.info(json.dumps(record), extra={'performance': record})
+
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(f'{view}:{request.method}', budgets.get(view))
+        if budget is not None and stats.queries > budget:
+            message = f'{view} ran {stats.queries} queries (budget {budget})'
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={'performance': record})
+        return response
+
+
+class query_budget:
+    """Fail a block of code that runs more than ``max_queries`` queries::
+
+        with query_budget(6):
+            client.get(reverse('mark_attendance', args=[lecture.id]))
+    """
+
+    def __init__(self, max_queries, label='block'):
+        self.max_queries = max_queries
+        self.label = label
+        self.stats = RequestStats()
+
+    def __enter__(self):
+        self._wrapper = _wrap_all_connections(self.stats)
+        self._wrapper.__enter__()
+        return self.stats
+
+    def __exit__(self, exc_type, *exc):
+        self._wrapper.__exit__(exc_type, *exc)
+        if exc_type is None and self.stats.queries > self.max_queries:
+            raise QueryBudgetExceeded(
+                f'{self.label} ran {self.stats.queries} queries (budget {self.max_queries})'
+            )
+
+
+class _wrap_all_connections:
+    """Install the stats hook on every configured database for the request"""
+
+    def __init__(self, stats):
+        self.managers = [connections[alias].execute_wrapper(stats) for alias in connections]
+
+    def __enter__(self):
+        for manager in self.managers:
+            manager.__enter__()
+
+    def __exit__(self, *exc):
+        for manager in reversed(self.managers):
+            manager.__exit__(*exc)
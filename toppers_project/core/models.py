@@ -1,8 +1,9 @@
 from datetime import date
 from django import forms
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 ROLE_CHOICES = [
     ('admin', 'Admin'),
@@ -33,7 +34,11 @@ class CustomUser(AbstractUser):
     def save(self, *args, **kwargs):
       if self.is_superuser:
          self.role = 'admin'
+      # core.signals claims a role/status change before the row is written;
+      # keep the claim, the row and the counters in one transaction
+      with transaction.atomic():
          super().save(*args, **kwargs)
+      if self.is_superuser:
          self.full_clean()  # Call full_clean to trigger model validation
 
     class Meta:
@@ -49,7 +54,15 @@ class StudentProfile(models.Model):
     batch = models.ForeignKey('Batch', on_delete=models.CASCADE, related_name='student_profiles', null=True, blank=True)
     subjects = models.ManyToManyField('Subject', blank=True, related_name='student_profiles')
     total_fees = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    fees_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # running total of the FeePayment ledger, moved only by core.fees
+    fees_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # total_fees - fees_paid, kept by the database so the fee reports can
+    # sort and sum outstanding balances straight off the indexes below
+    fees_outstanding = models.GeneratedField(
+        expression=models.F('total_fees') - models.F('fees_paid'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     profile_update_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='approved')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -57,6 +70,16 @@ class StudentProfile(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.enrollment_number}"
 
+    def save(self, *args, **kwargs):
+        # a full save must not write back a stale copy of fees_paid over a
+        # payment recorded since this instance was loaded
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'fees_paid'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def fees_remaining(self):
         return self.total_fees - self.fees_paid
@@ -72,6 +95,13 @@ class StudentProfile(models.Model):
 
     class Meta:
         ordering = ['enrollment_number']
+        indexes = [
+            # top defaulters, overall and per batch; the trailing columns let
+            # the per-batch totals read the index alone (core/fee_reports.py)
+            models.Index(fields=['-fees_outstanding'], name='student_outstanding_idx'),
+            models.Index(fields=['batch', 'fees_outstanding', 'total_fees', 'fees_paid'],
+                         name='student_batch_outstanding_idx'),
+        ]
 
 
 class TeacherProfile(models.Model):
@@ -82,13 +112,23 @@ class TeacherProfile(models.Model):
     subjects_taught = models.ManyToManyField('Subject', related_name='teachers')
     experience = models.IntegerField(help_text="Years of experience")
     salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    salary_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # running total of the SalaryPayment ledger, moved only by core.payroll
+    salary_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     profile_update_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='approved')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.employee_id}"
+
+    def save(self, *args, **kwargs):
+        # as StudentProfile.save(): never write back a stale salary_paid
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'salary_paid'
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def salary_remaining(self):
@@ -105,6 +145,70 @@ class TeacherProfile(models.Model):
     class Meta:
         ordering = ['employee_id']
 
+class FeePayment(models.Model):
+    """One fee payment; StudentProfile.fees_paid is their running total (core/fees.py)"""
+    MODES = [
+        ('cash', 'Cash'),
+        ('upi', 'UPI'),
+        ('card', 'Card'),
+        ('bank', 'Bank Transfer'),
+        ('cheque', 'Cheque'),
+        ('opening', 'Opening Balance'),
+    ]
+
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='fee_payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    mode = models.CharField(max_length=20, choices=MODES, default='cash')
+    receipt_number = models.CharField(max_length=30, unique=True, null=True, blank=True)
+    paid_at = models.DateTimeField(default=timezone.now)
+    # local date of paid_at for the daily collection report; set by save(),
+    # code that bulk_creates payments sets it itself
+    paid_on = models.DateField(editable=False)
+    recorded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='recorded_fee_payments')
+    # sent with the payment form, so a resubmitted form finds its payment instead of charging twice
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return f"{self.receipt_number} - {self.amount}"
+
+    def save(self, *args, **kwargs):
+        self.paid_on = timezone.localdate(self.paid_at)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['-paid_at']
+        indexes = [
+            models.Index(fields=['student', 'paid_at'], name='feepayment_student_paid_idx'),
+            # covers the daily collection report (core/fee_reports.py)
+            models.Index(fields=['paid_on', 'mode', 'amount'], name='feepayment_paid_on_idx'),
+        ]
+
+
+class SalaryPayment(models.Model):
+    """A teacher's pay for one month of delivered lectures (core/payroll.py)"""
+    teacher = models.ForeignKey(TeacherProfile, on_delete=models.CASCADE, related_name='salary_payments')
+    month = models.DateField(help_text='First day of the month')
+    sessions = models.PositiveIntegerField()
+    hours = models.DecimalField(max_digits=7, decimal_places=2)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid_at = models.DateTimeField(default=timezone.now)
+    recorded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='recorded_salary_payments')
+
+    def __str__(self):
+        return f"{self.teacher_id} - {self.month:%Y-%m}: {self.amount}"
+
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            # a payroll run pays each teacher at most once per month
+            models.UniqueConstraint(fields=['teacher', 'month'], name='salary_one_per_month'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='salarypayment_month_idx'),
+        ]
+
+
 class Notification(models.Model):
     """Notifications for dashboard"""
     NOTIFICATION_TYPES = [
@@ -114,6 +218,7 @@ class Notification(models.Model):
         ('fees', 'Fees Updated'),
         ('salary', 'Salary Updated'),
         ('attendance', 'Attendance Marked'),
+        ('low_attendance', 'Low Attendance'),
     ]
     
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='notifications')
@@ -127,13 +232,29 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        # as CustomUser.save(): the counter claim commits with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
 
 
+class DashboardCounter(models.Model):
+    """Materialized counts for the admin dashboard, kept current by core.signals"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
 #models of timetable.
 class Subject(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    # paid per delivered lecture hour (core/payroll.py)
+    hourly_rate = models.DecimalField(max_digits=8, decimal_places=2, default=0)
 
     def __str__(self):
         return self.name
@@ -160,35 +281,74 @@ class Lecture(models.Model):
 
     # For timetable
     day = models.CharField(max_length=10, null=True, blank=True, default='Monday', choices=DAYS)
+    # 0 = Monday .. 5 = Saturday, derived from ``day`` by the database so
+    # timetables sort chronologically straight off the indexes below
+    weekday = models.GeneratedField(
+        expression=models.Case(*[models.When(day=name, then=models.Value(index)) for index, (name, _) in enumerate(DAYS)]),
+        output_field=models.PositiveSmallIntegerField(null=True),
+        db_persist=True,
+    )
     start_time = models.TimeField()
     end_time = models.TimeField()
+    room = models.CharField(max_length=50, blank=True)
 
     # For special classes
     class_date = models.DateField(null=True, blank=True)
     topic = models.CharField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
+    # also moved on the batch's / teacher's other lectures when one of them is
+    # deleted or moved, so Max('updated_at') stamps a whole timetable (core/ical.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         # Time logic validation
         if self.start_time >= self.end_time:
             raise ValidationError("Start time must be before end time")
 
-        # Clash validation (same batch + same day)
-        clash = Lecture.objects.filter(
-            day=self.day,
-            batch=self.batch,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time
-        ).exclude(pk=self.pk)  # Exclude current lecture when editing
+        # a special class is held on its date's weekday: align day with it
+        if self.class_date:
+            weekday = self.class_date.strftime('%A')
+            if weekday not in dict(self.DAYS):
+                raise ValidationError({'class_date': f'{self.class_date:%d %b %Y} is a {weekday}; classes run Monday to Saturday.'})
+            self.day = weekday
 
-        if clash.exists():
-            raise ValidationError(
-                "Lecture time clashes with an existing lecture for this batch"
-            )
+        # Clash validation: same batch, teacher or room at an overlapping time
+        from core.clashes import lecture_clashes
+        clashes = lecture_clashes(self)
+        if clashes:
+            raise ValidationError([clash.message for clash in clashes])
 
     def __str__(self):
         return f"{self.subject} - {self.batch} ({self.day})"
 
     class Meta:
-        ordering = ['-day', 'start_time']
+        ordering = ['weekday', 'start_time']
+        indexes = [
+            # batch / teacher timetables in week order, and the clash checks (core/clashes.py)
+            models.Index(fields=['batch', 'weekday', 'start_time'], name='lecture_batch_weekday_idx'),
+            models.Index(fields=['teacher', 'weekday', 'start_time'], name='lecture_teacher_weekday_idx'),
+        ]
 
+
+
+class LectureOccurrence(models.Model):
+    """One dated session of a Lecture, materialized by core/occurrences.py so
+    "today" / "upcoming" lookups are an indexed range query"""
+    lecture = models.ForeignKey(Lecture, on_delete=models.CASCADE, related_name='occurrences')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    # copied from the lecture for the range indexes below
+    teacher = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='lecture_occurrences')
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='lecture_occurrences')
+
+    def __str__(self):
+        return f"{self.lecture} on {self.date}"
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        unique_together = ('lecture', 'date')
+        indexes = [
+            models.Index(fields=['teacher', 'date', 'start_time'], name='occurrence_teacher_date_idx'),
+            models.Index(fields=['batch', 'date', 'start_time'], name='occurrence_batch_date_idx'),
+        ]
@@ -0,0 +1,85 @@
+# core/occurrences.py
+"""
+Lecture occurrences.
+
+The timetable (Lecture) is weekly: a row says "Monday 09:00, Physics, XI-A".
+materialize() expands it, together with one-off lectures that have a
+class_date, into LectureOccurrence rows -- one per concrete dated session --
+so "what is on today / this week" for a teacher or a batch is a single range
+query on the (teacher, date, start_time) / (batch, date, start_time) indexes.
+
+``python manage.py materialize_lectures`` keeps the next few weeks filled
+(run it daily). Timetable edits re-materialize the edited lecture's future
+sessions through the Lecture signals in core.signals.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q
+
+from core.models import Lecture, LectureOccurrence
+
+WEEKDAYS = {name: index for index, (name, _) in enumerate(Lecture.DAYS)}
+MATERIALIZE_WEEKS = 4
+
+
+def _dates(weekday, start, end):
+    """Every date in [start, end] that falls on ``weekday`` (0 = Monday)"""
+    day = start + timedelta(days=(weekday - start.weekday()) % 7)
+    while day <= end:
+        yield day
+        day += timedelta(weeks=1)
+
+
+def materialize(start, end, lectures=None):
+    """Create the occurrences of ``lectures`` (default: the whole timetable)
+    between ``start`` and ``end`` inclusive.
+
+    One read of the timetable and one ``bulk_create(ignore_conflicts=True)``;
+    sessions that already exist are left as they are, so reruns are cheap and
+    safe. Returns the number of occurrences that were considered.
+    """
+    lectures = Lecture.objects.all() if lectures is None else lectures
+    rows = lectures.filter(
+        Q(class_date__isnull=True, weekday__isnull=False) | Q(class_date__range=(start, end))
+    ).values_list('id', 'class_date', 'weekday', 'start_time', 'end_time', 'teacher_id', 'batch_id')
+
+    occurrences = []
+    for lecture_id, class_date, weekday, start_time, end_time, teacher_id, batch_id in rows:
+        dates = [class_date] if class_date else _dates(weekday, start, end)
+        occurrences.extend(
+            LectureOccurrence(
+                lecture_id=lecture_id, date=session, start_time=start_time, end_time=end_time,
+                teacher_id=teacher_id, batch_id=batch_id,
+            )
+            for session in dates
+        )
+    LectureOccurrence.objects.bulk_create(occurrences, ignore_conflicts=True, batch_size=2000)
+    return len(occurrences)
+
+
+def horizon(today=None):
+    """Last materialized date, or MATERIALIZE_WEEKS ahead when nothing is"""
+    today = today or date.today()
+    last = LectureOccurrence.objects.aggregate(last=Max('date'))['last']
+    return max(last or today, today + timedelta(weeks=MATERIALIZE_WEEKS))
+
+
+def refresh_lecture(lecture, today=None):
+    """Rebuild a lecture's sessions from today on after it was created or
+    edited. Past sessions are history and stay as they were."""
+    today = today or date.today()
+    with transaction.atomic():
+        LectureOccurrence.objects.filter(lecture=lecture, date__gte=today).delete()
+        materialize(today, horizon(today), Lecture.objects.filter(pk=lecture.pk))
+
+
+def upcoming(queryset, start, days=7):
+    """Occurrences from ``start`` for ``days`` days, in time order, with the
+    lecture's subject / batch / teacher loaded. ``queryset`` should already
+    be filtered on teacher or batch so the range index is used."""
+    return queryset.filter(
+        date__range=(start, start + timedelta(days=days - 1)),
+    ).select_related(
+        'lecture__subject', 'lecture__batch', 'lecture__teacher',
+    ).order_by('date', 'start_time')
@@ -0,0 +1,164 @@
+# core/payroll.py
+"""
+Monthly payroll from delivered lectures.
+
+A teacher is paid for every session they delivered in the month -- a
+LectureOccurrence for which attendance was marked -- at the session's own
+start / end time and the subject's hourly_rate. compute() gets every
+teacher's sessions, minutes and pay from one query grouped by teacher, and
+only reads: months from before materialize_lectures ran need their sessions
+created first (``python manage.py materialize_lectures --from``).
+
+Only a month that is over can be paid, since a teacher is paid once per
+month; compute() can still preview the current month so far.
+
+run() records the month's SalaryPayment rows with one bulk_create and moves
+salary_paid with one F() UPDATE, in the same transaction. A run is
+idempotent per month: the (teacher, month) unique constraint allows one
+payment, and teachers already paid for the month are skipped, so a rerun
+(after a crash, or after setting a missing rate) pays only who is left.
+Teachers with nothing to pay, or with any session of the month in a
+subject without an hourly_rate, are not recorded: paying only the rated
+sessions would close the month for them. Concurrent runs queue on
+the teacher row locks; on SQLite, which has none, the unique constraint
+rolls the second run back instead.
+"""
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, IntegerField, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from attendance.models import AttendanceRecord
+from core.models import LectureOccurrence, SalaryPayment, TeacherProfile
+
+CENT = Decimal('0.01')
+UPDATE_CHUNK_SIZE = 500
+
+
+@dataclass
+class PayLine:
+    teacher_id: int  # user id
+    profile_id: int  # None: the teacher has no profile to pay
+    name: str
+    sessions: int
+    minutes: int
+    amount: Decimal
+    unrated: int = 0  # sessions in subjects without an hourly_rate
+
+    @property
+    def hours(self):
+        return (Decimal(self.minutes) / 60).quantize(CENT, ROUND_HALF_UP)
+
+
+@dataclass
+class PayrollResult:
+    month: date
+    lines: list = field(default_factory=list)  # every teacher with delivered sessions
+    paid: list = field(default_factory=list)  # lines paid by this run
+    already_paid: list = field(default_factory=list)
+    unpaid: list = field(default_factory=list)  # no profile, or sessions without a rate
+
+    @property
+    def total(self):
+        return sum((line.amount for line in self.paid), Decimal(0))
+
+
+def month_bounds(month):
+    """First and last day of the month ``month`` falls in"""
+    first = month.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _minutes(name):
+    return ExtractHour(name) * 60 + ExtractMinute(name)
+
+
+def compute(month, today=None):
+    """A PayLine per teacher who delivered sessions in ``month`` (up to
+    ``today``), largest pay first"""
+    first, last = month_bounds(month)
+    last = min(last, today or date.today())
+    if last < first:
+        return []
+
+    minutes = _minutes('end_time') - _minutes('start_time')
+    rows = (
+        LectureOccurrence.objects.filter(date__range=(first, last))
+        .filter(Exists(AttendanceRecord.objects.filter(lecture_id=OuterRef('lecture_id'), date=OuterRef('date'))))
+        .order_by().values(
+            'teacher_id', profile_id=F('teacher__teacher_profile'),
+            first_name=F('teacher__first_name'), last_name=F('teacher__last_name'),
+        )
+        .annotate(
+            sessions=Count('pk'),
+            minutes=Sum(minutes, output_field=IntegerField()),
+            pay=Sum(minutes * F('lecture__subject__hourly_rate'), output_field=DecimalField()),
+            unrated=Count('pk', filter=Q(lecture__subject__hourly_rate__lte=0)),
+        )
+    )
+    lines = [
+        PayLine(
+            teacher_id=row['teacher_id'],
+            profile_id=row['profile_id'],
+            name=f"{row['first_name']} {row['last_name']}".strip(),
+            sessions=row['sessions'],
+            minutes=row['minutes'] or 0,
+            amount=(Decimal(row['pay'] or 0) / 60).quantize(CENT, ROUND_HALF_UP),
+            unrated=row['unrated'],
+        )
+        for row in rows
+    ]
+    lines.sort(key=lambda line: (-line.amount, line.name))
+    return lines
+
+
+def is_over(month, today=None):
+    return month_bounds(month)[1] < (today or date.today())
+
+
+def run(month, recorded_by=None, dry_run=False, today=None):
+    """Pay every teacher not yet paid for ``month``; returns a PayrollResult.
+    With ``dry_run`` nothing is written. Raises ValueError for a month that
+    isn't over."""
+    first, _ = month_bounds(month)
+    if not dry_run and not is_over(first, today):
+        raise ValueError(f'{first:%B %Y} is not over yet')
+    result = PayrollResult(month=first, lines=compute(first, today))
+    profile_ids = [line.profile_id for line in result.lines if line.profile_id]
+    with nullcontext() if dry_run else transaction.atomic():
+        if not dry_run:
+            # lock the teachers, so a concurrent run waits and then sees these payments
+            list(TeacherProfile.objects.select_for_update().filter(pk__in=profile_ids).values_list('pk', flat=True))
+        done = set(
+            SalaryPayment.objects.filter(month=first, teacher_id__in=profile_ids).values_list('teacher_id', flat=True)
+        )
+        for line in result.lines:
+            if line.profile_id in done:
+                result.already_paid.append(line)
+            elif not line.profile_id or line.unrated or line.amount <= 0:
+                result.unpaid.append(line)
+            else:
+                result.paid.append(line)
+        if dry_run or not result.paid:
+            return result
+
+        SalaryPayment.objects.bulk_create([
+            SalaryPayment(
+                teacher_id=line.profile_id, month=first, sessions=line.sessions, hours=line.hours,
+                amount=line.amount, recorded_by=recorded_by,
+            )
+            for line in result.paid
+        ], batch_size=UPDATE_CHUNK_SIZE)
+        for start in range(0, len(result.paid), UPDATE_CHUNK_SIZE):
+            chunk = result.paid[start:start + UPDATE_CHUNK_SIZE]
+            TeacherProfile.objects.filter(pk__in=[line.profile_id for line in chunk]).update(
+                salary_paid=F('salary_paid') + Case(
+                    *[When(pk=line.profile_id, then=Value(line.amount)) for line in chunk],
+                    output_field=DecimalField(),
+                ),
+            )
+    return result
@@ -0,0 +1,36 @@
+# core/principal.py
+"""
+The signed-in user, loaded with their profile.
+
+Every page loads the session, then the user (AuthenticationMiddleware), and
+most student / teacher pages then load ``request.user.student_profile`` or
+``teacher_profile`` and its batch, each a query of its own. PrincipalBackend
+(AUTHENTICATION_BACKENDS) loads the user together with either profile and
+the batch in one query. Django keeps that user on the request, so the role
+decorators and the views all read the one object.
+
+Nothing is kept between requests: role, status, is_active and the password
+hash are read fresh on every request, so a rejected, deactivated or
+demoted user, or a password change, takes effect on the next page in every
+worker.
+"""
+from django.contrib.auth.backends import ModelBackend
+
+from core.models import CustomUser
+
+
+def load_user(user_id):
+    """The user with student_profile / teacher_profile (and its batch)
+    loaded; None when there is no such user"""
+    return (
+        CustomUser.objects.select_related('student_profile__batch', 'teacher_profile')
+        .filter(pk=user_id).first()
+    )
+
+
+class PrincipalBackend(ModelBackend):
+    """ModelBackend that restores the session's user with load_user()"""
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,154 @@
+# core/search.py
+"""
+Full-text search over students and teachers.
+
+On SQLite the index is an FTS5 virtual table (``core_usersearch``, created
+by migration 0014) holding one row per user, keyed by rowid = user id, with
+name, email and enrollment / employee id. core.signals keeps it in sync on
+CustomUser, StudentProfile and TeacherProfile saves. On PostgreSQL the same
+fields are matched with a ranked tsvector query; any other backend falls
+back to icontains.
+"""
+import re
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'core_usersearch'
+RANKED_RESULTS = 200
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "name, email, code, role UNINDEXED, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+
+# one row per user: "first last username", email, "enrollment employee_id"
+_SELECT_ROWS = """
+    SELECT u.id, u.first_name || ' ' || u.last_name || ' ' || u.username, u.email,
+           COALESCE(sp.enrollment_number, '') || ' ' || COALESCE(tp.employee_id, ''), u.role
+    FROM core_customuser u
+    LEFT JOIN core_studentprofile sp ON sp.user_id = u.id
+    LEFT JOIN core_teacherprofile tp ON tp.user_id = u.id
+"""
+_INSERT = f"INSERT INTO {SEARCH_TABLE} (rowid, name, email, code, role)"
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+def index_user(user_id):
+    """(Re)index one user from the current user / profile rows"""
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [user_id])
+        cursor.execute(f'{_INSERT} {_SELECT_ROWS} WHERE u.id = %s', [user_id])
+
+
+def index_users(user_ids):
+    """(Re)index many users at once, e.g. after a bulk_create"""
+    if not uses_fts() or not user_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', user_ids)
+        cursor.execute(f'{_INSERT} {_SELECT_ROWS} WHERE u.id IN ({placeholders})', user_ids)
+
+
+def unindex_user(user_id):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [user_id])
+
+
+def rebuild_index(conn=connection):
+    """Drop and repopulate the whole FTS index with one INSERT ... SELECT"""
+    if not uses_fts(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f'{_INSERT} {_SELECT_ROWS}')
+
+
+def _match(query):
+    """FTS5 query matching every word of ``query`` as a prefix, or None"""
+    tokens = _tokens(query)
+    return ' '.join(f'"{token}"*' for token in tokens) if tokens else None
+
+
+def search_user_ids(query, role, limit=None):
+    """Ids of ``role`` users matching every word of ``query`` as a prefix, best first"""
+    match = _match(query)
+    if match is None:
+        return []
+    sql = (
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND role = %s '
+        f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 2.0, 5.0)'
+    )
+    params = [match, role]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_users(queryset, query, role, code_field):
+    """Filter a CustomUser queryset down to search matches, ranked.
+
+    Every match is kept (callers paginate or stream the queryset); the
+    RANKED_RESULTS best matches come first. An ``order_by()`` of the
+    caller's replaces the ranking, which is then not computed.
+
+    ``code_field`` is the profile lookup for the id column
+    (``student_profile__enrollment_number`` / ``teacher_profile__employee_id``).
+    """
+    if connection.vendor == 'sqlite':
+        match = _match(query)
+        if match is None:
+            return queryset.none()
+        # every match, as a subquery (no id list goes through Python); the
+        # best RANKED_RESULTS by bm25 come first, the rest follow in id order
+        matches = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND role = %s', [match, role])
+        best = search_user_ids(query, role, limit=RANKED_RESULTS)
+        ranking = Case(
+            *[When(id=pk, then=pos) for pos, pk in enumerate(best)],
+            default=len(best), output_field=IntegerField(),
+        )
+        return queryset.filter(id__in=matches).alias(search_rank=ranking).order_by('search_rank', 'id')
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        tokens = _tokens(query)
+        if not tokens:
+            return queryset.none()
+        vector = (
+            SearchVector('first_name', 'last_name', 'username', weight='A', config='simple')
+            + SearchVector(code_field, weight='B', config='simple')
+            + SearchVector('email', weight='C', config='simple')
+        )
+        ts_query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple')
+        return (
+            queryset.annotate(rank=SearchRank(vector, ts_query))
+            .filter(rank__gt=0)
+            .order_by('-rank')
+        )
+
+    return queryset.filter(
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(**{f'{code_field}__icontains': query}) |
+        Q(email__icontains=query)
+    )
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_init, pre_delete, post_delete
 from django.dispatch import receiver
-from core.models import CustomUser, StudentProfile, TeacherProfile, Notification
+from django.utils import timezone
+from core.models import CustomUser, StudentProfile, TeacherProfile, Notification, Lecture, Subject, Batch
+from core import counters, ical, occurrences, search, timetable_cache
 
 
 @receiver(post_save, sender=CustomUser)
@@ -16,3 +18,205 @@ def create_notification_on_registration(sender, instance, created, **kwargs):
                 message=f'{instance.get_full_name()} ({instance.username}) has registered as {instance.get_role_display()}',
                 related_user=instance
             )
+
+
+# Dashboard counters: remember the fields a row is counted by when it is
+# loaded. A save that changes them first claims the transition with a
+# conditional UPDATE ... WHERE <fields> = <loaded values>, and the counters
+# move only when that matched a row: of two admins approving the same
+# registration, only the first save counts it. A save that lost the race
+# recounts instead. Rows loaded with those fields deferred read them first,
+# as does instance.delete(), since the instance may be older than the row.
+
+def _remember_state(instance, fields):
+    if not instance.pk or set(fields) & instance.get_deferred_fields():
+        instance._counter_state = None
+    else:
+        instance._counter_state = tuple(getattr(instance, field) for field in fields)
+
+
+def _claim_transition(instance, fields, update_fields):
+    """Returns ``(old, claimed)``: the row's stored values of ``fields`` and
+    whether this save moved the row away from them -- None when the save
+    doesn't change them."""
+    old = instance._counter_state
+    if instance._state.adding or (update_fields is not None and not set(fields) & set(update_fields)):
+        return old, None
+    rows = type(instance)._base_manager.filter(pk=instance.pk)
+    if old is None:
+        old = rows.values_list(*fields).first()
+    new = tuple(getattr(instance, field) for field in fields)
+    if old is None or old == new:
+        return old, None
+    return old, bool(rows.filter(**dict(zip(fields, old))).update(**dict(zip(fields, new))))
+
+
+def _reread_state(instance, fields, origin):
+    # queryset.delete() collects freshly loaded rows; a single instance may be stale
+    if origin is instance:
+        instance._counter_state = type(instance)._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_user_state(sender, instance, **kwargs):
+    _remember_state(instance, ('role', 'status'))
+
+
+@receiver(pre_save, sender=CustomUser)
+def claim_user_transition(sender, instance, update_fields=None, **kwargs):
+    instance._counter_claim = _claim_transition(instance, ('role', 'status'), update_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_user_counters(sender, instance, created, **kwargs):
+    old, claimed = instance._counter_claim
+    new = (instance.role, instance.status)
+    if created:
+        counters.apply_change(set(), counters.user_buckets(*new))
+    elif claimed:
+        counters.apply_change(counters.user_buckets(*old), counters.user_buckets(*new))
+    elif claimed is False:
+        counters.refresh(*counters.USER_COUNTERS)
+    if created or claimed is not None:
+        instance._counter_state = new
+
+
+@receiver(pre_delete, sender=CustomUser)
+def reread_deleted_user_state(sender, instance, origin=None, **kwargs):
+    _reread_state(instance, ('role', 'status'), origin)
+
+
+@receiver(post_delete, sender=CustomUser)
+def discount_deleted_user(sender, instance, **kwargs):
+    state = instance._counter_state
+    counters.apply_change(
+        None if state is None else counters.user_buckets(*state), set(), recount=counters.USER_COUNTERS
+    )
+    counters.drop(counters.unread_key(instance.pk))
+
+
+@receiver(post_init, sender=Notification)
+def remember_notification_state(sender, instance, **kwargs):
+    _remember_state(instance, ('user_id', 'is_read'))
+
+
+@receiver(pre_save, sender=Notification)
+def claim_notification_transition(sender, instance, update_fields=None, **kwargs):
+    instance._counter_claim = _claim_transition(instance, ('user_id', 'is_read'), update_fields)
+
+
+@receiver(post_save, sender=Notification)
+def update_notification_counters(sender, instance, created, **kwargs):
+    old, claimed = instance._counter_claim
+    new = (instance.user_id, instance.is_read)
+    if created:
+        counters.apply_change(set(), counters.notification_buckets(*new))
+    elif claimed:
+        counters.apply_change(counters.notification_buckets(*old), counters.notification_buckets(*new))
+    elif claimed is False:
+        # recount the unread keys of both the user it was loaded for and the new one
+        counters.refresh(*{counters.unread_key(user_id) for user_id in (old[0], new[0])})
+    if created or claimed is not None:
+        instance._counter_state = new
+
+
+@receiver(pre_delete, sender=Notification)
+def reread_deleted_notification_state(sender, instance, origin=None, **kwargs):
+    _reread_state(instance, ('user_id', 'is_read'), origin)
+
+
+@receiver(post_delete, sender=Notification)
+def discount_deleted_notification(sender, instance, **kwargs):
+    state = instance._counter_state
+    counters.apply_change(
+        None if state is None else counters.notification_buckets(*state), set(),
+        recount=[counters.unread_key(instance.user_id)],
+    )
+
+
+# Search index (core/search.py): reindex the user whenever the user row or
+# either profile changes.
+
+@receiver(post_save, sender=CustomUser)
+def index_user_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # a login changes nothing that is indexed
+    search.index_user(instance.pk)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=TeacherProfile)
+def index_profile_for_search(sender, instance, **kwargs):
+    search.index_user(instance.user_id)
+
+
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def reindex_after_profile_delete(sender, instance, **kwargs):
+    search.index_user(instance.user_id)
+
+
+@receiver(post_delete, sender=CustomUser)
+def unindex_deleted_user(sender, instance, **kwargs):
+    search.unindex_user(instance.pk)
+
+
+# Lecture occurrences (core/occurrences.py): a new or edited timetable entry
+# gets its future sessions rebuilt.
+
+@receiver(post_save, sender=Lecture)
+def refresh_lecture_occurrences(sender, instance, **kwargs):
+    occurrences.refresh_lecture(instance)
+
+
+# Timetable cache (core/timetable_cache.py) and calendar feed stamps
+# (core/ical.py): remember where a lecture was when it was loaded so an edit
+# that moves it refreshes both the old and the new batch / teacher timetables.
+
+@receiver(post_init, sender=Lecture)
+def remember_lecture_owners(sender, instance, **kwargs):
+    if {'batch_id', 'teacher_id'} & instance.get_deferred_fields():
+        instance._timetable_owners = None
+    else:
+        instance._timetable_owners = (instance.batch_id, instance.teacher_id)
+
+
+@receiver(post_save, sender=Lecture)
+def invalidate_lecture_timetables(sender, instance, **kwargs):
+    old = getattr(instance, '_timetable_owners', None)
+    if old is None:
+        timetable_cache.invalidate_all()
+    else:
+        timetable_cache.invalidate(
+            batch_ids={old[0], instance.batch_id}, teacher_ids={old[1], instance.teacher_id},
+        )
+        if old != (instance.batch_id, instance.teacher_id):
+            ical.touch_lectures(batch_ids=[old[0]], teacher_ids=[old[1]])
+    instance._timetable_owners = (instance.batch_id, instance.teacher_id)
+
+
+@receiver(post_delete, sender=Lecture)
+def invalidate_deleted_lecture_timetables(sender, instance, **kwargs):
+    timetable_cache.invalidate(batch_ids=[instance.batch_id], teacher_ids=[instance.teacher_id])
+    ical.touch_lectures(batch_ids=[instance.batch_id], teacher_ids=[instance.teacher_id])
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def invalidate_all_timetables(sender, instance, **kwargs):
+    timetable_cache.invalidate_all()
+    # renamed: the lectures showing the name move their feed stamp
+    Lecture.objects.filter(**{sender._meta.model_name: instance}).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_teacher_name(sender, instance, created, update_fields=None, **kwargs):
+    """Batch timetables show the teacher's name; logins only touch last_login"""
+    if created or instance.role != 'teacher' or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    timetable_cache.invalidate(
+        batch_ids=set(Lecture.objects.filter(teacher=instance).values_list('batch_id', flat=True).order_by()),
+    )
+    ical.touch_lectures(teacher_ids=[instance.pk])
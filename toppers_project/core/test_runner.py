@@ -0,0 +1,16 @@
+"""Test runner for the project: every test runs with QUERY_BUDGET_RAISE on,
+so a page that goes over its budget in settings.QUERY_BUDGETS fails the
+test that loaded it instead of logging a warning."""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._budgets = override_settings(QUERY_BUDGET_RAISE=True)
+        self._budgets.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._budgets.disable()
+        super().teardown_test_environment(**kwargs)
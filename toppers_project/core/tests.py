@@ -0,0 +1,835 @@
+import csv
+import io
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from core import counters, fees, ical, occurrences, payroll, timetable_cache
+from core.clashes import lecture_clashes, validate_timetable
+from core.fee_reports import fee_reports
+from core.forms import FeePaymentForm, LectureForm
+from core.search import search_users
+from core.timetable_generator import Requirement, load_problem, solve
+from core.timetable_import import TimetableImporter, read_rows
+from core.models import (
+    Batch, CustomUser, FeePayment, Lecture, LectureOccurrence, Notification, SalaryPayment, StudentProfile, Subject,
+    TeacherProfile,
+)
+
+
+class CounterTests(TestCase):
+    """The materialized dashboard counters match a live count after every
+    kind of change, including two saves racing on the same row"""
+
+    def assertCountersMatch(self, *names):
+        names = names or counters.USER_COUNTERS
+        self.assertEqual(counters.read(*names), {name: counters._live_count(name) for name in names})
+
+    def unread(self, user):
+        return counters.read(counters.unread_key(user.pk))[counters.unread_key(user.pk)]
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username='admin', role='admin', status='approved')
+        counters.rebuild()
+
+    def test_registration_lifecycle(self):
+        user = CustomUser.objects.create(username='asha', role='student', status='pending')
+        self.assertCountersMatch()
+        self.assertEqual(counters.read(counters.PENDING)[counters.PENDING], 1)
+
+        user.status = 'approved'
+        user.save()
+        self.assertCountersMatch()
+        user.role = 'teacher'
+        user.save()
+        self.assertCountersMatch()
+        user.delete()
+        self.assertCountersMatch()
+
+    def test_approving_twice_counts_once(self):
+        user = CustomUser.objects.create(username='asha', role='student', status='pending')
+        first, second = CustomUser.objects.get(pk=user.pk), CustomUser.objects.get(pk=user.pk)
+        for admin_copy in (first, second):
+            admin_copy.status = 'approved'
+            admin_copy.save()
+        self.assertEqual(counters.read(counters.STUDENTS, counters.PENDING), {counters.STUDENTS: 1, counters.PENDING: 0})
+
+    def test_losing_save_recounts(self):
+        user = CustomUser.objects.create(username='asha', role='student', status='pending')
+        first, second = CustomUser.objects.get(pk=user.pk), CustomUser.objects.get(pk=user.pk)
+        first.status = 'approved'
+        first.save()
+        second.status = 'rejected'
+        second.save()
+        self.assertCountersMatch()
+
+    def test_deferred_and_stale_instances(self):
+        user = CustomUser.objects.create(username='asha', role='student', status='pending')
+        deferred = CustomUser.objects.only('username').get(pk=user.pk)
+        deferred.status = 'approved'
+        deferred.save()
+        self.assertCountersMatch()
+        user.delete()  # still remembers 'pending'
+        self.assertCountersMatch()
+
+    def test_unread_follows_the_notification(self):
+        other = CustomUser.objects.create(username='admin2', role='admin', status='approved')
+        notification = Notification.objects.create(user=self.admin, notification_type='login', title='t', message='m')
+        self.assertEqual((self.unread(self.admin), self.unread(other)), (1, 0))
+
+        notification.user = other
+        notification.save()
+        self.assertEqual((self.unread(self.admin), self.unread(other)), (0, 1))
+
+        stale = Notification.objects.get(pk=notification.pk)
+        notification.is_read = True
+        notification.save()
+        stale.user = self.admin
+        stale.save()
+        self.assertEqual((self.unread(self.admin), self.unread(other)), (1, 0))
+
+        Notification.objects.get(pk=notification.pk).delete()
+        self.assertEqual((self.unread(self.admin), self.unread(other)), (0, 0))
+
+    def test_bulk_actions_count_each_user_once(self):
+        self.client.force_login(self.admin)
+        url = reverse('bulk_registration_action')
+        students = [
+            CustomUser.objects.create(username=f'student{n}', role='student', status='pending') for n in range(3)
+        ]
+        teacher = CustomUser.objects.create(username='teacher', role='teacher', status='pending')
+        stale = CustomUser.objects.get(pk=students[0].pk)
+
+        ids = [user.pk for user in students[:2]]
+        response = self.client.post(url, {'action': 'approve', 'user_ids': ids, 'role': 'student'})
+        self.assertEqual(response['Location'], reverse('pending_registrations') + '?role=student')
+        self.client.post(url, {'action': 'approve', 'user_ids': ids})
+        stale.status = 'approved'
+        stale.save()
+        self.assertCountersMatch()
+
+        response = self.client.post(url, {'action': 'reject', 'select_all': '1', 'role': 'x\r\nSet-Cookie: a=b'})
+        self.assertEqual(response['Location'], reverse('pending_registrations'))
+        self.assertCountersMatch()
+        self.assertEqual(counters.read(counters.STUDENTS, counters.TEACHERS, counters.PENDING), {
+            counters.STUDENTS: 2, counters.TEACHERS: 0, counters.PENDING: 0,
+        })
+        notified = Notification.objects.filter(notification_type='registration').exclude(user=self.admin)
+        self.assertEqual(
+            sorted(notified.values_list('user', 'title')),
+            [(students[0].pk, 'Registration Approved'), (students[1].pk, 'Registration Approved'),
+             (students[2].pk, 'Registration Rejected'), (teacher.pk, 'Registration Rejected')],
+        )
+        self.assertEqual(self.unread(students[0]), 1)
+
+
+class FeeLedgerTests(TestCase):
+    """fees_paid is the running total of the ledger, however payments arrive"""
+
+    def setUp(self):
+        user = CustomUser.objects.create(username='asha', role='student', status='approved')
+        self.profile = StudentProfile.objects.create(
+            user=user, enrollment_number='EN1', guardian_name='Guardian', guardian_phone='1', total_fees=10000,
+        )
+
+    def fees_paid(self):
+        return StudentProfile.objects.get(pk=self.profile.pk).fees_paid
+
+    def test_replayed_form_pays_once(self):
+        key = fees.new_idempotency_key()
+        first, created = fees.record_payment(self.profile.pk, '2500', idempotency_key=key)
+        self.assertTrue(created)
+        again, created = fees.record_payment(self.profile.pk, '2500', idempotency_key=key)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(FeePayment.objects.count(), 1)
+        self.assertEqual(self.fees_paid(), Decimal('2500'))
+        self.assertEqual(first.receipt_number, fees.receipt_number(first.pk))
+
+    def test_payments_without_a_key_all_land(self):
+        fees.record_payment(self.profile.pk, '1000')
+        fees.record_payment(self.profile.pk, '1000')
+        self.assertEqual(self.fees_paid(), Decimal('2000'))
+
+    def test_stale_profile_save_keeps_the_balance(self):
+        stale = StudentProfile.objects.get(pk=self.profile.pk)
+        fees.record_payment(self.profile.pk, '1500')
+        stale.guardian_name = 'Someone else'
+        stale.save()
+        self.assertEqual(self.fees_paid(), Decimal('1500'))
+
+    def test_rejects_non_positive_amounts(self):
+        with self.assertRaises(ValueError):
+            fees.record_payment(self.profile.pk, '0')
+        self.assertFalse(FeePayment.objects.exists())
+
+    def test_generated_receipt_steps_around_a_typed_one(self):
+        first, _ = fees.record_payment(self.profile.pk, '100')
+        typed, _ = fees.record_payment(self.profile.pk, '100', receipt=fees.receipt_number(first.pk + 2))
+        self.assertEqual(typed.pk, first.pk + 1)
+
+        payment, created = fees.record_payment(self.profile.pk, '100')
+        self.assertTrue(created)
+        self.assertEqual(payment.receipt_number, fees.receipt_number(payment.pk) + '-2')
+        self.assertEqual(FeePayment.objects.get(pk=payment.pk).receipt_number, payment.receipt_number)
+        self.assertEqual(self.fees_paid(), Decimal('300'))
+
+    def test_form_reserves_the_generated_prefix(self):
+        data = {'amount': '100', 'mode': 'cash', 'idempotency_key': fees.new_idempotency_key()}
+        self.assertFalse(FeePaymentForm({**data, 'receipt_number': 'tp0000042'}).is_valid())
+        self.assertTrue(FeePaymentForm({**data, 'receipt_number': 'R-42'}).is_valid())
+        self.assertTrue(FeePaymentForm(data).is_valid())
+
+    def test_reconcile(self):
+        fees.record_payment(self.profile.pk, '3000')
+        StudentProfile.objects.filter(pk=self.profile.pk).update(fees_paid=Decimal('100'))
+
+        self.assertEqual(fees.reconcile(dry_run=True), [(self.profile.pk, Decimal('100'), Decimal('3000'))])
+        self.assertEqual(self.fees_paid(), Decimal('100'))
+        fees.reconcile()
+        self.assertEqual(self.fees_paid(), Decimal('3000'))
+        self.assertEqual(fees.reconcile(dry_run=True), [])
+
+
+class ClashTests(TestCase):
+    """Lectures clash on a shared batch, teacher or room at overlapping times"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jee, cls.neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        cls.physics = Subject.objects.create(name='Physics')
+        cls.mehta = CustomUser.objects.create(username='mehta', role='teacher', status='approved')
+        cls.rao = CustomUser.objects.create(username='rao', role='teacher', status='approved')
+        cls.saved = Lecture.objects.create(
+            teacher=cls.mehta, subject=cls.physics, batch=cls.jee, day='Monday',
+            start_time=time(9), end_time=time(10, 30), room='Room 1', topic='Kinematics',
+        )
+
+    def lecture(self, **fields):
+        values = {
+            'teacher': self.rao, 'subject': self.physics, 'batch': self.neet, 'day': 'Monday',
+            'start_time': time(10), 'end_time': time(11), 'topic': 'Optics',
+        }
+        values.update(fields)
+        return Lecture(**values)
+
+    def kinds(self, lecture):
+        return sorted(clash.kind for clash in lecture_clashes(lecture))
+
+    def test_shared_resources_clash(self):
+        self.assertEqual(self.kinds(self.lecture(batch=self.jee)), ['batch'])
+        self.assertEqual(self.kinds(self.lecture(teacher=self.mehta)), ['teacher'])
+        self.assertEqual(self.kinds(self.lecture(room=' room 1 ')), ['room'])
+        self.assertEqual(self.kinds(self.lecture(batch=self.jee, teacher=self.mehta)), ['batch', 'teacher'])
+
+    def test_no_clash(self):
+        self.assertEqual(self.kinds(self.lecture()), [])  # nothing shared
+        self.assertEqual(self.kinds(self.lecture(batch=self.jee, start_time=time(10, 30))), [])  # back to back
+        self.assertEqual(self.kinds(self.lecture(batch=self.jee, day='Tuesday')), [])
+        self.assertEqual(self.kinds(self.saved), [])  # not with itself
+
+    def test_clean_rejects_a_clash(self):
+        with self.assertRaises(ValidationError):
+            self.lecture(batch=self.jee).full_clean()
+        self.lecture().full_clean()
+
+    def test_one_off_is_checked_on_its_date(self):
+        monday = date(2026, 9, 14)
+        for day in ('', 'Tuesday'):  # blank, or not the date's weekday
+            self.assertEqual(self.kinds(self.lecture(batch=self.jee, class_date=monday, day=day)), ['batch'])
+        self.assertEqual(self.kinds(self.lecture(batch=self.jee, class_date=monday + timedelta(days=1), day='Monday')), [])
+
+    def test_weekly_lecture_meets_a_mismatched_one_off(self):
+        today = date.today()
+        wednesday = today + timedelta(days=(2 - today.weekday()) % 7 + 7)
+        Lecture.objects.create(  # saved without clean(): day disagrees with the date
+            teacher=self.rao, subject=self.physics, batch=self.neet, day='Friday', class_date=wednesday,
+            start_time=time(14), end_time=time(15), topic='Revision',
+        )
+        weekly = self.lecture(day='Wednesday', start_time=time(14, 30), end_time=time(15, 30))
+        self.assertEqual(self.kinds(weekly), ['batch', 'teacher'])
+        self.assertEqual(sorted(validate_timetable([weekly], today=today)), [0])
+
+    def test_form_aligns_day_with_class_date(self):
+        data = {
+            'teacher': self.rao.pk, 'subject': self.physics.pk, 'batch': self.neet.pk, 'day': '',
+            'start_time': '14:00', 'end_time': '15:00', 'room': '', 'class_date': '2026-09-16',
+        }
+        form = LectureForm(data, instance=Lecture(topic='Revision'))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().day, 'Wednesday')
+
+        form = LectureForm(dict(data, day='Monday', class_date='2026-09-20'), instance=Lecture(topic='Revision'))
+        self.assertFalse(form.is_valid())  # a Sunday
+        self.assertIn('class_date', form.errors)
+
+    def test_validate_timetable(self):
+        today = date(2026, 9, 1)
+        rows = [
+            self.lecture(),
+            self.lecture(start_time=time(10, 30), end_time=time(11, 30)),  # rao and NEET again
+            self.lecture(class_date=date(2026, 9, 14), teacher=self.mehta, batch=self.jee, start_time=time(12), end_time=time(13)),
+            self.lecture(class_date=date(2026, 9, 21), teacher=self.mehta, batch=self.jee, start_time=time(12), end_time=time(13)),
+            self.lecture(batch=self.jee, start_time=time(8), end_time=time(9, 30)),  # the saved lecture
+        ]
+        problems = validate_timetable(rows, today=today)
+        self.assertEqual(sorted(problems), [1, 4])
+        self.assertEqual(sorted(clash.kind for clash in problems[1]), ['batch', 'teacher'])
+        self.assertEqual([clash.other for clash in problems[4]], [self.saved])
+
+
+class PayrollTests(TestCase):
+    """Teachers are paid once per finished month for the sessions they delivered"""
+
+    SEPTEMBER = date(2026, 9, 1)
+    OCTOBER_5 = date(2026, 10, 5)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = batch = Batch.objects.create(name='JEE 2027')
+        cls.student = student = CustomUser.objects.create(username='asha', role='student', status='approved')
+        cls.physics = Subject.objects.create(name='Physics', hourly_rate=600)
+        cls.chemistry = chemistry = Subject.objects.create(name='Chemistry')  # no rate
+        cls.mehta = cls.teacher('mehta')
+        rao = cls.teacher('rao')
+        physics = Lecture.objects.create(
+            teacher=cls.mehta, subject=cls.physics, batch=batch, day='Monday',
+            start_time=time(9), end_time=time(10, 30), topic='Kinematics',
+        )
+        chem = Lecture.objects.create(
+            teacher=rao, subject=chemistry, batch=batch, day='Tuesday',
+            start_time=time(9), end_time=time(10), topic='Bonding',
+        )
+        occurrences.materialize(cls.SEPTEMBER, date(2026, 9, 30))
+        # delivered: two Mondays and one Tuesday; the other sessions were never marked
+        for lecture, day in ((physics, date(2026, 9, 7)), (physics, date(2026, 9, 14)), (chem, date(2026, 9, 8))):
+            AttendanceRecord.objects.create(lecture=lecture, student=student, date=day, status='present')
+
+    @classmethod
+    def teacher(cls, username):
+        user = CustomUser.objects.create(username=username, first_name=username.title(), role='teacher', status='approved')
+        TeacherProfile.objects.create(user=user, employee_id=f'EMP-{username}', qualifications='M.Sc.', experience=5)
+        return user
+
+    def test_compute(self):
+        lines = {line.teacher_id: line for line in payroll.compute(self.SEPTEMBER, today=self.OCTOBER_5)}
+        mehta = lines[self.mehta.pk]
+        self.assertEqual((mehta.sessions, mehta.minutes, mehta.hours, mehta.amount), (2, 180, Decimal('3.00'), Decimal('1800.00')))
+        self.assertEqual(len(lines), 2)
+
+    def test_run_pays_once(self):
+        result = payroll.run(self.SEPTEMBER, today=self.OCTOBER_5)
+        self.assertEqual([line.teacher_id for line in result.paid], [self.mehta.pk])
+        self.assertEqual(len(result.unpaid), 1)  # rao has no rate
+        self.assertEqual(TeacherProfile.objects.get(user=self.mehta).salary_paid, Decimal('1800.00'))
+
+        again = payroll.run(self.SEPTEMBER, today=self.OCTOBER_5)
+        self.assertEqual((again.paid, len(again.already_paid)), ([], 1))
+        self.assertEqual(SalaryPayment.objects.count(), 1)
+        self.assertEqual(TeacherProfile.objects.get(user=self.mehta).salary_paid, Decimal('1800.00'))
+
+    def test_sessions_without_a_rate_hold_the_teacher_back(self):
+        maths = Subject.objects.create(name='Mathematics')  # no rate yet
+        algebra = Lecture.objects.create(
+            teacher=self.mehta, subject=maths, batch=self.batch, day='Wednesday',
+            start_time=time(9), end_time=time(10), topic='Algebra',
+        )
+        occurrences.materialize(self.SEPTEMBER, date(2026, 9, 30), Lecture.objects.filter(pk=algebra.pk))
+        AttendanceRecord.objects.create(lecture=algebra, student=self.student, date=date(2026, 9, 9), status='present')
+
+        result = payroll.run(self.SEPTEMBER, today=self.OCTOBER_5)
+        self.assertEqual(result.paid, [])
+        [mehta] = [line for line in result.unpaid if line.teacher_id == self.mehta.pk]
+        self.assertEqual((mehta.sessions, mehta.unrated, mehta.amount), (3, 1, Decimal('1800.00')))
+        self.assertFalse(SalaryPayment.objects.exists())
+
+        Subject.objects.filter(pk=maths.pk).update(hourly_rate=300)
+        result = payroll.run(self.SEPTEMBER, today=self.OCTOBER_5)
+        self.assertEqual([(line.teacher_id, line.amount) for line in result.paid], [(self.mehta.pk, Decimal('2100.00'))])
+
+    def test_unfinished_month_is_not_paid(self):
+        mid_month = date(2026, 9, 20)
+        with self.assertRaises(ValueError):
+            payroll.run(self.SEPTEMBER, today=mid_month)
+        preview = payroll.run(self.SEPTEMBER, dry_run=True, today=mid_month)
+        self.assertEqual(preview.total, Decimal('1800.00'))
+        self.assertFalse(SalaryPayment.objects.exists())
+
+    def test_preview_page_only_reads(self):
+        admin = CustomUser.objects.create(username='admin', role='admin', status='approved', is_staff=True)
+        self.client.force_login(admin)
+        sessions = LectureOccurrence.objects.count()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('payroll'), {'month': '2026-08'})
+        self.assertEqual(response.status_code, 200)
+        writes = [query['sql'] for query in ctx.captured_queries if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertEqual(LectureOccurrence.objects.count(), sessions)
+
+
+class ImportTests(TestCase):
+    """CSV import from the admin upload page"""
+
+    HEADER = 'username,email,first_name,last_name,password,enrollment_number,guardian_name,guardian_phone,batch,subjects\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        Batch.objects.create(name='JEE 2027')
+        Subject.objects.create(name='Physics')
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', status='approved')
+
+    def upload(self, rows):
+        self.client.force_login(self.admin)
+        csv_file = SimpleUploadedFile('students.csv', (self.HEADER + rows).encode(), content_type='text/csv')
+        return self.client.post(reverse('import_users'), {'role': 'student', 'file': csv_file})
+
+    def test_upload_hashes_in_process(self):
+        with mock.patch('core.importers.ProcessPoolExecutor', side_effect=AssertionError('pool started')):
+            response = self.upload(
+                'asha,family@example.com,Asha,Rao,secret123,EN1,Guardian,1,JEE 2027,Physics\n'
+                'ravi,family@example.com,Ravi,Rao,secret123,EN2,Guardian,1,JEE 2027,Physics\n'
+            )
+        self.assertEqual(response.context['result'].created, 2)  # siblings may share an email
+        self.assertTrue(CustomUser.objects.get(username='ravi').check_password('secret123'))
+
+    def test_duplicates_are_reported(self):
+        response = self.upload(
+            'admin,a@example.com,A,B,,EN1,Guardian,1,JEE 2027,Physics\n'
+            'asha,b@example.com,Asha,Rao,,EN2,Guardian,1,JEE 2027,Physics\n'
+            'asha,c@example.com,Asha,Rao,,EN3,Guardian,1,JEE 2027,Physics\n'
+            'ravi,d@example.com,Ravi,Rao,,EN2,Guardian,1,JEE 2027,Physics\n'
+        )
+        result = response.context['result']
+        self.assertEqual((result.created, result.failed), (1, 3))
+        self.assertEqual([line for line, _, _ in result.errors], [2, 4, 5])
+
+
+class PerformanceTimingTests(TestCase):
+    """Server-Timing and template timing only with PERFORMANCE_TIMING"""
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='admin', role='admin', status='approved'))
+
+    @override_settings(PERFORMANCE_TIMING=False)
+    def test_off(self):
+        with self.assertLogs('toppers.performance') as logs:
+            response = self.client.get(reverse('manage_subjects'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('template_ms', logs.records[0].performance)
+
+    @override_settings(PERFORMANCE_TIMING=True)
+    def test_on(self):
+        with self.assertLogs('toppers.performance') as logs:
+            response = self.client.get(reverse('manage_subjects'))
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertGreater(logs.records[0].performance['template_ms'], 0)
+
+
+class TimetableImportTests(TestCase):
+    """A timetable file is validated as a whole with the Lecture field rules"""
+
+    HEADER = 'batch,subject,teacher,day,start_time,end_time,room,class_date,topic\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        Batch.objects.create(name='JEE 2027')
+        Subject.objects.create(name='Physics')
+        CustomUser.objects.create(username='mehta', role='teacher', status='approved')
+
+    def run_import(self, rows):
+        return TimetableImporter(today=date(2026, 9, 1)).run(read_rows((self.HEADER + rows).splitlines(keepends=True), 'csv'))
+
+    def test_topic_is_required(self):
+        result = self.run_import(
+            'JEE 2027,Physics,mehta,Monday,09:00,10:00,,,Kinematics\n'
+            'JEE 2027,Physics,mehta,Tuesday,09:00,10:00,,,\n'
+        )
+        self.assertEqual([(line, message) for line, _, message in result.errors], [(3, 'topic: This field cannot be blank.')])
+        self.assertFalse(Lecture.objects.exists())
+
+    def test_valid_file_is_written(self):
+        result = self.run_import(
+            'JEE 2027,Physics,mehta,Monday,09:00,10:00,,,Kinematics\n'
+            'jee 2027,physics,mehta,,11:00,12:00,Lab 2,2026-09-08,Optics\n'
+        )
+        self.assertEqual((result.errors, result.created), ([], 2))
+        self.assertEqual(Lecture.objects.get(class_date=date(2026, 9, 8)).day, 'Tuesday')
+
+
+class TimetableFeedTests(TestCase):
+    """A poll of an unchanged feed is answered 304; any change to what the
+    feed shows, including the student's batch, is answered 200"""
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = CustomUser.objects.create(username='mehta', role='teacher', status='approved')
+        physics = Subject.objects.create(name='Physics')
+        cls.jee, cls.neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        for batch, hour in ((cls.jee, 9), (cls.neet, 11)):
+            Lecture.objects.create(
+                teacher=teacher, subject=physics, batch=batch, day='Monday',
+                start_time=time(hour), end_time=time(hour + 1), topic='Kinematics',
+            )
+        student = CustomUser.objects.create(username='asha', role='student', status='approved')
+        cls.profile = StudentProfile.objects.create(
+            user=student, enrollment_number='EN1', guardian_name='Guardian', guardian_phone='1', batch=cls.jee,
+        )
+        cls.url = reverse('timetable_feed', args=[ical.feed_token('student', student.pk)])
+
+    def setUp(self):
+        # everything last changed a day ago, so a change now lands in a later second
+        yesterday = timezone.now() - timedelta(days=1)
+        Lecture.objects.update(updated_at=yesterday)
+        StudentProfile.objects.update(updated_at=yesterday)
+
+    def test_unchanged_feed_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'T090000', first.content)
+
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        again = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_changing_batch_is_modified(self):
+        first = self.client.get(self.url)
+        self.profile.batch = self.neet
+        self.profile.save()
+
+        again = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(again.status_code, 200)
+        self.assertIn(b'T110000', again.content)
+        self.assertNotIn(b'T090000', again.content)
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 200)
+
+
+class ExportTests(TestCase):
+    """Exports stream their rows as the response is read, quoted as CSV"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', role='admin', status='approved')
+        cls.jee, neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        cls.profiles = []
+        for n, (batch, last_name) in enumerate([(cls.jee, 'Rao, "Jr."\nII'), (neet, 'Shah')]):
+            user = CustomUser.objects.create(
+                username=f'student{n}', first_name='Asha', last_name=last_name, role='student', status='approved',
+            )
+            cls.profiles.append(StudentProfile.objects.create(
+                user=user, enrollment_number=f'EN{n}', guardian_name='Guardian', guardian_phone='1',
+                batch=batch, total_fees=10000,
+            ))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_students_are_quoted(self):
+        rows = self.read(self.client.get(reverse('export_students')))
+        self.assertEqual(rows[0][:3], ['Username', 'First Name', 'Last Name'])
+        self.assertEqual([row[:3] for row in rows[1:]], [
+            ['student0', 'Asha', 'Rao, "Jr."\nII'],
+            ['student1', 'Asha', 'Shah'],
+        ])
+
+    def test_fee_payments_stream_the_ledger(self):
+        fees.record_payment(self.profiles[0].pk, '2500', note='first, "half"')
+        fees.record_payment(self.profiles[1].pk, '1000', mode='upi')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('export_fee_payments'), {'batch': self.jee.pk})
+        self.assertFalse(any('core_feepayment' in query['sql'] for query in queries))
+
+        rows = self.read(response)
+        self.assertEqual(rows[0][:2], ['Date', 'Receipt #'])
+        self.assertEqual(len(rows), 2)
+        payment = FeePayment.objects.get(student=self.profiles[0])
+        self.assertEqual(rows[1][1:4] + rows[1][7:], [
+            payment.receipt_number, 'EN0', 'student0', '2500.00', 'cash', '', 'first, "half"',
+        ])
+
+    def test_admins_only(self):
+        self.client.force_login(self.profiles[0].user)
+        self.assertEqual(self.client.get(reverse('export_fee_payments')).status_code, 302)
+
+
+class SearchTests(TestCase):
+    """The FTS index follows user and profile changes and ranks name matches
+    above email matches; other backends fall back to icontains"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kavya, cls.riya = [
+            CustomUser.objects.create(
+                username=username, first_name=first, last_name=last, email=email, role='student', status='approved',
+            )
+            for username, first, last, email in [
+                ('ks', 'Kavya', 'Sharma', 'ks@example.com'),
+                ('rp', 'Riya', 'Patil', 'kavya.patil@example.com'),
+            ]
+        ]
+        StudentProfile.objects.create(
+            user=cls.kavya, enrollment_number='EN2027001', guardian_name='Guardian', guardian_phone='1',
+        )
+        CustomUser.objects.create(username='kavya', first_name='Kavya', role='teacher', status='approved')
+
+    def search(self, query):
+        students = CustomUser.objects.filter(role='student')
+        return list(search_users(students, query, 'student', 'student_profile__enrollment_number'))
+
+    def test_ranked_prefix_match(self):
+        self.assertEqual(self.search('kav'), [self.kavya, self.riya])
+        self.assertEqual(self.search('Kav  SHAR'), [self.kavya])
+        self.assertEqual(self.search('en2027'), [self.kavya])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_index_follows_changes(self):
+        self.riya.last_name = 'Deshpande'
+        self.riya.save()
+        self.assertEqual(self.search('desh'), [self.riya])
+        StudentProfile.objects.filter(user=self.kavya).get().delete()
+        self.assertEqual(self.search('en2027'), [])
+        self.kavya.delete()
+        self.assertEqual(self.search('kav'), [self.riya])
+
+    def test_other_backends_fall_back_to_icontains(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            found = self.search('avya')
+        self.assertCountEqual(found, [self.kavya, self.riya])
+
+
+class OccurrenceTests(TestCase):
+    """Weekly lectures become one session per week and one-offs one on their
+    date; an edit rebuilds only the sessions from the day it was made"""
+
+    AUGUST, AUGUST_END = date(2026, 8, 1), date(2026, 8, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mehta = CustomUser.objects.create(username='mehta', role='teacher', status='approved')
+        batch, physics = Batch.objects.create(name='JEE 2027'), Subject.objects.create(name='Physics')
+        cls.weekly = Lecture.objects.create(
+            teacher=cls.mehta, subject=physics, batch=batch, day='Monday',
+            start_time=time(9), end_time=time(10), topic='Kinematics',
+        )
+        cls.one_off = Lecture.objects.create(
+            teacher=cls.mehta, subject=physics, batch=batch, day='Thursday', class_date=date(2026, 8, 6),
+            start_time=time(11), end_time=time(12), topic='Doubts',
+        )
+
+    def sessions(self, lecture):
+        return list(LectureOccurrence.objects.filter(
+            lecture=lecture, date__range=(self.AUGUST, self.AUGUST_END),
+        ).order_by('date').values_list('date', 'start_time'))
+
+    def test_materialize(self):
+        self.assertEqual(occurrences.materialize(self.AUGUST, self.AUGUST_END), 6)
+        self.assertEqual([day for day, _ in self.sessions(self.weekly)], [date(2026, 8, day) for day in (3, 10, 17, 24, 31)])
+        self.assertEqual(self.sessions(self.one_off), [(date(2026, 8, 6), time(11))])
+
+        total = LectureOccurrence.objects.count()
+        occurrences.materialize(self.AUGUST, self.AUGUST_END)
+        self.assertEqual(LectureOccurrence.objects.count(), total)
+
+        week = occurrences.upcoming(LectureOccurrence.objects.filter(teacher=self.mehta), date(2026, 8, 3))
+        self.assertEqual([(session.date, session.lecture.topic) for session in week], [
+            (date(2026, 8, 3), 'Kinematics'), (date(2026, 8, 6), 'Doubts'),
+        ])
+
+    def test_edit_keeps_past_sessions(self):
+        occurrences.materialize(self.AUGUST, self.AUGUST_END)
+        Lecture.objects.filter(pk=self.weekly.pk).update(day='Wednesday', start_time=time(14), end_time=time(15))
+
+        occurrences.refresh_lecture(Lecture.objects.get(pk=self.weekly.pk), today=date(2026, 8, 11))
+        self.assertEqual(self.sessions(self.weekly), [
+            (date(2026, 8, 3), time(9)), (date(2026, 8, 10), time(9)),
+            (date(2026, 8, 12), time(14)), (date(2026, 8, 19), time(14)), (date(2026, 8, 26), time(14)),
+        ])
+
+
+class TimetableGeneratorTests(TestCase):
+    """The generated week has no batch or teacher clash, keeps to teacher
+    availability, fits around the saved timetable and imports cleanly"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jee, cls.neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        physics, chemistry, maths = [Subject.objects.create(name=name) for name in ('Physics', 'Chemistry', 'Maths')]
+        cls.subjects = [physics, chemistry, maths]
+        cls.mehta, cls.rao = [
+            CustomUser.objects.create(username=username, role='teacher', status='approved') for username in ('mehta', 'rao')
+        ]
+        for teacher, taught in ((cls.mehta, [physics, chemistry]), (cls.rao, [chemistry, maths])):
+            profile = TeacherProfile.objects.create(user=teacher, employee_id=f'EMP-{teacher.username}', experience=5)
+            profile.subjects_taught.set(taught)
+        cls.saved = Lecture.objects.create(
+            teacher=cls.mehta, subject=physics, batch=cls.jee, day='Monday',
+            start_time=time(9), end_time=time(10), topic='Kinematics',
+        )
+
+    def test_solution_is_clash_free(self):
+        requirements = [
+            Requirement(batch.pk, subject.pk, 4) for batch in (self.jee, self.neet) for subject in self.subjects
+        ]
+        availability = {self.rao.pk: [('Tuesday', time(8), time(18)), ('Wednesday', time(8), time(18))]}
+        problem = load_problem(requirements=requirements, availability=availability)
+        solution = solve(problem, time_budget=1.0)
+        self.assertTrue(solution.complete, solution.describe_unplaced())
+        self.assertEqual(len(solution.placements), 24)
+
+        taken = set()
+        for batch_id, subject_id, teacher_id, slot in solution.placements:
+            day, start, _ = problem.slots[slot]
+            for key in (('batch', batch_id), ('teacher', teacher_id)):
+                self.assertNotIn((key, slot), taken)
+                self.assertNotIn(slot, problem.busy.get(key, ()))
+                taken.add((key, slot))
+            if teacher_id == self.rao.pk:
+                self.assertIn(day, ('Tuesday', 'Wednesday'))
+            self.assertNotEqual((batch_id, day, start), (self.jee.pk, 'Monday', time(9)))
+
+        result = TimetableImporter().run(enumerate(solution.rows(problem), start=1))
+        self.assertEqual((result.errors, result.created), ([], 24))
+
+
+class TimetableCacheTests(TestCase):
+    """Cached timetables are served without queries and replaced once an
+    edit commits, for the batches and teachers it touched only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mehta = CustomUser.objects.create(username='mehta', first_name='Anil', role='teacher', status='approved')
+        cls.jee, cls.neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        cls.physics = Subject.objects.create(name='Physics')
+        cls.lecture = Lecture.objects.create(
+            teacher=cls.mehta, subject=cls.physics, batch=cls.jee, day='Monday',
+            start_time=time(9), end_time=time(10), topic='Kinematics',
+        )
+        Lecture.objects.create(
+            teacher=CustomUser.objects.create(username='rao', role='teacher', status='approved'),
+            subject=cls.physics, batch=cls.neet, day='Monday', start_time=time(9), end_time=time(10), topic='Optics',
+        )
+
+    def setUp(self):
+        caches[settings.TIMETABLE_CACHE].clear()
+
+    def topics(self, batch):
+        return [row['topic'] for row in timetable_cache.batch_timetable(batch.pk)]
+
+    def test_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(timetable_cache.batch_timetables([self.jee.pk, self.neet.pk])[self.jee.pk][0]['teacher'], 'Anil')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.topics(self.jee), ['Kinematics'])
+            self.assertEqual(self.topics(self.neet), ['Optics'])
+        with self.assertNumQueries(1):
+            self.assertEqual(timetable_cache.teacher_timetable(self.mehta.pk)[0]['batch'], 'JEE 2027')
+
+    def test_edit_invalidates_on_commit(self):
+        self.topics(self.jee)
+        self.topics(self.neet)
+        lecture = Lecture.objects.get(pk=self.lecture.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            lecture.topic = 'Vectors'
+            lecture.save()
+            self.assertEqual(self.topics(self.jee), ['Kinematics'])  # not committed yet
+        self.assertEqual(self.topics(self.jee), ['Vectors'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.topics(self.neet), ['Optics'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mehta.first_name = 'Anil Kumar'
+            self.mehta.save()
+        self.assertEqual(timetable_cache.batch_timetable(self.jee.pk)[0]['teacher'], 'Anil Kumar')
+
+        self.topics(self.neet)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.physics.name = 'Physics I'
+            self.physics.save()
+        self.assertEqual(timetable_cache.batch_timetable(self.neet.pk)[0]['subject'], 'Physics I')
+
+
+class FeeReportTests(TestCase):
+    """Fee reports add up the ledger and are served from the cache until
+    they expire or a fresh copy is asked for"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jee, neet = Batch.objects.create(name='JEE 2027'), Batch.objects.create(name='NEET 2027')
+        cls.profiles = []
+        for n, (batch, total) in enumerate([(cls.jee, 10000), (cls.jee, 8000), (neet, 6000)]):
+            user = CustomUser.objects.create(username=f'student{n}', role='student', status='approved')
+            cls.profiles.append(StudentProfile.objects.create(
+                user=user, enrollment_number=f'EN{n}', guardian_name='Guardian', guardian_phone='1',
+                batch=batch, total_fees=total,
+            ))
+        fees.record_payment(cls.profiles[0].pk, '4000', mode='opening')
+        fees.record_payment(cls.profiles[0].pk, '1000')
+        fees.record_payment(cls.profiles[2].pk, '6000', mode='upi')
+
+    def setUp(self):
+        caches[settings.REPORTS_CACHE].clear()
+
+    def test_reports(self):
+        reports = fee_reports()
+        self.assertEqual(reports['summary'], {
+            'students': 3, 'fees': Decimal('24000'), 'collected': Decimal('11000'),
+            'outstanding': Decimal('13000'), 'defaulters': 2,
+        })
+        self.assertEqual(
+            [(row['batch_name'], row['outstanding']) for row in reports['batches']],
+            [('JEE 2027', Decimal('13000')), ('NEET 2027', Decimal('0'))],
+        )
+        self.assertEqual([row['enrollment_number'] for row in reports['defaulters']], ['EN1', 'EN0'])
+        today = reports['collection'][-1]
+        self.assertEqual((today['payments'], today['amount']), (2, Decimal('7000')))  # not the opening balance
+        self.assertEqual(len(reports['collection']), 30)
+        self.assertEqual(reports['collection'][0]['payments'], 0)
+
+    def test_cached_until_refreshed(self):
+        first = fee_reports()
+        fees.record_payment(self.profiles[1].pk, '8000')
+        with self.assertNumQueries(0):
+            cached = fee_reports()
+        self.assertEqual((cached['computed_at'], cached['summary']['defaulters']), (first['computed_at'], 2))
+
+        fresh = fee_reports(refresh=True)
+        self.assertEqual(fresh['summary']['defaulters'], 1)
+        self.assertEqual(fee_reports()['computed_at'], fresh['computed_at'])
+
+        by_batch = fee_reports(batch_id=self.jee.pk)
+        self.assertEqual([row['enrollment_number'] for row in by_batch['defaulters']], ['EN0'])
+
+
+class PrincipalBackendTests(TestCase):
+    """New logins use PrincipalBackend; sessions made with ModelBackend
+    before it was added stay signed in"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret', role='admin', status='approved')
+
+    def test_new_login(self):
+        self.assertTrue(self.client.login(username='admin', password='secret'))
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'core.principal.PrincipalBackend')
+
+    def test_existing_session(self):
+        self.client.force_login(self.admin, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('manage_subjects')).status_code, 200)
@@ -0,0 +1,138 @@
+# core/timetable_cache.py
+"""
+Cached weekly timetables.
+
+A batch's (or a teacher's) weekly timetable changes rarely but is read on
+every visit to the lecture pages, so it is stored serialized -- a list of
+plain dicts, in week order -- in the cache named by
+``settings.TIMETABLE_CACHE`` (default: ``'default'``).
+
+Keys are versioned instead of deleted: an entry's key embeds a global
+version and the version of its batch / teacher, and invalidating just moves
+the version on, so stale entries are never read again and simply expire.
+Version keys start from the clock, not from 1, so a version key that was
+evicted can't come back at a number an old entry is still stored under.
+
+* Lecture saves / deletes bump the old and new batch and teacher (the
+  receivers in core.signals, after commit);
+* Subject / Batch saves / deletes and bulk writes that skip signals
+  (timetable import, sample data) bump the global version;
+* a teacher's name change bumps the batches they teach.
+
+With the local-memory backend every process has its own copy and only sees
+its own invalidations, which is fine for runserver / a single worker. Under
+several gunicorn workers point TIMETABLE_CACHE at a shared backend, e.g.
+``django.core.cache.backends.filebased.FileBasedCache``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.models import Lecture
+
+TIMEOUT = 24 * 60 * 60
+GLOBAL_VERSION = 'timetable:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'TIMETABLE_CACHE', 'default')]
+
+
+def _version_key(scope, pk):
+    return f'timetable:version:{scope}:{pk}'
+
+
+def _versions(cache, keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def _serialize(lectures):
+    return [
+        {
+            'id': lecture.id,
+            'day': lecture.day,
+            'start_time': lecture.start_time,
+            'end_time': lecture.end_time,
+            'room': lecture.room,
+            'class_date': lecture.class_date,
+            'topic': lecture.topic,
+            'subject': lecture.subject.name,
+            'batch': lecture.batch.name,
+            'teacher': lecture.teacher.get_full_name() or lecture.teacher.username,
+        }
+        for lecture in lectures
+    ]
+
+
+def _timetables(scope, ids):
+    """{id: serialized timetable} for a batch / teacher scope: one cache
+    round trip for the versions, one for the entries, and one query for
+    whatever is missing"""
+    if not ids:
+        return {}
+    cache = _cache()
+    versions = _versions(cache, [GLOBAL_VERSION, *(_version_key(scope, pk) for pk in ids)])
+    keys = {
+        pk: f'timetable:{scope}:{pk}:{versions[GLOBAL_VERSION]}.{versions[_version_key(scope, pk)]}'
+        for pk in ids
+    }
+    found = cache.get_many(keys.values())
+    result = {pk: found[key] for pk, key in keys.items() if key in found}
+
+    missing = [pk for pk in ids if pk not in result]
+    if missing:
+        lectures = Lecture.objects.filter(**{f'{scope}_id__in': missing}).select_related(
+            'subject', 'batch', 'teacher',
+        ).order_by(f'{scope}_id', 'weekday', 'start_time')
+        fresh = {pk: [] for pk in missing}
+        for lecture in lectures:
+            fresh[getattr(lecture, f'{scope}_id')].append(lecture)
+        fresh = {pk: _serialize(rows) for pk, rows in fresh.items()}
+        cache.set_many({keys[pk]: rows for pk, rows in fresh.items()}, TIMEOUT)
+        result.update(fresh)
+    return result
+
+
+def batch_timetable(batch_id):
+    """A batch's lectures in week order, as dicts"""
+    return _timetables('batch', [batch_id]).get(batch_id, []) if batch_id else []
+
+
+def batch_timetables(batch_ids):
+    return _timetables('batch', list(batch_ids))
+
+
+def teacher_timetable(teacher_id):
+    """A teacher's lectures in week order, as dicts"""
+    return _timetables('teacher', [teacher_id]).get(teacher_id, [])
+
+
+def _bump(keys):
+    cache = _cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass  # never read since it was evicted: the next read starts a fresh version
+
+
+def invalidate(batch_ids=(), teacher_ids=()):
+    """Drop the cached timetables of these batches / teachers once the
+    current transaction commits (so no reader re-caches the old rows)"""
+    keys = {_version_key('batch', pk) for pk in batch_ids if pk}
+    keys |= {_version_key('teacher', pk) for pk in teacher_ids if pk}
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_all():
+    """Drop every cached timetable (after bulk writes, Subject / Batch changes)"""
+    transaction.on_commit(lambda: _bump([GLOBAL_VERSION]))
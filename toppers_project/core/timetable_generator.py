@@ -0,0 +1,426 @@
+# core/timetable_generator.py
+"""
+Weekly timetable generator.
+
+Input (a Problem):
+
+* requirements -- weekly hours per (batch, subject);
+* qualified -- the teachers of each subject (TeacherProfile.subjects_taught);
+* slots -- the week grid, Lecture.DAYS x the hour-long SLOT_STARTS;
+* availability -- the slots each teacher can take (missing: all of them);
+* busy -- slots already taken by the saved timetable, per batch / teacher.
+
+solve() gives every (batch, subject) one teacher, then places its lessons:
+
+1. teachers are handed out most-constrained subject first, to the qualified
+   teacher with the most spare capacity;
+2. lessons are placed greedily, fewest possible slots first, preferring days
+   on which the batch doesn't have that subject yet;
+3. whatever could not be placed is repaired by min-conflicts local search:
+   a lesson takes the slot where it collides with the fewest others, those
+   are evicted and re-placed in turn (with a short tabu list, and now and
+   then a different qualified teacher), until everything fits or the time
+   budget runs out. The best assignment seen is kept;
+4. spare time is spent moving lessons off days that already have the same
+   subject for that batch.
+
+The result never has a batch or teacher clash; lessons that could not be
+fitted are reported as unplaced. Solution.rows() turns it into
+core.timetable_import rows, which is how it is previewed and then written.
+"""
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dtime, timedelta
+
+from django.db.models import Q
+from django.utils.dateparse import parse_time
+
+from core.models import CustomUser, Lecture, Subject, Batch, StudentProfile, TeacherProfile
+
+# Monday-Saturday slots, one hour each
+SLOT_STARTS = [dtime(8), dtime(9), dtime(10), dtime(11), dtime(14), dtime(15), dtime(16), dtime(17)]
+DEFAULT_HOURS = 3  # per subject per week
+TIME_BUDGET = 5.0  # seconds
+
+_TABU_TENURE = 10
+_TEACHER_SWITCH = 0.05  # chance a repair step tries another qualified teacher
+
+
+@dataclass
+class Requirement:
+    batch_id: int
+    subject_id: int
+    hours: int
+
+
+@dataclass
+class Problem:
+    requirements: list
+    qualified: dict  # subject_id -> [teacher_id]
+    slots: list = None  # [(day, start, end)]
+    availability: dict = field(default_factory=dict)  # teacher_id -> {slot index}
+    busy: dict = field(default_factory=dict)  # ('batch' | 'teacher', id) -> {slot index}
+
+    def __post_init__(self):
+        if self.slots is None:
+            self.slots = week_slots()
+
+
+@dataclass
+class Solution:
+    placements: list  # (batch_id, subject_id, teacher_id, slot index)
+    unplaced: list  # (Requirement, lessons missing, reason)
+    penalty: int  # same subject twice on a day for a batch, summed
+    elapsed: float
+    iterations: int
+
+    @property
+    def complete(self):
+        return not self.unplaced
+
+    def rows(self, problem):
+        """The placements as core.timetable_import rows (names, HH:MM), in
+        batch / day / time order. Three queries for the names."""
+        ids = {kind: {p[i] for p in self.placements} for i, kind in enumerate(('batch', 'subject', 'teacher'))}
+        batches = dict(Batch.objects.filter(id__in=ids['batch']).values_list('id', 'name'))
+        subjects = dict(Subject.objects.filter(id__in=ids['subject']).values_list('id', 'name'))
+        teachers = dict(CustomUser.objects.filter(id__in=ids['teacher']).values_list('id', 'username'))
+        rows = []
+        for batch_id, subject_id, teacher_id, slot in sorted(self.placements, key=lambda p: (batches[p[0]], p[3])):
+            day, start, end = problem.slots[slot]
+            rows.append({
+                'batch': batches[batch_id], 'subject': subjects[subject_id], 'teacher': teachers[teacher_id],
+                'day': day, 'start_time': f'{start:%H:%M}', 'end_time': f'{end:%H:%M}',
+                'room': '', 'class_date': '', 'topic': subjects[subject_id],
+            })
+        return rows
+
+    def describe_unplaced(self):
+        """One line per requirement that is short of hours"""
+        batches = dict(Batch.objects.filter(id__in={req.batch_id for req, _, _ in self.unplaced}).values_list('id', 'name'))
+        subjects = dict(Subject.objects.filter(id__in={req.subject_id for req, _, _ in self.unplaced}).values_list('id', 'name'))
+        return [
+            f'{batches.get(req.batch_id, req.batch_id)} {subjects.get(req.subject_id, req.subject_id)}: '
+            f'{missing} of {req.hours} hours not placed ({reason})'
+            for req, missing, reason in self.unplaced
+        ]
+
+
+def week_slots(starts=SLOT_STARTS):
+    return [
+        (day, start, (datetime.combine(date.min, start) + timedelta(hours=1)).time())
+        for day, _ in Lecture.DAYS
+        for start in starts
+    ]
+
+
+def _overlapping(slots, day, start, end):
+    return {index for index, (d, s, e) in enumerate(slots) if d == day and s < end and e > start}
+
+
+def load_problem(batch_ids=None, hours=DEFAULT_HOURS, requirements=None, availability=None,
+                 slots=None, today=None):
+    """Build a Problem from the database.
+
+    Requirements default to ``hours`` a week for every subject the batch's
+    students take. ``availability`` maps teacher ids to ``(day, start, end)``
+    windows. The saved timetable (weekly lectures and upcoming one-offs) is
+    loaded as busy slots, so the result fits around it.
+    """
+    slots = slots or week_slots()
+    if requirements is None:
+        pairs = StudentProfile.subjects.through.objects.values_list(
+            'studentprofile__batch_id', 'subject_id',
+        ).distinct().order_by()
+        if batch_ids is not None:
+            pairs = pairs.filter(studentprofile__batch_id__in=batch_ids)
+        requirements = [Requirement(batch_id, subject_id, hours) for batch_id, subject_id in pairs if batch_id]
+
+    qualified = defaultdict(list)
+    for teacher_id, subject_id in TeacherProfile.subjects_taught.through.objects.filter(
+        teacherprofile__user__status='approved',
+    ).values_list('teacherprofile__user_id', 'subject_id').order_by('teacherprofile__user_id'):
+        qualified[subject_id].append(teacher_id)
+
+    windows = {}
+    for teacher_id, spans in (availability or {}).items():
+        windows[teacher_id] = set().union(*(_overlapping(slots, *span) for span in spans))
+
+    busy = defaultdict(set)
+    today = today or date.today()
+    for day, start, end, batch_id, teacher_id in Lecture.objects.filter(
+        Q(class_date__isnull=True) | Q(class_date__gte=today),
+    ).values_list('day', 'start_time', 'end_time', 'batch_id', 'teacher_id'):
+        taken = _overlapping(slots, day, start, end)
+        busy[('batch', batch_id)] |= taken
+        busy[('teacher', teacher_id)] |= taken
+    return Problem(requirements, dict(qualified), slots, windows, dict(busy))
+
+
+def requirements_from_rows(rows):
+    """Requirements from ``batch, subject, hours`` rows (names, case-insensitive)"""
+    batches = {name.lower(): pk for pk, name in Batch.objects.values_list('id', 'name')}
+    subjects = {name.lower(): pk for pk, name in Subject.objects.values_list('id', 'name')}
+    requirements, errors = [], []
+    for line, row in rows:
+        batch_id = batches.get((row.get('batch') or '').strip().lower())
+        subject_id = subjects.get((row.get('subject') or '').strip().lower())
+        try:
+            hours = int(row.get('hours') or DEFAULT_HOURS)
+        except ValueError:
+            hours = None
+        if batch_id is None or subject_id is None or hours is None or hours < 0:
+            errors.append(f'line {line}: need a known batch, a known subject and whole hours.')
+        else:
+            requirements.append(Requirement(batch_id, subject_id, hours))
+    if errors:
+        raise ValueError(' '.join(errors))
+    return requirements
+
+
+def availability_from_rows(rows):
+    """``{teacher_id: [(day, start, end)]}`` from ``teacher, day, start_time,
+    end_time`` rows; teacher is a username or employee ID. Teachers without
+    a row are available all week."""
+    rows = list(rows)
+    names = {(row.get('teacher') or '').strip() for _, row in rows}
+    teachers = {}
+    for pk, username, employee_id in CustomUser.objects.filter(
+        Q(username__in=names) | Q(teacher_profile__employee_id__in=names), role='teacher',
+    ).values_list('id', 'username', 'teacher_profile__employee_id'):
+        teachers[username] = teachers[employee_id] = pk
+    days = {day.lower(): day for day, _ in Lecture.DAYS}
+    availability, errors = defaultdict(list), []
+    for line, row in rows:
+        teacher_id = teachers.get((row.get('teacher') or '').strip())
+        day = days.get((row.get('day') or '').strip().lower())
+        try:
+            start = parse_time((row.get('start_time') or '').strip())
+            end = parse_time((row.get('end_time') or '').strip())
+        except ValueError:
+            start = end = None
+        if teacher_id is None or day is None or not start or not end or start >= end:
+            errors.append(f'line {line}: need a known teacher, a day and start_time < end_time (HH:MM).')
+        else:
+            availability[teacher_id].append((day, start, end))
+    if errors:
+        raise ValueError(' '.join(errors))
+    return dict(availability)
+
+
+class _Search:
+    """Mutable state of one solve() run"""
+
+    def __init__(self, problem, rng):
+        self.problem = problem
+        self.rng = rng
+        self.all_slots = range(len(problem.slots))
+        self.per_day = len(problem.slots) // len(Lecture.DAYS) or 1
+        self.reqs = [req for req in problem.requirements if req.hours > 0]
+        self.lesson_req = [r for r, req in enumerate(self.reqs) for _ in range(req.hours)]
+        self.teacher = [None] * len(self.reqs)
+        self.slot = [None] * len(self.lesson_req)
+        self.batch_at = {}  # (batch_id, slot) -> lesson
+        self.teacher_at = {}  # (teacher_id, slot) -> lesson
+        self.day_count = defaultdict(int)  # (req, day) -> lessons placed
+        self.tabu = {}  # (lesson, slot) -> iteration until which the move is tabu
+        self.unreachable = {}  # req -> reason
+
+    # -- feasibility ------------------------------------------------------
+
+    def capacity(self, teacher_id):
+        busy = self.problem.busy.get(('teacher', teacher_id), set())
+        window = self.problem.availability.get(teacher_id)
+        return len([s for s in self.all_slots if s not in busy and (window is None or s in window)])
+
+    def allowed(self, lesson):
+        """Slots the lesson could take if nothing else were placed"""
+        req = self.reqs[self.lesson_req[lesson]]
+        teacher_id = self.teacher[self.lesson_req[lesson]]
+        batch_busy = self.problem.busy.get(('batch', req.batch_id), set())
+        teacher_busy = self.problem.busy.get(('teacher', teacher_id), set())
+        window = self.problem.availability.get(teacher_id)
+        return [
+            s for s in self.all_slots
+            if s not in batch_busy and s not in teacher_busy and (window is None or s in window)
+        ]
+
+    def conflicts(self, lesson, slot):
+        req = self.reqs[self.lesson_req[lesson]]
+        found = set()
+        for other in (self.batch_at.get((req.batch_id, slot)), self.teacher_at.get((self.teacher[self.lesson_req[lesson]], slot))):
+            if other is not None and other != lesson:
+                found.add(other)
+        return found
+
+    def spread_cost(self, lesson, slot):
+        """How many lessons of the same batch + subject are already on that day"""
+        return self.day_count[(self.lesson_req[lesson], slot // self.per_day)]
+
+    # -- moves ------------------------------------------------------------
+
+    def place(self, lesson, slot):
+        r = self.lesson_req[lesson]
+        self.slot[lesson] = slot
+        self.batch_at[(self.reqs[r].batch_id, slot)] = lesson
+        self.teacher_at[(self.teacher[r], slot)] = lesson
+        self.day_count[(r, slot // self.per_day)] += 1
+
+    def remove(self, lesson):
+        r = self.lesson_req[lesson]
+        slot = self.slot[lesson]
+        self.slot[lesson] = None
+        del self.batch_at[(self.reqs[r].batch_id, slot)]
+        del self.teacher_at[(self.teacher[r], slot)]
+        self.day_count[(r, slot // self.per_day)] -= 1
+
+    # -- phases -----------------------------------------------------------
+
+    def assign_teachers(self):
+        load = defaultdict(int)
+        capacity = {}
+        order = sorted(
+            range(len(self.reqs)),
+            key=lambda r: (len(self.problem.qualified.get(self.reqs[r].subject_id, ())), -self.reqs[r].hours),
+        )
+        for r in order:
+            candidates = self.problem.qualified.get(self.reqs[r].subject_id, [])
+            if not candidates:
+                self.unreachable[r] = 'no qualified teacher'
+                continue
+            for teacher_id in candidates:
+                if teacher_id not in capacity:
+                    capacity[teacher_id] = self.capacity(teacher_id)
+            self.teacher[r] = max(
+                candidates,
+                key=lambda t: (capacity[t] - load[t] - self.reqs[r].hours, self.rng.random()),
+            )
+            load[self.teacher[r]] += self.reqs[r].hours
+
+    def construct(self):
+        lessons = [lesson for lesson, r in enumerate(self.lesson_req) if self.teacher[r] is not None]
+        options = {lesson: self.allowed(lesson) for lesson in lessons}
+        lessons.sort(key=lambda lesson: (len(options[lesson]), self.rng.random()))
+        for lesson in lessons:
+            free = [s for s in options[lesson] if not self.conflicts(lesson, s)]
+            if free:
+                self.place(lesson, min(free, key=lambda s: (self.spread_cost(lesson, s), self.rng.random())))
+
+    def repair(self, deadline):
+        unplaced = [
+            lesson for lesson, r in enumerate(self.lesson_req)
+            if self.slot[lesson] is None and self.teacher[r] is not None
+        ]
+        best = (len(unplaced), self.snapshot())
+        iteration = 0
+        while unplaced and time.perf_counter() < deadline:
+            iteration += 1
+            lesson = unplaced.pop(self.rng.randrange(len(unplaced)))
+            r = self.lesson_req[lesson]
+            if self.rng.random() < _TEACHER_SWITCH and self.switch_teacher(r, unplaced):
+                continue
+            options = self.allowed(lesson)
+            if not options:
+                self.unreachable[r] = 'teacher or batch has no free slot'
+                continue
+            scored = [
+                (len(clashes), self.spread_cost(lesson, s), self.rng.random(), s, clashes)
+                for s in options
+                if self.tabu.get((lesson, s), 0) < iteration
+                for clashes in (self.conflicts(lesson, s),)
+            ] or [(0, 0, 0, s, self.conflicts(lesson, s)) for s in options]
+            _, _, _, slot, clashes = min(scored, key=lambda item: item[:3])
+            for other in clashes:
+                self.tabu[(other, self.slot[other])] = iteration + _TABU_TENURE
+                self.remove(other)
+                unplaced.append(other)
+            self.place(lesson, slot)
+            if len(unplaced) < best[0]:
+                best = (len(unplaced), self.snapshot())
+        if unplaced:
+            self.restore(best[1])
+        return iteration
+
+    def switch_teacher(self, r, unplaced):
+        """Hand requirement ``r`` to another qualified teacher, unplacing its lessons"""
+        others = [t for t in self.problem.qualified.get(self.reqs[r].subject_id, []) if t != self.teacher[r]]
+        if not others:
+            return False
+        for lesson, req in enumerate(self.lesson_req):
+            if req == r:
+                if self.slot[lesson] is not None:
+                    self.remove(lesson)
+                if lesson not in unplaced:
+                    unplaced.append(lesson)
+        self.teacher[r] = self.rng.choice(others)
+        return True
+
+    def improve(self, deadline):
+        """Move lessons off days where their batch already has the subject"""
+        iterations = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for lesson, slot in enumerate(self.slot):
+                iterations += 1
+                if slot is None or self.spread_cost(lesson, slot) <= 1:
+                    continue
+                for target in self.allowed(lesson):
+                    if self.conflicts(lesson, target):
+                        continue
+                    if self.spread_cost(lesson, target) + 1 < self.spread_cost(lesson, slot):
+                        self.remove(lesson)
+                        self.place(lesson, target)
+                        improved = True
+                        break
+                if not iterations % 256 and time.perf_counter() >= deadline:
+                    break
+        return iterations
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def snapshot(self):
+        return list(self.slot), list(self.teacher)
+
+    def restore(self, state):
+        slots, teachers = state
+        for lesson, slot in enumerate(self.slot):
+            if slot is not None:
+                self.remove(lesson)
+        self.teacher = list(teachers)
+        for lesson, slot in enumerate(slots):
+            if slot is not None:
+                self.place(lesson, slot)
+
+    def solution(self, elapsed, iterations):
+        placements = [
+            (self.reqs[r].batch_id, self.reqs[r].subject_id, self.teacher[r], self.slot[lesson])
+            for lesson, r in enumerate(self.lesson_req)
+            if self.slot[lesson] is not None
+        ]
+        missing = defaultdict(int)
+        for lesson, r in enumerate(self.lesson_req):
+            if self.slot[lesson] is None:
+                missing[r] += 1
+        unplaced = [
+            (self.reqs[r], count, self.unreachable.get(r, 'no clash-free slot found in time'))
+            for r, count in sorted(missing.items())
+        ]
+        penalty = sum(max(0, count - 1) for count in self.day_count.values())
+        return Solution(placements, unplaced, penalty, elapsed, iterations)
+
+
+def solve(problem, time_budget=TIME_BUDGET, seed=0):
+    """Clash-free weekly timetable for ``problem`` within ``time_budget``
+    seconds (the construction phase always completes). See the module
+    docstring for the method."""
+    started = time.perf_counter()
+    deadline = started + time_budget
+    search = _Search(problem, random.Random(seed))
+    search.assign_teachers()
+    search.construct()
+    iterations = search.repair(deadline)
+    iterations += search.improve(deadline)
+    return search.solution(time.perf_counter() - started, iterations)
@@ -0,0 +1,218 @@
+# core/timetable_import.py
+"""
+Bulk timetable import from CSV or JSON.
+
+The whole file is validated before anything is written:
+
+* subject, batch and teacher names are resolved with one query each;
+* every row gets the Lecture field checks (day choices, a topic, room /
+  topic length) and start < end;
+* clashes are found in memory with core.clashes.validate_timetable(),
+  against the other rows of the file and the saved timetable at once.
+
+Every problem is reported with its line number. If there are none, all
+lectures are written with one bulk_create inside a transaction, their
+sessions are materialized and the cached timetables dropped (bulk_create
+sends no signals); otherwise nothing is written.
+
+Columns: batch, subject, teacher, day, start_time, end_time, room,
+class_date, topic
+
+teacher is a username or an employee ID. room and class_date are optional;
+for a one-off lecture (class_date set) day may be left blank. JSON
+files hold a list of objects with the same keys, or ``{"lectures": [...]}``.
+"""
+import csv
+import json
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_time
+
+from core import occurrences, timetable_cache
+from core.clashes import validate_timetable
+from core.importers import ImportResult
+from core.models import CustomUser, Lecture, Subject, Batch
+
+COLUMNS = ['batch', 'subject', 'teacher', 'day', 'start_time', 'end_time', 'room', 'class_date', 'topic']
+
+
+def read_rows(lines, format=None, name=''):
+    """``(line, row)`` pairs from a CSV or JSON source. The format is taken
+    from ``format``, the file name, or else sniffed from the first character.
+    JSON rows are numbered from 1."""
+    text = None
+    if format is None:
+        if name.lower().endswith('.json'):
+            format = 'json'
+        elif name.lower().endswith('.csv'):
+            format = 'csv'
+        else:
+            text = lines.read() if hasattr(lines, 'read') else ''.join(lines)
+            format = 'json' if text.lstrip()[:1] in ('[', '{') else 'csv'
+            lines = text.splitlines(keepends=True)
+
+    if format == 'json':
+        if text is None:
+            text = lines.read() if hasattr(lines, 'read') else ''.join(lines)
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            raise ValueError(f'Invalid JSON: {exc}')
+        if isinstance(data, dict):
+            data = data.get('lectures')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise ValueError('JSON must be a list of lecture objects or {"lectures": [...]}.')
+        return [(number, row) for number, row in enumerate(data, 1)]
+
+    reader = csv.DictReader(lines)
+    return [(reader.line_num, row) for row in reader]
+
+
+class TimetableImporter:
+    def __init__(self, dry_run=False, today=None):
+        self.dry_run = dry_run
+        self.today = today
+
+    def run(self, rows):
+        """Validate and (unless ``dry_run`` or any row fails) write ``rows``,
+        an iterable of ``(line, dict)`` as returned by read_rows().
+
+        ``result.created`` counts the lectures written; in dry-run mode, the
+        ones that would be.
+        """
+        result = ImportResult()
+        rows = [
+            (line, {str(key).strip(): str(value if value is not None else '').strip()
+                    for key, value in row.items() if key})
+            for line, row in rows
+        ]
+        result.rows = len(rows)
+        names = self._resolve_names(rows)
+
+        entries = []  # (line, label, lecture)
+        for line, row in rows:
+            label = ' '.join(filter(None, (row.get('batch'), row.get('day') or row.get('class_date'), row.get('start_time'))))
+            errors = []
+            lecture = self._build(row, names, errors)
+            if errors:
+                result.errors.extend((line, label, error) for error in errors)
+            else:
+                entries.append((line, label, lecture))
+
+        lines = {id(lecture): line for line, _, lecture in entries}
+        problems = validate_timetable([lecture for _, _, lecture in entries], today=self.today)
+        for position, clashes in sorted(problems.items()):
+            line, label, _ = entries[position]
+            for clash in clashes:
+                other = lines.get(id(clash.other))
+                where = f'line {other}' if other else f'saved lecture #{clash.other.pk}'
+                result.errors.append((line, label, f'{clash.message} ({where}).'))
+
+        if result.errors:
+            result.errors.sort(key=lambda error: error[0])
+            return result
+        result.created = len(entries)
+        if not self.dry_run and entries:
+            self._write([lecture for _, _, lecture in entries])
+        return result
+
+    def _resolve_names(self, rows):
+        """Subjects and batches by lower-cased name, teachers by username and
+        employee ID: one query each for the names used in the file."""
+        wanted = {key: {row.get(key, '') for _, row in rows} - {''} for key in ('subject', 'batch', 'teacher')}
+        subject_q, batch_q = Q(pk__in=[]), Q(pk__in=[])
+        for name in wanted['subject']:
+            subject_q |= Q(name__iexact=name)
+        for name in wanted['batch']:
+            batch_q |= Q(name__iexact=name)
+        teachers = {}
+        for teacher in CustomUser.objects.filter(
+            Q(username__in=wanted['teacher']) | Q(teacher_profile__employee_id__in=wanted['teacher']),
+            role='teacher',
+        ).values('id', 'username', 'teacher_profile__employee_id'):
+            teachers[teacher['username']] = teacher['id']
+            if teacher['teacher_profile__employee_id']:
+                teachers[teacher['teacher_profile__employee_id']] = teacher['id']
+        return {
+            'subject': {name.lower(): pk for pk, name in Subject.objects.filter(subject_q).values_list('id', 'name')},
+            'batch': {name.lower(): pk for pk, name in Batch.objects.filter(batch_q).values_list('id', 'name')},
+            'teacher': teachers,
+        }
+
+    def _build(self, row, names, errors):
+        ids = {}
+        for key in ('batch', 'subject', 'teacher'):
+            value = row.get(key, '')
+            if not value:
+                errors.append(f'{key}: this field is required.')
+                continue
+            ids[key] = names[key].get(value if key == 'teacher' else value.lower())
+            if ids[key] is None:
+                errors.append(f'{key}: unknown {key} "{value}".')
+
+        times = {}
+        for key in ('start_time', 'end_time'):
+            value = row.get(key, '')
+            try:
+                times[key] = parse_time(value) if value else None
+            except ValueError:
+                times[key] = None
+            if times[key] is None:
+                errors.append(f'{key}: use HH:MM.')
+
+        class_date = None
+        if row.get('class_date'):
+            try:
+                class_date = parse_date(row['class_date'])
+            except ValueError:
+                pass
+            if class_date is None:
+                errors.append('class_date: use YYYY-MM-DD.')
+
+        day = row.get('day', '').title()
+        if class_date:
+            weekday = class_date.strftime('%A')
+            if not day:
+                day = weekday
+            elif day != weekday:
+                errors.append(f'day: {class_date} is a {weekday}, not a {day}.')
+        elif not day:
+            errors.append('day: this field is required for a weekly lecture.')
+
+        lecture = Lecture(
+            teacher_id=ids.get('teacher'),
+            subject_id=ids.get('subject'),
+            batch_id=ids.get('batch'),
+            day=day,
+            start_time=times['start_time'],
+            end_time=times['end_time'],
+            room=row.get('room', ''),
+            class_date=class_date,
+            topic=row.get('topic', ''),
+        )
+        # the Lecture field rules (day choices, required topic, lengths); the
+        # fields parsed above report their own errors, and clean() is replaced
+        # by the time check below and the in-memory clash check
+        exclude = ['teacher', 'subject', 'batch', 'start_time', 'end_time', 'class_date']
+        try:
+            lecture.clean_fields(exclude=exclude)
+        except ValidationError as exc:
+            for name, messages in exc.message_dict.items():
+                errors.extend(f'{name}: {message}' for message in messages)
+
+        if times['start_time'] and times['end_time'] and times['start_time'] >= times['end_time']:
+            errors.append('Start time must be before end time.')
+        return lecture
+
+    def _write(self, lectures):
+        today = self.today or date.today()
+        with transaction.atomic():
+            created = Lecture.objects.bulk_create(lectures, batch_size=1000)
+            # bulk_create skips the post_save receiver that materializes sessions
+            occurrences.materialize(
+                today, occurrences.horizon(today), Lecture.objects.filter(pk__in=[lecture.pk for lecture in created])
+            )
+            timetable_cache.invalidate_all()
@@ -0,0 +1,43 @@
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from core import ical
+from core.models import Batch, CustomUser
+
+
+def timetable_feed(request, token):
+    """iCalendar feed of a student's, teacher's or batch's timetable (see core/ical.py).
+
+    Unchanged feeds are answered 304 after a single query (ical.feed_last_modified).
+    """
+    try:
+        kind, pk = ical.read_feed_token(token)
+    except signing.BadSignature:
+        raise Http404('Unknown calendar feed')
+
+    lectures = ical.feed_lectures(kind, pk)
+    last = ical.feed_last_modified(kind, pk)
+    etag = f'"{kind}-{pk}-{last.timestamp() if last else 0}"'
+    last_modified = int(last.timestamp()) if last else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if kind == 'batch':
+            name = Batch.objects.filter(pk=pk).values_list('name', flat=True).first()
+        else:
+            user = CustomUser.objects.filter(pk=pk).first()
+            name = user and (user.get_full_name() or user.username)
+        if name is None:
+            raise Http404('Unknown calendar feed')
+        body = ical.render_calendar(
+            f'{name} - Timetable',
+            lectures.select_related('subject', 'batch', 'teacher').order_by('weekday', 'start_time'),
+        )
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="timetable.ics"'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
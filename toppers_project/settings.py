@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the session / auth queries count towards each view's budget
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',    
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +50,8 @@ ROOT_URLCONF = 'toppers_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that can time renders for core/middleware.py
+        'BACKEND': 'core.middleware.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -119,6 +122,86 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 # Auth settings
 AUTH_USER_MODEL = 'core.CustomUser'
+# ModelBackend that loads the signed-in user with their profile (core/principal.py).
+# ModelBackend stays listed so sessions from before PrincipalBackend keep
+# working; drop it once those have expired (SESSION_COOKIE_AGE).
+AUTHENTICATION_BACKENDS = [
+    'core.principal.PrincipalBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Per-view SQL query budgets, keyed by URL name or "name:METHOD" (see
+# core/middleware.py).
+# Going over logs a warning; with QUERY_BUDGET_RAISE = True it raises
+# instead, which the test runner (core/test_runner.py) turns on. `python manage.py check_query_budgets` checks
+# every page listed here.
+# Most budgets are exactly what the page runs, with no headroom, so any new
+# query fails check_query_budgets: find it, or raise the budget here on
+# purpose. Every page starts with two: the session and the user with its
+# profile (core/principal.py).
+QUERY_BUDGETS = {
+    'admin_dashboard': 9,
+    'pending_registrations': 3,
+    'all_students': 3,
+    'all_teachers': 3,
+    'attendance_view': 5,
+    'fee_reports': 7,
+    'payroll': 6,
+    'payroll:POST': 12,
+    'approve_profile_updates': 4,
+    'manage_subjects': 3,
+    'manage_batches': 3,
+    'manage_timetable': 4,
+    'add_lecture': 5,
+    'student_dashboard': 5,
+    'student_profile': 4,
+    'student_attendance': 4,  # + one page of records, the monthly rollups
+    'student_fees': 4,
+    'student_lectures': 3,
+    'teacher_dashboard': 4,  # + the week's sessions, the lecture count
+    'teacher_profile': 4,
+    'teacher_salary': 4,
+    'teacher_lectures': 4,
+    'mark_attendance': 4,  # + the lecture with subject and batch, the roster
+    'mark_attendance:POST': 16,
+    'timetable_feed': 3,
+}
+QUERY_BUDGET_RAISE = False
+TEST_RUNNER = 'core.test_runner.TestRunner'
+# Template render timing and the Server-Timing response header; keep them
+# off in production, where the header would show every visitor query counts.
+PERFORMANCE_TIMING = DEBUG
+
+# Cached weekly timetables (core/timetable_cache.py) and fee reports
+# (core/fee_reports.py). The local-memory cache is per process; with several
+# gunicorn workers use a shared backend, e.g.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+TIMETABLE_CACHE = 'default'
+REPORTS_CACHE = 'default'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # only budget overruns reach the console; lower the level to INFO to
+        # also see one JSON line per request
+        'performance': {'class': 'logging.StreamHandler', 'formatter': 'json', 'level': 'WARNING'},
+    },
+    'loggers': {
+        # one JSON line per request at INFO: view, status, queries, db_ms,
+        # wall_ms (and template_ms with PERFORMANCE_TIMING)
+        'toppers.performance': {'handlers': ['performance'], 'level': 'INFO', 'propagate': False},
+    },
+}
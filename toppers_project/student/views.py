@@ -1,10 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from core.models import CustomUser, StudentProfile, Lecture, Notification, Subject, Batch
+from datetime import date
+from core.models import CustomUser, StudentProfile, LectureOccurrence, Notification, Subject, Batch
+from core.occurrences import upcoming
+from core import ical, timetable_cache
 from core.forms import CustomUserChangeForm
 from functools import wraps
 from core.forms import StudentProfileForm
+from attendance.utils import attendance_summary, keyset_page
 
 
 def student_required(view_func):
@@ -26,26 +30,20 @@ def student_dashboard(request):
     except StudentProfile.DoesNotExist:
         return redirect('complete_profile_student')
     
-    # Get lectures for student's batch
-    batch = student_profile.batch
-    upcoming_lectures = Lecture.objects.filter(
-        batch=batch
-    ).order_by('day', 'start_time')[:10]
+    # This week's sessions for the student's batch, one range query on (batch, date)
+    upcoming_lectures = upcoming(
+        LectureOccurrence.objects.filter(batch_id=student_profile.batch_id), date.today()
+    )[:10]
     
-    # Get attendance for this student
-    from attendance.models import AttendanceRecord
-    attendance_records = AttendanceRecord.objects.filter(student=request.user).order_by('-date')
-    
-    attendance_count = attendance_records.filter(status='present').count()
-    total_classes = attendance_records.count()
-    attendance_percentage = (attendance_count / total_classes * 100) if total_classes > 0 else 0
+    # Attendance totals from the monthly rollup rows (attendance/rollups.py)
+    summary = attendance_summary(request.user)
     
     context = {
         'student_profile': student_profile,
         'upcoming_lectures': upcoming_lectures,
-        'attendance_percentage': attendance_percentage,
-        'total_classes': total_classes,
-        'attendance_count': attendance_count,
+        'attendance_percentage': summary['percentage'],
+        'total_classes': summary['total'],
+        'attendance_count': summary['present'],
     }
     return render(request, 'student/dashboard.html', context)
 
@@ -72,22 +70,18 @@ def student_attendance(request):
     """View student attendance"""
     from attendance.models import AttendanceRecord
     
-    attendance_records = AttendanceRecord.objects.filter(student=request.user).order_by('-date')
-    
-    attendance_summary = {
-        'present': attendance_records.filter(status='present').count(),
-        'absent': attendance_records.filter(status='absent').count(),
-        'total': attendance_records.count(),
-    }
-    
-    if attendance_summary['total'] > 0:
-        attendance_summary['percentage'] = (attendance_summary['present'] / attendance_summary['total'] * 100)
-    else:
-        attendance_summary['percentage'] = 0
+    attendance_records, newer_cursor, older_cursor = keyset_page(
+        AttendanceRecord.objects.filter(student=request.user)
+        .select_related('lecture__subject', 'lecture__batch', 'lecture__teacher'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     context = {
         'attendance_records': attendance_records,
-        'attendance_summary': attendance_summary,
+        'attendance_summary': attendance_summary(request.user),
+        'newer_cursor': newer_cursor,
+        'older_cursor': older_cursor,
     }
     return render(request, 'student/attendance.html', context)
 
@@ -103,6 +97,7 @@ def student_fees(request):
     
     context = {
         'student_profile': student_profile,
+        'payments': student_profile.fee_payments.all(),
     }
     return render(request, 'student/fees.html', context)
 
@@ -116,12 +111,11 @@ def student_lectures(request):
     except StudentProfile.DoesNotExist:
         return redirect('complete_profile_student')
     
-    lectures = Lecture.objects.filter(
-        batch=student_profile.batch
-    ).order_by('day', 'start_time')
+    lectures = timetable_cache.batch_timetable(student_profile.batch_id)
     
     context = {
         'lectures': lectures,
+        'feed_url': ical.feed_url(request, 'student', request.user.id),
     }
     return render(request, 'student/lectures.html', context)
 
@@ -1,8 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from core.models import CustomUser, TeacherProfile, Lecture, Notification, StudentProfile, Subject
-from datetime import datetime, timedelta, date
+from core.models import CustomUser, TeacherProfile, Lecture, LectureOccurrence, Notification, StudentProfile, Subject
+from core.occurrences import upcoming
+from core import ical, timetable_cache
+from datetime import timedelta, date
 from django import forms
 from core.forms import TeacherProfileForm
 from functools import wraps
@@ -26,19 +28,18 @@ def teacher_dashboard(request):
     except TeacherProfile.DoesNotExist:
         return redirect('complete_profile_teacher')
     
-    # #upcoming lectures
-    today = datetime.today().date()
-    upcoming_lectures = Lecture.objects.filter(
-        teacher=request.user,
-        class_date__gte=today,
-        day=today.strftime('%A')  # Filter by current day of the week
-    ).order_by('day', 'start_time')[:10]
+    # upcoming sessions for the week, one range query on (teacher, date)
+    today = date.today()
+    upcoming_lectures = list(upcoming(LectureOccurrence.objects.filter(teacher=request.user), today)[:10])
+    today_lectures = [occurrence for occurrence in upcoming_lectures if occurrence.date == today]
     
     total_lectures = Lecture.objects.filter(teacher=request.user).count()
     
     context = {
         'teacher_profile': teacher_profile,
         'upcoming_lectures': upcoming_lectures,
+        'today_lectures': today_lectures,
+        'today': today,
         'total_lectures': total_lectures,
     }
     return render(request, 'teacher/dashboard.html', context)
@@ -69,10 +70,11 @@ def teacher_lectures(request):
     except TeacherProfile.DoesNotExist:
         return redirect('complete_profile_teacher')
     
-    lectures = Lecture.objects.filter(teacher=request.user).order_by('-day', '-start_time')
+    lectures = timetable_cache.teacher_timetable(request.user.id)
     
     context = {
         'lectures': lectures,
+        'feed_url': ical.feed_url(request, 'teacher', request.user.id),
     }
     return render(request, 'teacher/lectures.html', context)
 
@@ -81,42 +83,35 @@ def teacher_lectures(request):
 @teacher_required
 def mark_attendance(request, lecture_id):
     """Mark attendance for a lecture"""
-    lecture = get_object_or_404(Lecture, id=lecture_id, teacher=request.user)
-    
-    # Get all students in this batch
-    students = CustomUser.objects.filter(
-        role='student',
-        student_profile__batch__in=[lecture.batch],
-        status='approved'
-    ).select_related('student_profile').distinct()
-    from attendance.models import AttendanceRecord
-    
+    lecture = get_object_or_404(Lecture.objects.select_related('subject', 'batch'), id=lecture_id, teacher=request.user)
+    from attendance.utils import load_roster, bulk_mark_attendance, resolve_session
+
+    # attendance is kept per session; ?date= picks an earlier one
+    session_date = resolve_session(lecture, request.POST.get('date') or request.GET.get('date'))
+
+    # Students of this batch, each annotated with their attendance_status for the session
+    students = load_roster(lecture, session_date)
+
     if request.method == 'POST':
-        for student in students:
-            status = request.POST.get(f'attendance_{student.id}', 'absent')
-            attendence_record, created = AttendanceRecord.objects.get_or_create(
-                lecture=lecture,
-                student=student,
-                defaults={'date': lecture.class_date, 'status': status}
-            )
-            if not created:
-                attendence_record.status = status
-                attendence_record.save()
-        
-        messages.success(request, 'Attendance marked successfully!')
+        statuses = {}
+        for student_id in students.values_list('id', flat=True):
+            status = request.POST.get(f'attendance_{student_id}', 'absent')
+            statuses[student_id] = status if status in ('present', 'absent') else 'absent'
+        created, updated = bulk_mark_attendance(lecture, statuses, session_date)
+
+        messages.success(
+            request, f'Attendance for {session_date:%d %b %Y} marked successfully! ({created} new, {updated} changed)'
+        )
         return redirect('teacher_dashboard')
     
-    # Get existing attendance records for this lecture
-    for student in students:
-        try:
-            record = AttendanceRecord.objects.get(lecture=lecture, student=student)
-            student.attendance_status = record.status
-        except AttendanceRecord.DoesNotExist:
-            student.attendance_status = 'absent'
-    
+    previous_session = session_date - timedelta(days=7)
+    next_session = session_date + timedelta(days=7)
     context = {
         'lecture': lecture,
         'students': students,
+        'session_date': session_date,
+        'previous_session': None if lecture.class_date else previous_session,
+        'next_session': None if lecture.class_date or next_session > date.today() else next_session,
     }
     return render(request, 'teacher/mark_attendance.html', context)
 
@@ -181,5 +176,6 @@ def teacher_salary(request):
     
     context = {
         'teacher_profile': teacher_profile,
+        'salary_payments': teacher_profile.salary_payments.all(),
     }
     return render(request, 'teacher/salary.html', context)
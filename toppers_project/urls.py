@@ -6,6 +6,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from authentication.views import home, login_view, logout_view
+from core.views import timetable_feed
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -17,6 +18,7 @@ urlpatterns = [
     path('student/', include('student.urls')),
     path('teacher/', include('teacher.urls')),
     path('attendance/', include('attendance.urls')),
+    path('calendar/<str:token>.ics', timetable_feed, name='timetable_feed'),
 ]
 
 if settings.DEBUG: